@@ -0,0 +1,98 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+
+# Gerador de carga para o serviço HTTP (biblioteca/servidor.py): abre N clientes com
+# conexão persistente, cada um repetindo listagens, buscas e cadastros por um tempo fixo,
+# e informa requisições por segundo e latências (p50/p99) por tipo de requisição.
+#
+#   python -m biblioteca.servidor &
+#   python -m benchmarks.carga_http --clientes 50 --segundos 20
+
+TERMOS_BUSCA = ['dom', 'mem', 'hist', 'cas', 'ama', 'pri']
+
+
+async def requisitar(leitor, escritor, metodo, alvo, corpo=None):
+    dados = json.dumps(corpo).encode('utf-8') if corpo is not None else b''
+    escritor.write(
+        f"{metodo} {alvo} HTTP/1.1\r\nHost: localhost\r\n"
+        f"Content-Type: application/json\r\nContent-Length: {len(dados)}\r\n\r\n".encode('latin-1') + dados
+    )
+    await escritor.drain()
+    status = int((await leitor.readline()).split()[1])
+    tamanho = 0
+    while True:
+        linha = await leitor.readline()
+        if linha in (b'\r\n', b''):
+            break
+        nome, _, valor = linha.decode('latin-1').partition(':')
+        if nome.lower() == 'content-length':
+            tamanho = int(valor)
+    return status, json.loads(await leitor.readexactly(tamanho))
+
+
+async def cliente(numero, host, porta, fim, proporcao_escrita, latencias, erros):
+    leitor, escritor = await asyncio.open_connection(host, porta)
+    sorteio = random.Random(numero)
+    sequencia = 0
+    try:
+        while time.perf_counter() < fim:
+            tipo = sorteio.random()
+            if tipo < proporcao_escrita:
+                sequencia += 1
+                rotulo = 'POST /leitores'
+                pedido = ('POST', '/leitores', {'nome': f'Carga {numero}-{sequencia}',
+                                                'email': f'carga{numero}.{sequencia}.{time.time_ns()}@exemplo.com'})
+            elif tipo < proporcao_escrita + 0.2:
+                rotulo = 'GET /livros/busca'
+                pedido = ('GET', f'/livros/busca?q={sorteio.choice(TERMOS_BUSCA)}&limite=20', None)
+            else:
+                rotulo = 'GET /livros'
+                pedido = ('GET', f'/livros?apos={sorteio.randrange(0, 1000)}&limite=50', None)
+
+            inicio = time.perf_counter()
+            status, _ = await requisitar(leitor, escritor, *pedido)
+            latencias.setdefault(rotulo, []).append(time.perf_counter() - inicio)
+            if status >= 400:
+                erros[rotulo] = erros.get(rotulo, 0) + 1
+    finally:
+        escritor.close()
+
+
+def percentil(valores, fracao):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(fracao * len(ordenados)))]
+
+
+async def executar(host, porta, clientes, segundos, proporcao_escrita):
+    latencias, erros = {}, {}
+    inicio = time.perf_counter()
+    fim = inicio + segundos
+    await asyncio.gather(*(cliente(numero, host, porta, fim, proporcao_escrita, latencias, erros)
+                           for numero in range(clientes)))
+    duracao = time.perf_counter() - inicio
+
+    total = sum(len(valores) for valores in latencias.values())
+    print(f"{clientes} clientes, {duracao:.1f}s: {total} requisições, {total / duracao:.0f} req/s")
+    for rotulo, valores in sorted(latencias.items()):
+        print(f"  {rotulo:<20} {len(valores):>8} req  "
+              f"p50 {percentil(valores, 0.50) * 1000:7.1f} ms  "
+              f"p99 {percentil(valores, 0.99) * 1000:7.1f} ms  "
+              f"erros {erros.get(rotulo, 0)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga do serviço HTTP da biblioteca")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=8080)
+    parser.add_argument('--clientes', type=int, default=50)
+    parser.add_argument('--segundos', type=float, default=10)
+    parser.add_argument('--escrita', type=float, default=0.1, help="fração de cadastros (padrão: 0.1)")
+    args = parser.parse_args()
+    asyncio.run(executar(args.host, args.porta, args.clientes, args.segundos, args.escrita))
+
+
+if __name__ == "__main__":
+    main()
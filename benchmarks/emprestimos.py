@@ -0,0 +1,111 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+
+# Vazão do caminho de escrita dos empréstimos: atendimentos em que um leitor leva vários
+# livros, depois a devolução e a transferência desses empréstimos, comparando a operação
+# livro a livro (uma transação por livro, empréstimo localizado pelo título) com as
+# funções em lote do núcleo (uma transação por atendimento, empréstimos pelo id).
+#
+#   python -m benchmarks.emprestimos --atendimentos 500 --livros-por-atendimento 5
+
+
+def livros_disponiveis(nucleo, quantidade):
+    from sqlalchemy import select
+
+    ativos = select(nucleo.Emprestimo.livro_id).where(nucleo.Emprestimo.devolvido == False)
+    with nucleo.SessaoLeitura() as leitura:
+        return leitura.scalars(
+            select(nucleo.Livro.id).where(nucleo.Livro.id.not_in(ativos)).order_by(nucleo.Livro.id).limit(quantidade)
+        ).all()
+
+
+def medir(nome, operacoes, funcao, *args):
+    inicio = time.perf_counter()
+    funcao(*args)
+    duracao = time.perf_counter() - inicio
+    print(f"{nome:<45} {duracao:>8.2f}s {operacoes / duracao:>10.0f} empréstimos/s")
+
+
+def livro_a_livro(nucleo, atendimentos, leitores):
+    def emprestar():
+        for (leitor_id, livro_ids), _ in zip(atendimentos, leitores):
+            for livro_id in livro_ids:
+                nucleo.registrar_emprestimo(livro_id, leitor_id)
+
+    def transferir():
+        for (leitor_id, _), novo_leitor_id in zip(atendimentos, leitores):
+            for _, _, titulo, _, _ in nucleo.listar_emprestimos_ativos(leitor_id):
+                nucleo.transferir_emprestimo(leitor_id, titulo, novo_leitor_id)
+
+    def devolver():
+        for novo_leitor_id in set(leitores):
+            for _, _, titulo, _, _ in nucleo.listar_emprestimos_ativos(novo_leitor_id):
+                nucleo.devolver_emprestimo(novo_leitor_id, titulo)
+
+    return emprestar, transferir, devolver
+
+
+def em_lote(nucleo, atendimentos, leitores):
+    def emprestar():
+        for leitor_id, livro_ids in atendimentos:
+            nucleo.emprestar_livros(leitor_id, livro_ids)
+
+    def transferir():
+        for (leitor_id, _), novo_leitor_id in zip(atendimentos, leitores):
+            ids = [emprestimo[0] for emprestimo in nucleo.listar_emprestimos_ativos(leitor_id)]
+            nucleo.transferir_emprestimos(ids, novo_leitor_id)
+
+    def devolver():
+        for novo_leitor_id in set(leitores):
+            nucleo.devolver_emprestimos([emprestimo[0] for emprestimo in nucleo.listar_emprestimos_ativos(novo_leitor_id)])
+
+    return emprestar, transferir, devolver
+
+
+def executar(atendimentos, por_atendimento, emprestimos, semente):
+    from biblioteca import gerador_dados, nucleo
+
+    tamanhos = gerador_dados.gerar(emprestimos, semente)
+    sorteio = random.Random(semente)
+    total = atendimentos * por_atendimento
+    livros = livros_disponiveis(nucleo, 2 * total)
+    if len(livros) < 2 * total:
+        raise SystemExit(f"Só há {len(livros)} livros disponíveis; use mais --emprestimos ou menos atendimentos")
+
+    # Leitores novos, sem empréstimos, para que cada modo encontre o mesmo estado inicial
+    for numero in range(4 * atendimentos):
+        nucleo.adicionar_leitor(f'Balcão {numero}', f'balcao{numero}@exemplo.com')
+    leitores = [leitor.id for leitor in nucleo.listar_leitores_paginado(tamanhos['leitores'], 4 * atendimentos)]
+
+    for numero, (modo, criar) in enumerate((("livro a livro", livro_a_livro), ("em lote", em_lote))):
+        meus_leitores = leitores[2 * numero * atendimentos:2 * (numero + 1) * atendimentos]
+        meus_livros = livros[numero * total:(numero + 1) * total]
+        pedidos = [(leitor_id, meus_livros[indice * por_atendimento:(indice + 1) * por_atendimento])
+                   for indice, leitor_id in enumerate(meus_leitores[:atendimentos])]
+        destinos = [sorteio.choice(meus_leitores[atendimentos:]) for _ in pedidos]
+        emprestar, transferir, devolver = criar(nucleo, pedidos, destinos)
+        print(f"\n{modo}: {atendimentos} atendimentos de {por_atendimento} livros")
+        medir("  empréstimo", total, emprestar)
+        medir("  transferência", total, transferir)
+        medir("  devolução", total, devolver)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vazão de empréstimos, devoluções e transferências")
+    parser.add_argument('--atendimentos', type=int, default=500)
+    parser.add_argument('--livros-por-atendimento', type=int, default=5)
+    parser.add_argument('--emprestimos', type=int, default=100000, help="volume inicial (ver gerador_dados)")
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--banco', help="arquivo do banco (padrão: um arquivo temporário)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        os.environ['BIBLIOTECA_BANCO'] = args.banco or os.path.join(diretorio, 'emprestimos.db')
+        executar(args.atendimentos, args.livros_por_atendimento, args.emprestimos, args.semente)
+
+
+if __name__ == "__main__":
+    main()
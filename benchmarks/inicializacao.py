@@ -0,0 +1,75 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Mede a partida a frio da aplicação:
+#   - tempo de importação (python -X importtime) da interface e do núcleo, com os módulos
+#     mais caros, e se a interface ainda puxa o SQLAlchemy antes da primeira janela;
+#   - tempo até o primeiro quadro e até o banco pronto, abrindo "python -m biblioteca
+#     --medir-inicio" com um banco novo a cada execução (precisa de um display).
+#
+#   python -m benchmarks.inicializacao --execucoes 10
+
+
+def tempos_importacao(modulo):
+    # Devolve {módulo: microssegundos acumulados} a partir da saída de -X importtime
+    saida = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {modulo}'],
+                           capture_output=True, text=True, check=True).stderr
+    tempos = {}
+    for linha in saida.splitlines():
+        if not linha.startswith('import time:') or 'cumulative' in linha:
+            continue
+        _, acumulado, nome = linha.split('|')
+        tempos[nome.strip()] = int(acumulado)
+    return tempos
+
+
+def medir_importacao(modulo, mais_caros):
+    tempos = tempos_importacao(modulo)
+    print(f"import {modulo}: {tempos.get(modulo, 0) / 1000:.1f} ms")
+    for nome, micros in sorted(tempos.items(), key=lambda item: -item[1])[1:mais_caros + 1]:
+        print(f"  {nome:<40} {micros / 1000:7.1f} ms")
+    return tempos
+
+
+def medir_janela(execucoes):
+    primeiro_quadro, banco_pronto = [], []
+    for _ in range(execucoes):
+        with tempfile.TemporaryDirectory() as diretorio:
+            ambiente = dict(os.environ, BIBLIOTECA_BANCO=os.path.join(diretorio, 'biblioteca.db'))
+            inicio = time.perf_counter()
+            processo = subprocess.Popen([sys.executable, '-m', 'biblioteca', '--medir-inicio'],
+                                        env=ambiente, stdout=subprocess.PIPE, text=True)
+            for linha in processo.stdout:
+                if linha.strip() == 'primeiro_quadro':
+                    primeiro_quadro.append(time.perf_counter() - inicio)
+                elif linha.strip() == 'banco_pronto':
+                    banco_pronto.append(time.perf_counter() - inicio)
+            processo.wait()
+    print(f"primeiro quadro: mediana {statistics.median(primeiro_quadro) * 1000:.0f} ms")
+    print(f"banco pronto:    mediana {statistics.median(banco_pronto) * 1000:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede o tempo de inicialização da aplicação")
+    parser.add_argument('--execucoes', type=int, default=5)
+    parser.add_argument('--mais-caros', type=int, default=10, help="módulos listados por importação")
+    args = parser.parse_args()
+
+    interface = medir_importacao('biblioteca.app', args.mais_caros)
+    if any(nome.startswith('sqlalchemy') for nome in interface):
+        print("  atenção: a interface importa o SQLAlchemy antes do primeiro quadro")
+    medir_importacao('biblioteca.nucleo', args.mais_caros)
+
+    if sys.platform.startswith('linux') and not os.environ.get('DISPLAY'):
+        print("sem DISPLAY: tempo até o primeiro quadro não medido")
+        return
+    medir_janela(args.execucoes)
+
+
+if __name__ == "__main__":
+    main()
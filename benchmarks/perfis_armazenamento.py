@@ -0,0 +1,131 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from sqlalchemy.exc import OperationalError
+
+# Compara os perfis de armazenamento (biblioteca.armazenamento.PERFIS) no mesmo volume de dados.
+# Cada perfil roda em um processo próprio, com o banco e o perfil passados pelas
+# variáveis BIBLIOTECA_BANCO e BIBLIOTECA_PERFIL, e mede:
+#   - commits/s de cadastros individuais (sensível a synchronous e journal_mode);
+#   - páginas/s da grade de livros com várias threads lendo;
+#   - a mesma leitura com um escritor gravando ao mesmo tempo (p99 da página), contando
+#     as operações que falharam com "database is locked".
+#
+#   python -m benchmarks.perfis_armazenamento --livros 100000 --segundos 5
+
+
+def percentil(valores, fracao):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(fracao * len(ordenados)))] if ordenados else 0.0
+
+
+def povoar(nucleo, quantidade):
+    from sqlalchemy import insert
+    with nucleo.engine.begin() as conexao:
+        conexao.execute(insert(nucleo.Autor), [{'nome': f'Autor {i}', 'biografia': 'Biografia'} for i in range(1000)])
+        conexao.execute(insert(nucleo.Genero), [{'nome': f'Gênero {i}'} for i in range(50)])
+        conexao.execute(insert(nucleo.Livro), [
+            {'titulo': f'Livro {i}', 'isbn': f'isbn-{i}', 'autor_id': i % 1000 + 1, 'genero_id': i % 50 + 1}
+            for i in range(quantidade)
+        ])
+
+
+def ler_paginas(nucleo, total_livros, fim, latencias, falhas):
+    sorteio = random.Random(threading.get_ident())
+    while time.perf_counter() < fim:
+        inicio = time.perf_counter()
+        try:
+            nucleo.listar_livros_detalhado(sorteio.randrange(total_livros))
+        except OperationalError:
+            falhas.append(1)
+            continue
+        latencias.append(time.perf_counter() - inicio)
+
+
+def medir_leitura(nucleo, total_livros, threads, segundos, escrever=False):
+    latencias, falhas, gravacoes = [], [], [0]
+    fim = time.perf_counter() + segundos
+
+    def escritor():
+        while time.perf_counter() < fim:
+            try:
+                nucleo.adicionar_autor(f'Concorrente {gravacoes[0]}', 'Biografia')
+                gravacoes[0] += 1
+            except OperationalError:
+                nucleo.session.rollback()
+                falhas.append(1)
+        nucleo.session.remove()
+
+    trabalhadores = [threading.Thread(target=ler_paginas, args=(nucleo, total_livros, fim, latencias, falhas))
+                     for _ in range(threads)]
+    if escrever:
+        trabalhadores.append(threading.Thread(target=escritor))
+    for trabalhador in trabalhadores:
+        trabalhador.start()
+    for trabalhador in trabalhadores:
+        trabalhador.join()
+    return len(latencias) / segundos, percentil(latencias, 0.99), gravacoes[0] / segundos, len(falhas)
+
+
+def trabalhador(livros, cadastros, threads, segundos):
+    # Roda dentro do processo do perfil; BIBLIOTECA_* já estão no ambiente
+    from biblioteca import nucleo
+    nucleo.iniciar()
+    povoar(nucleo, livros)
+
+    inicio = time.perf_counter()
+    for i in range(cadastros):
+        nucleo.adicionar_genero(f'Cadastro {i}')
+    commits_s = cadastros / (time.perf_counter() - inicio)
+
+    paginas_s, p99, _, _ = medir_leitura(nucleo, livros, threads, segundos)
+    paginas_mistas_s, p99_misto, gravacoes_s, falhas = medir_leitura(nucleo, livros, threads, segundos, escrever=True)
+    print(json.dumps({
+        'commits_s': commits_s, 'paginas_s': paginas_s, 'p99_ms': p99 * 1000,
+        'paginas_mistas_s': paginas_mistas_s, 'p99_misto_ms': p99_misto * 1000, 'gravacoes_s': gravacoes_s,
+        'falhas': falhas,
+    }))
+
+
+def main():
+    from biblioteca.armazenamento import PERFIS
+
+    parser = argparse.ArgumentParser(description="Compara os perfis de armazenamento SQLite")
+    parser.add_argument('--perfis', nargs='+', default=list(PERFIS), choices=list(PERFIS))
+    parser.add_argument('--livros', type=int, default=100000)
+    parser.add_argument('--cadastros', type=int, default=500, help="commits individuais medidos")
+    parser.add_argument('--threads', type=int, default=4, help="threads de leitura")
+    parser.add_argument('--segundos', type=float, default=5)
+    parser.add_argument('--trabalhador', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.trabalhador:
+        trabalhador(args.livros, args.cadastros, args.threads, args.segundos)
+        return
+
+    print(f"{'perfil':<12} {'commits/s':>10} {'páginas/s':>10} {'p99 ms':>8} "
+          f"{'pág/s c/ escrita':>17} {'p99 ms':>8} {'gravações/s':>12} {'bloqueios':>10}")
+    for perfil in args.perfis:
+        with tempfile.TemporaryDirectory() as diretorio:
+            ambiente = dict(os.environ, BIBLIOTECA_PERFIL=perfil, BIBLIOTECA_LEITORES=str(args.threads),
+                            BIBLIOTECA_BANCO=os.path.join(diretorio, 'biblioteca.db'))
+            saida = subprocess.run(
+                [sys.executable, '-m', 'benchmarks.perfis_armazenamento', '--trabalhador',
+                 '--livros', str(args.livros), '--cadastros', str(args.cadastros),
+                 '--threads', str(args.threads), '--segundos', str(args.segundos)],
+                env=ambiente, capture_output=True, text=True, check=True,
+            )
+            r = json.loads(saida.stdout.strip().splitlines()[-1])
+            print(f"{perfil:<12} {r['commits_s']:>10.0f} {r['paginas_s']:>10.0f} {r['p99_ms']:>8.1f} "
+                  f"{r['paginas_mistas_s']:>17.0f} {r['p99_misto_ms']:>8.1f} {r['gravacoes_s']:>12.0f} {r['falhas']:>10}")
+
+
+if __name__ == "__main__":
+    main()
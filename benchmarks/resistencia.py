@@ -0,0 +1,175 @@
+import argparse
+import gc
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+
+# Teste de resistência: executa muitas operações mistas de balcão (cadastros, empréstimos,
+# devoluções, transferências, edições, listagens, buscas e sugestões) no mesmo processo e
+# mostra a memória residente ao longo do tempo. Com as unidades de trabalho do núcleo, a
+# sessão é fechada depois de cada ação e a memória deve ficar estável depois do
+# aquecimento. Também confere que uma leitura feita depois da gravação de outra thread
+# (outro balcão) já vê o valor novo, enquanto uma sessão mantida aberta durante a gravação
+# continua com o objeto velho do mapa de identidade.
+# Termina com código 1 se a memória variar mais que --limite-crescimento depois do
+# aquecimento, se alguma amostra encontrar sessão aberta ou se a leitura vier velha.
+#
+#   python -m benchmarks.resistencia --operacoes 100000 --limite-crescimento 10
+
+
+def memoria_residente_mb():
+    # /proc/self/statm no Linux; fora dele, o pico informado pelo getrusage
+    try:
+        with open('/proc/self/statm') as arquivo:
+            return int(arquivo.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except OSError:
+        divisor = 2 ** 20 if sys.platform == 'darwin' else 2 ** 10
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / divisor
+
+
+def operacoes(nucleo, sorteio, tamanhos, contador):
+    def livro():
+        return sorteio.randint(1, tamanhos['livros'])
+
+    def leitor():
+        return sorteio.randint(1, tamanhos['leitores'])
+
+    def emprestimo_ativo():
+        with nucleo.unidade_de_trabalho() as sessao:
+            return sessao.query(nucleo.Emprestimo.leitor_id, nucleo.Livro.titulo) \
+                .join(nucleo.Livro, nucleo.Livro.id == nucleo.Emprestimo.livro_id) \
+                .filter(nucleo.Emprestimo.devolvido == False, nucleo.Emprestimo.leitor_id == leitor()).first()
+
+    def devolver():
+        ativo = emprestimo_ativo()
+        if ativo:
+            nucleo.devolver_emprestimo(*ativo)
+
+    def transferir():
+        ativo = emprestimo_ativo()
+        if ativo:
+            nucleo.transferir_emprestimo(*ativo, leitor())
+
+    def editar():
+        livro_id = livro()
+        nucleo.editar_livro(livro_id, f'Editado {next(contador)}', f'978{livro_id:010d}',
+                            sorteio.randint(1, tamanhos['autores']), sorteio.randint(1, tamanhos['generos']))
+
+    # (peso, operação)
+    return [
+        (20, lambda: nucleo.listar_livros_detalhado(sorteio.randrange(tamanhos['livros']))),
+        (10, lambda: nucleo.listar_emprestimos_agrupados(sorteio.randrange(tamanhos['leitores']))),
+        (10, lambda: nucleo.buscar_livros(sorteio.choice(['amor', 'casa', 'dom', 'tempo', 'vento']))),
+        (10, lambda: nucleo.sugerir_leitores(f'Leitor {sorteio.randint(1, 999)}')),
+        (15, lambda: nucleo.registrar_emprestimo(livro(), leitor())),
+        (10, devolver),
+        (5, transferir),
+        (10, editar),
+        (5, lambda: nucleo.adicionar_leitor(f'Resistência {next(contador)}', f'resistencia{next(contador)}@exemplo.com')),
+        (5, lambda: nucleo.adicionar_autor(f'Resistência {next(contador)}', 'Biografia')),
+    ]
+
+
+def conferir_leitura_atual(nucleo):
+    # Outra thread (outro balcão) renomeia um livro enquanto este balcão o mantém carregado
+    # em uma sessão aberta, como fazia a sessão global antes das unidades de trabalho: ali o
+    # mapa de identidade continua devolvendo o nome antigo. A ação seguinte deste balcão,
+    # em uma unidade de trabalho nova, deve ler o nome novo. Devolve as falhas encontradas.
+    livro_id, titulo = nucleo.listar_livros_detalhado(None, 1)[0][:2]
+    novo = f'{titulo} (renomeado)'
+
+    def outro_balcao():
+        with nucleo.unidade_de_trabalho() as sessao:
+            sessao.get(nucleo.Livro, livro_id).titulo = novo
+            sessao.commit()
+
+    # Ação anterior deste balcão; se a unidade não descartasse a sessão, ela seguraria a
+    # única conexão de escrita e o outro balcão não conseguiria gravar
+    with nucleo.unidade_de_trabalho() as sessao:
+        sessao.get(nucleo.Livro, livro_id)
+
+    falhas = []
+    with nucleo.SessaoLeitura() as aberta:
+        # A referência mantém o objeto no mapa de identidade, que só guarda referências fracas
+        carregado = aberta.get(nucleo.Livro, livro_id)
+        thread = threading.Thread(target=outro_balcao)
+        thread.start()
+        thread.join(timeout=10)
+        if thread.is_alive():
+            return ["outro balcão não conseguiu gravar: a conexão de escrita ficou presa"]
+        if aberta.get(nucleo.Livro, livro_id) is not carregado or carregado.titulo != titulo:
+            falhas.append("a sessão mantida aberta não ficou velha, então a conferência não prova nada")
+    with nucleo.unidade_de_trabalho() as sessao:
+        if sessao.get(nucleo.Livro, livro_id).titulo != novo:
+            falhas.append("leitura não viu a gravação de outro balcão")
+    return falhas
+
+
+def executar(total, amostras, semente, emprestimos, limite_crescimento):
+    from biblioteca import gerador_dados, nucleo
+    import itertools
+
+    tamanhos = gerador_dados.gerar(emprestimos, semente)
+    sorteio = random.Random(semente)
+    pesos, funcoes = zip(*operacoes(nucleo, sorteio, tamanhos, itertools.count()))
+
+    print(f"{'operações':>10} {'memória MB':>11} {'ops/s':>8} {'sessões abertas':>16}")
+    intervalo = max(1, total // amostras)
+    medidas = []
+    sessoes_abertas = 0
+    inicio = bloco = time.perf_counter()
+    for numero in range(1, total + 1):
+        sorteio.choices(funcoes, pesos)[0]()
+        if numero % intervalo == 0:
+            gc.collect()
+            agora = time.perf_counter()
+            medidas.append(memoria_residente_mb())
+            # Fora de uma unidade de trabalho, a thread não deve ter sessão aberta
+            aberta = int(nucleo.session.registry.has())
+            sessoes_abertas += aberta
+            print(f"{numero:>10} {medidas[-1]:>11.1f} {intervalo / (agora - bloco):>8.0f} {aberta:>16}")
+            bloco = agora
+    duracao = time.perf_counter() - inicio
+
+    # O primeiro quarto das amostras é o aquecimento (caches, planos de consulta, pools)
+    aquecido = medidas[len(medidas) // 4:]
+    crescimento = max(aquecido) - min(aquecido)
+    falhas_leitura = conferir_leitura_atual(nucleo)
+    print(f"\n{total} operações em {duracao:.0f}s ({total / duracao:.0f} ops/s)")
+    print(f"Memória depois do aquecimento: {min(aquecido):.1f} a {max(aquecido):.1f} MB "
+          f"(variação de {crescimento:.1f} MB)")
+    print(f"Leitura vê a gravação de outro balcão: {'NÃO' if falhas_leitura else 'sim'}")
+
+    falhas = []
+    if crescimento > limite_crescimento:
+        falhas.append(f"memória variou {crescimento:.1f} MB depois do aquecimento (limite {limite_crescimento:.1f})")
+    if sessoes_abertas:
+        falhas.append(f"{sessoes_abertas} amostra(s) com sessão aberta")
+    return falhas + falhas_leitura
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de resistência com operações mistas")
+    parser.add_argument('--operacoes', type=int, default=100000)
+    parser.add_argument('--amostras', type=int, default=20, help="medições de memória ao longo do teste")
+    parser.add_argument('--emprestimos', type=int, default=10000, help="volume inicial (ver gerador_dados)")
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--limite-crescimento', type=float, default=10.0,
+                        help="variação de memória aceita depois do aquecimento, em MB (padrão: 10)")
+    parser.add_argument('--banco', help="arquivo do banco (padrão: um arquivo temporário)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        os.environ['BIBLIOTECA_BANCO'] = args.banco or os.path.join(diretorio, 'resistencia.db')
+        falhas = executar(args.operacoes, args.amostras, args.semente, args.emprestimos, args.limite_crescimento)
+    if falhas:
+        print(f"Falhou: {'; '.join(falhas)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
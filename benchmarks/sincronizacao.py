@@ -0,0 +1,123 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+
+# Sincronização entre filiais (biblioteca.sincronizacao) em bancos de tamanhos diferentes.
+# Para cada volume, a filial "norte" é gerada, enviada por inteiro à filial "sul" e depois
+# recebe o mesmo número de alterações (edições de livros, leitores novos, empréstimos e
+# devoluções); mede-se o pacote completo e o pacote só com as alterações. O pacote de
+# alterações deve custar o mesmo em qualquer volume. Cada etapa roda em um processo
+# próprio, com o banco da filial em BIBLIOTECA_BANCO.
+#
+#   python -m benchmarks.sincronizacao --volumes 10000 100000 --alteracoes 1000
+
+
+def alterar(nucleo, quantidade, semente):
+    from sqlalchemy import select
+
+    sorteio = random.Random(semente)
+    with nucleo.SessaoLeitura() as leitura:
+        livros = leitura.scalars(select(nucleo.Livro.id)).all()
+        leitores = leitura.scalars(select(nucleo.Leitor.id)).all()
+        ativos = leitura.scalars(select(nucleo.Emprestimo.id).where(nucleo.Emprestimo.devolvido == False)).all()
+        emprestados = set(leitura.scalars(
+            select(nucleo.Emprestimo.livro_id).where(nucleo.Emprestimo.devolvido == False)).all())
+    livres = [livro_id for livro_id in livros if livro_id not in emprestados]
+    sorteio.shuffle(livres)
+    sorteio.shuffle(ativos)
+
+    # (peso, operação) sobre linhas distintas, para que cada alteração seja um registro
+    edicoes = iter(sorteio.sample(livros, quantidade))
+    operacoes = [
+        (4, lambda numero: nucleo.editar_livro(next(edicoes), f'Editado {numero}', f'ed-{numero}', None, None)),
+        (2, lambda numero: nucleo.adicionar_leitor(f'Sincronia {numero}', f'sincronia{numero}@exemplo.com')),
+        (2, lambda numero: nucleo.emprestar_livros(sorteio.choice(leitores), [livres.pop()])),
+        (2, lambda numero: nucleo.devolver_emprestimos([ativos.pop()])),
+    ]
+    pesos, funcoes = zip(*operacoes)
+    for numero in range(quantidade):
+        sorteio.choices(funcoes, pesos)[0](numero)
+
+
+def trabalhador(etapa, volume, alteracoes, semente, destino, pacote):
+    # Roda dentro do processo da filial; BIBLIOTECA_BANCO já está no ambiente
+    from biblioteca import gerador_dados, nucleo, sincronizacao
+
+    resultado = {}
+    if etapa == 'gerar':
+        gerador_dados.gerar(volume, semente)
+    elif etapa == 'filial':
+        sincronizacao.definir_filial(destino)
+    elif etapa == 'alterar':
+        nucleo.iniciar()
+        alterar(nucleo, alteracoes, semente)
+    elif etapa in ('completo', 'exportar'):
+        registros, tamanho, segundos = sincronizacao.exportar(destino, pacote, completo=etapa == 'completo')
+        resultado = {'registros': registros, 'tamanho': tamanho, 'segundos': segundos}
+    else:
+        aplicado = sincronizacao.aplicar(pacote)
+        resultado = {'aplicados': aplicado['aplicados'], 'rejeitados': aplicado['rejeitados'],
+                     'segundos': aplicado['segundos']}
+    print(json.dumps(resultado))
+
+
+def executar_etapa(banco, etapa, args, destino='', pacote=''):
+    saida = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.sincronizacao', '--trabalhador', etapa,
+         '--volumes', str(args.volume), '--alteracoes', str(args.alteracoes), '--semente', str(args.semente),
+         '--destino', destino, '--pacote', pacote],
+        env=dict(os.environ, BIBLIOTECA_BANCO=banco), capture_output=True, text=True, check=True,
+    )
+    return json.loads(saida.stdout.strip().splitlines()[-1])
+
+
+def medir_volume(args):
+    with tempfile.TemporaryDirectory() as diretorio:
+        norte, sul = os.path.join(diretorio, 'norte.db'), os.path.join(diretorio, 'sul.db')
+        completo, delta = os.path.join(diretorio, 'completo.jsonl.gz'), os.path.join(diretorio, 'delta.jsonl.gz')
+        executar_etapa(norte, 'gerar', args)
+        executar_etapa(norte, 'filial', args, destino='norte')
+        executar_etapa(sul, 'filial', args, destino='sul')
+
+        exportado = executar_etapa(norte, 'completo', args, destino='sul', pacote=completo)
+        aplicado = executar_etapa(sul, 'aplicar', args, pacote=completo)
+        print(f"{args.volume:>10} {'completo':<12} {exportado['registros']:>10} {exportado['tamanho'] / 1e3:>9.1f} "
+              f"{exportado['segundos']:>12.2f} {aplicado['segundos']:>12.2f}")
+
+        executar_etapa(norte, 'alterar', args)
+        exportado = executar_etapa(norte, 'exportar', args, destino='sul', pacote=delta)
+        aplicado = executar_etapa(sul, 'aplicar', args, pacote=delta)
+        print(f"{args.volume:>10} {'alterações':<12} {exportado['registros']:>10} {exportado['tamanho'] / 1e3:>9.1f} "
+              f"{exportado['segundos']:>12.2f} {aplicado['segundos']:>12.2f}")
+        if aplicado['rejeitados']:
+            print(f"{'':>10} {aplicado['rejeitados']} registros recusados")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Custo da sincronização entre filiais por volume")
+    parser.add_argument('--volumes', type=int, nargs='+', default=[10000, 100000],
+                        help="empréstimos gerados na filial de origem (ver gerador_dados)")
+    parser.add_argument('--alteracoes', type=int, default=1000, help="alterações entre os dois envios")
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--trabalhador', choices=['gerar', 'filial', 'alterar', 'completo', 'exportar', 'aplicar'],
+                        help=argparse.SUPPRESS)
+    parser.add_argument('--destino', help=argparse.SUPPRESS)
+    parser.add_argument('--pacote', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.trabalhador:
+        trabalhador(args.trabalhador, args.volumes[0], args.alteracoes, args.semente, args.destino, args.pacote)
+        return
+
+    print(f"{'volume':>10} {'pacote':<12} {'registros':>10} {'kB':>9} {'exportar (s)':>12} {'aplicar (s)':>12}")
+    for volume in args.volumes:
+        args.volume = volume
+        medir_volume(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import sqlalchemy
+
+from biblioteca import gerador_dados
+from biblioteca.grade import EstadoGrade, buscar_alteracoes, valores_emprestimo, valores_livro
+
+# Suíte de benchmarks das funções públicas do núcleo e da atualização das grades (sem
+# Tkinter), sobre um banco gerado por biblioteca/gerador_dados.py. Cada caso é medido várias vezes
+# e o resultado vai para um JSON; com --comparar, os tempos são confrontados com uma
+# execução anterior e a suíte termina com erro se algum caso ficou mais lento que a
+# tolerância.
+#
+#   python -m benchmarks.suite --tamanho 10k --saida base.json
+#   python -m benchmarks.suite --tamanho 10k --saida atual.json --comparar base.json
+
+# Diferenças absolutas abaixo disso são ruído de medição, não regressão
+PISO_REGRESSAO_MS = 0.5
+
+
+def medir(funcao, repeticoes, preparar=None):
+    # preparar roda fora da medição e devolve os argumentos da chamada (ou None). Com
+    # mais de uma repetição, a primeira chamada só aquece caches e conexões; o coletor de
+    # lixo fica desligado durante as chamadas medidas para não somar pausas ao acaso
+    aquecer = repeticoes > 1
+    tempos = []
+    for repeticao in range(repeticoes + aquecer):
+        argumentos = (preparar() if preparar else None) or ()
+        gc.disable()
+        try:
+            inicio = time.perf_counter()
+            funcao(*argumentos)
+            duracao = (time.perf_counter() - inicio) * 1000
+        finally:
+            gc.enable()
+        if repeticao or not aquecer:
+            tempos.append(duracao)
+    tempos.sort()
+    return {
+        'repeticoes': repeticoes,
+        'mediana_ms': statistics.median(tempos),
+        'p95_ms': tempos[min(len(tempos) - 1, int(0.95 * len(tempos)))],
+        'min_ms': tempos[0],
+    }
+
+
+def casos(nucleo, tamanhos, sorteio, repeticoes, repeticoes_completas):
+    # Gera (nome, funcao, repeticoes, preparar) na ordem de execução; os casos que gravam
+    # usam valores novos a cada repetição para não esbarrar nas restrições de unicidade
+    from sqlalchemy import func
+    contador = iter(range(1, sys.maxsize))
+    session = nucleo.session
+
+    def ultimo_id(modelo):
+        return session.query(func.max(modelo.id)).scalar()
+
+    def livro_qualquer():
+        return sorteio.randint(1, tamanhos['livros'])
+
+    def leitor_qualquer():
+        return sorteio.randint(1, tamanhos['leitores'])
+
+    def novo_livro():
+        n = next(contador)
+        nucleo.adicionar_livro(f'Bench {n}', f'bench-{n}', sorteio.randint(1, tamanhos['autores']),
+                               sorteio.randint(1, tamanhos['generos']))
+        return ultimo_id(nucleo.Livro)
+
+    def livro_emprestado():
+        livro_id, leitor_id = novo_livro(), leitor_qualquer()
+        nucleo.registrar_emprestimo(livro_id, leitor_id)
+        return leitor_id, session.get(nucleo.Livro, livro_id).titulo
+
+    def args_editar_livro():
+        livro_id = livro_qualquer()
+        return (livro_id, f'Editado {next(contador)}', f'978{livro_id:010d}',
+                sorteio.randint(1, tamanhos['autores']), sorteio.randint(1, tamanhos['generos']))
+
+    def args_editar_leitor():
+        leitor_id = leitor_qualquer()
+        return leitor_id, f'Leitor editado {next(contador)}', f'leitor{leitor_id}@exemplo.com'
+
+    def autor_descartavel():
+        nucleo.adicionar_autor(f'Excluir {next(contador)}', '')
+        return (ultimo_id(nucleo.Autor),)
+
+    def genero_descartavel():
+        nucleo.adicionar_genero(f'Excluir {next(contador)}')
+        return (ultimo_id(nucleo.Genero),)
+
+    def leitor_descartavel():
+        nucleo.adicionar_leitor('Excluir', f'excluir{next(contador)}@exemplo.com')
+        return (ultimo_id(nucleo.Leitor),)
+
+    # Cadastros
+    yield 'adicionar_autor', nucleo.adicionar_autor, repeticoes, \
+        lambda: (f'Autor bench {next(contador)}', 'Biografia')
+    yield 'adicionar_genero', nucleo.adicionar_genero, repeticoes, lambda: (f'Gênero bench {next(contador)}',)
+    yield 'adicionar_leitor', nucleo.adicionar_leitor, repeticoes, \
+        lambda: ('Leitor bench', f'bench{next(contador)}@exemplo.com')
+    yield 'adicionar_livro', novo_livro, repeticoes, None
+
+    # Edições de registros existentes (mantendo isbn e email gerados)
+    yield 'editar_livro', nucleo.editar_livro, repeticoes, args_editar_livro
+    yield 'editar_autor', nucleo.editar_autor, repeticoes, \
+        lambda: (sorteio.randint(1, tamanhos['autores']), f'Autor editado {next(contador)}', 'Biografia')
+    yield 'editar_genero', nucleo.editar_genero, repeticoes, \
+        lambda: (sorteio.randint(1, tamanhos['generos']), f'Gênero editado {next(contador)}')
+    yield 'editar_leitor', nucleo.editar_leitor, repeticoes, args_editar_leitor
+
+    # Exclusões de registros criados para o caso
+    yield 'excluir_livro', nucleo.excluir_livro, repeticoes, lambda: (novo_livro(),)
+    yield 'excluir_autor', nucleo.excluir_autor, repeticoes, autor_descartavel
+    yield 'excluir_genero', nucleo.excluir_genero, repeticoes, genero_descartavel
+    yield 'excluir_leitor', nucleo.excluir_leitor, repeticoes, leitor_descartavel
+
+    # Empréstimos
+    yield 'registrar_emprestimo', nucleo.registrar_emprestimo, repeticoes, \
+        lambda: (novo_livro(), leitor_qualquer())
+    yield 'devolver_emprestimo', nucleo.devolver_emprestimo, repeticoes, livro_emprestado
+    yield 'transferir_emprestimo', nucleo.transferir_emprestimo, repeticoes, \
+        lambda: livro_emprestado() + (leitor_qualquer(),)
+
+    # Listagens completas (carregam a tabela inteira)
+    for nome in ('listar_livros', 'listar_autores', 'listar_generos', 'listar_leitores', 'listar_emprestimos'):
+        yield nome, getattr(nucleo, nome), repeticoes_completas, session.expunge_all
+
+    # Páginas das grades: a primeira e uma posição sorteada
+    for nome, total in (('listar_livros_detalhado', tamanhos['livros']),
+                        ('listar_emprestimos_agrupados', tamanhos['leitores']),
+                        ('listar_autores_paginado', tamanhos['autores']),
+                        ('listar_leitores_paginado', tamanhos['leitores'])):
+        yield f'{nome} (primeira página)', getattr(nucleo, nome), repeticoes, None
+        yield f'{nome} (página sorteada)', getattr(nucleo, nome), repeticoes, \
+            lambda total=total: (sorteio.randrange(total),)
+
+    # Busca textual e sugestões das caixas de autocompletar, com o cache vazio (frio) e
+    # preenchido (quente)
+    def termo_sem_cache():
+        nucleo.cache_opcoes.limpar()
+        return (sorteio.choice(gerador_dados.PALAVRAS),)
+
+    yield 'buscar_livros', nucleo.buscar_livros, repeticoes, \
+        lambda: (f'{sorteio.choice(gerador_dados.PALAVRAS)} {sorteio.choice(gerador_dados.PALAVRAS)[:3]}',)
+    yield 'buscar_opcoes_livros (frio)', nucleo.buscar_opcoes_livros, repeticoes, termo_sem_cache
+    yield 'buscar_opcoes_livros (quente)', nucleo.buscar_opcoes_livros, repeticoes, lambda: ('amor',)
+
+    # O que o balcão digita: o começo de um nome gerado (ver gerador_dados), de três letras
+    # até o nome inteiro
+    def prefixo_sem_cache(nome_sorteado):
+        nucleo.cache_opcoes.limpar()
+        nome = nome_sorteado()
+        return (nome[:sorteio.randint(3, len(nome))],)
+
+    sugestoes = (
+        ('sugerir_autores', lambda: f"Autor {sorteio.randint(1, tamanhos['autores'])}", 'Autor 1'),
+        ('sugerir_generos', lambda: f"Gênero {sorteio.randint(1, tamanhos['generos'])}", 'Gên'),
+        ('sugerir_leitores', lambda: f"Leitor {sorteio.randint(1, tamanhos['leitores'])}", 'Leitor 4'),
+        ('sugerir_livros', lambda: sorteio.choice(gerador_dados.PALAVRAS).capitalize(), 'Amo'),
+    )
+    for nome, nome_sorteado, prefixo_fixo in sugestoes:
+        yield f'{nome} (frio)', getattr(nucleo, nome), repeticoes, \
+            lambda nome_sorteado=nome_sorteado: prefixo_sem_cache(nome_sorteado)
+        yield f'{nome} (quente)', getattr(nucleo, nome), repeticoes, lambda prefixo=prefixo_fixo: (prefixo,)
+
+    # Grades sem interface: carga da primeira página e atualização depois de uma gravação.
+    # preparar carrega a grade e grava uma alteração em uma linha visível; a medição
+    # compara recarregar tudo com aplicar só a alteração, como em main.criar_lista_paginada
+    def editar_livro_visivel(grade):
+        livro_id = grade.ids[0]
+        nucleo.editar_livro(livro_id, f'Editado {next(contador)}', f'978{livro_id:010d}', 1, 1)
+
+    def emprestar_livro_novo_a_leitor_visivel(grade):
+        nucleo.registrar_emprestimo(novo_livro(), grade.ids[0])
+
+    grades = (
+        # (nome, buscar_pagina, valores_linha, tabelas, dependencias, alteração)
+        ('livros', nucleo.listar_livros_detalhado, valores_livro, ('livros',),
+         {'autores': nucleo.livros_dos_autores, 'generos': nucleo.livros_dos_generos},
+         editar_livro_visivel),
+        ('empréstimos', nucleo.listar_emprestimos_agrupados, valores_emprestimo, ('leitores', 'emprestimos'),
+         {'livros': nucleo.leitores_dos_livros}, emprestar_livro_novo_a_leitor_visivel),
+    )
+    for grade_nome, buscar_pagina, valores_linha, tabelas, dependencias, alterar in grades:
+        def carregar(grade, buscar_pagina=buscar_pagina, valores_linha=valores_linha):
+            grade.reiniciar(nucleo.registro_alteracoes.seq_atual())
+            pagina = [valores_linha(linha) for linha in buscar_pagina(None, nucleo.TAMANHO_PAGINA)]
+            grade.receber_pagina(pagina, nucleo.TAMANHO_PAGINA)
+
+        def atualizar(grade, buscar_pagina=buscar_pagina, valores_linha=valores_linha, tabelas=tabelas,
+                      dependencias=dependencias, carregar=carregar):
+            def buscar_linhas(ids):
+                return [valores_linha(linha) for linha in buscar_pagina(None, len(ids), ids=ids)]
+            nova_seq, linhas, removidos = buscar_alteracoes(nucleo.registro_alteracoes, grade.seq, tabelas,
+                                                            dependencias, buscar_linhas, grade.ultimo_id)
+            if linhas is None:
+                carregar(grade)
+            else:
+                grade.seq = nova_seq
+                grade.aplicar_alteracoes(linhas, removidos)
+
+        def preparar(alterar=alterar, carregar=carregar):
+            grade = EstadoGrade()
+            carregar(grade)
+            alterar(grade)
+            return (grade,)
+
+        yield f'grade de {grade_nome}: recarga completa', carregar, repeticoes, preparar
+        yield f'grade de {grade_nome}: atualização incremental', atualizar, repeticoes, preparar
+
+    # Por último, porque move todos os empréstimos devolvidos para o arquivo
+    yield 'arquivar_emprestimos', nucleo.arquivar_emprestimos, 1, None
+
+
+def executar(emprestimos, semente, repeticoes, repeticoes_completas, banco=None):
+    diretorio = None
+    if banco is None:
+        diretorio = tempfile.TemporaryDirectory()
+        banco = os.path.join(diretorio.name, 'biblioteca.db')
+    os.environ['BIBLIOTECA_BANCO'] = banco
+    from biblioteca import nucleo
+
+    inicio = time.perf_counter()
+    tamanhos = gerador_dados.gerar(emprestimos, semente)
+    print(f"Banco gerado em {time.perf_counter() - inicio:.1f}s: "
+          + ', '.join(f"{quantidade} {tabela}" for tabela, quantidade in tamanhos.items()), file=sys.stderr)
+
+    sorteio = random.Random(semente)
+    resultados = {}
+    for nome, funcao, vezes, preparar in casos(nucleo, tamanhos, sorteio, repeticoes, repeticoes_completas):
+        resultados[nome] = medir(funcao, vezes, preparar)
+        print(f"{nome:<58} {resultados[nome]['mediana_ms']:>10.3f} ms", file=sys.stderr)
+    nucleo.session.remove()
+    if diretorio:
+        diretorio.cleanup()
+
+    return {
+        'meta': {
+            'data': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'sqlalchemy': sqlalchemy.__version__,
+            'sqlite': sqlite3.sqlite_version,
+            'plataforma': platform.platform(),
+            'perfil': nucleo.configuracao['perfil'],
+            'semente': semente,
+            'tamanhos': tamanhos,
+        },
+        'casos': resultados,
+    }
+
+
+def comparar(atual, base, tolerancia):
+    # Devolve os casos cuja mediana piorou mais que a tolerância (fração) em relação à base
+    regressoes = []
+    print(f"{'caso':<58} {'base ms':>10} {'atual ms':>10} {'variação':>9}")
+    for nome, medida in atual['casos'].items():
+        if nome not in base['casos']:
+            continue
+        anterior, agora = base['casos'][nome]['mediana_ms'], medida['mediana_ms']
+        variacao = (agora - anterior) / anterior if anterior else 0.0
+        regrediu = variacao > tolerancia and agora - anterior > PISO_REGRESSAO_MS
+        print(f"{nome:<58} {anterior:>10.3f} {agora:>10.3f} {variacao:>+8.0%}{'  REGRESSÃO' if regrediu else ''}")
+        if regrediu:
+            regressoes.append(nome)
+    if base['meta'].get('tamanhos') != atual['meta'].get('tamanhos'):
+        print("Aviso: as execuções usaram volumes de dados diferentes")
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks das funções do núcleo da biblioteca")
+    grupo = parser.add_mutually_exclusive_group()
+    grupo.add_argument('--tamanho', choices=list(gerador_dados.TAMANHOS), default='10k')
+    grupo.add_argument('--emprestimos', type=int)
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--repeticoes', type=int, default=50)
+    parser.add_argument('--repeticoes-completas', type=int, default=5,
+                        help="repetições das listagens que carregam a tabela inteira (padrão: 5)")
+    parser.add_argument('--banco', help="arquivo vazio onde gerar o banco (padrão: diretório temporário)")
+    parser.add_argument('--saida', default='benchmark.json')
+    parser.add_argument('--comparar', metavar='BASE', help="JSON de uma execução anterior")
+    parser.add_argument('--tolerancia', type=float, default=0.5,
+                        help="piora relativa aceita antes de apontar regressão (padrão: 0.5)")
+    args = parser.parse_args()
+
+    resultado = executar(args.emprestimos or gerador_dados.TAMANHOS[args.tamanho], args.semente,
+                         args.repeticoes, args.repeticoes_completas, args.banco)
+    with open(args.saida, 'w', encoding='utf-8') as arquivo:
+        json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+    print(f"Resultados gravados em {args.saida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as arquivo:
+            regressoes = comparar(resultado, json.load(arquivo), args.tolerancia)
+        if regressoes:
+            print(f"{len(regressoes)} caso(s) com regressão: {', '.join(regressoes)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
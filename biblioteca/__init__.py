@@ -0,0 +1,3 @@
+# Sistema de biblioteca: interface Tkinter (app), núcleo CRUD (nucleo) e ferramentas de
+# linha de comando (importador, servidor, gerador_dados). Nenhum módulo abre o banco ao
+# ser importado; a interface é aberta com "python -m biblioteca".
@@ -0,0 +1,92 @@
+import threading
+from collections import deque
+from itertools import chain
+
+# Registro em memória das linhas inseridas, atualizadas e removidas por este processo,
+# numerado por uma sequência crescente. As grades guardam a sequência da última
+# atualização e pedem só o que mudou desde então, em vez de recarregar tudo.
+#
+# Alterações feitas por flush do ORM são registradas automaticamente. UPDATE/DELETE em
+# massa (session.execute(delete(...))) não passam pelo flush: quem os executa deve chamar
+# anotar_alteracoes com os ids afetados antes do commit.
+
+INSERIDO = 'inserido'
+ATUALIZADO = 'atualizado'
+REMOVIDO = 'removido'
+
+
+class RegistroAlteracoes:
+    def __init__(self, capacidade=10000):
+        self._entradas = deque(maxlen=capacidade)
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def seq_atual(self):
+        with self._lock:
+            return self._seq
+
+    def registrar(self, alteracoes):
+        # alteracoes: iterável de (tabela, chave, operacao)
+        with self._lock:
+            for tabela, chave, operacao in alteracoes:
+                self._seq += 1
+                self._entradas.append((self._seq, tabela, chave, operacao))
+
+    def desde(self, seq, tabelas):
+        # Devolve (seq_atual, {(tabela, chave): operacao}) com a última operação de cada
+        # chave; se o histórico desde seq já foi descartado, devolve (seq_atual, None)
+        with self._lock:
+            if self._entradas and self._entradas[0][0] > seq + 1:
+                return self._seq, None
+            alteracoes = {}
+            for numero, tabela, chave, operacao in reversed(self._entradas):
+                if numero <= seq:
+                    break
+                if tabela in tabelas:
+                    alteracoes.setdefault((tabela, chave), operacao)
+            return self._seq, alteracoes
+
+
+def anotar_alteracoes(sessao, tabela, chaves, operacao):
+    sessao.info.setdefault('alteracoes', []).extend((tabela, chave, operacao) for chave in chaves)
+
+
+def registrar_ao_confirmar(registro, fabrica_sessao, agrupamentos=None):
+    # agrupamentos: {tabela: coluna} para tabelas que aparecem agrupadas em outra grade;
+    # a alteração é registrada com o valor da coluna (antes e depois) como chave.
+    # Ex.: {'emprestimos': 'leitor_id'} para a grade de empréstimos por leitor.
+    # O SQLAlchemy só é importado aqui: a interface usa as constantes deste módulo (via
+    # grade.py) antes de o núcleo ser carregado
+    from sqlalchemy import event, inspect
+
+    agrupamentos = agrupamentos or {}
+
+    def _chaves(objeto):
+        tabela = objeto.__table__.name
+        coluna = agrupamentos.get(tabela)
+        if coluna is None:
+            return [objeto.id]
+        historico = inspect(objeto).attrs[coluna].history
+        return [valor for valor in chain(historico.deleted, historico.unchanged, historico.added)
+                if valor is not None]
+
+    @event.listens_for(fabrica_sessao, 'after_flush')
+    def registrar_flush(sessao, contexto):
+        for operacao, objetos in ((INSERIDO, sessao.new), (ATUALIZADO, sessao.dirty), (REMOVIDO, sessao.deleted)):
+            for objeto in objetos:
+                if operacao == ATUALIZADO and not sessao.is_modified(objeto):
+                    continue
+                tabela = objeto.__table__.name
+                # Na grade agrupada a linha do grupo continua existindo: é uma atualização
+                operacao_linha = ATUALIZADO if tabela in agrupamentos else operacao
+                anotar_alteracoes(sessao, tabela, _chaves(objeto), operacao_linha)
+
+    @event.listens_for(fabrica_sessao, 'after_commit')
+    def publicar(sessao):
+        alteracoes = sessao.info.pop('alteracoes', None)
+        if alteracoes:
+            registro.registrar(alteracoes)
+
+    @event.listens_for(fabrica_sessao, 'after_rollback')
+    def descartar(sessao):
+        sessao.info.pop('alteracoes', None)
@@ -0,0 +1,1021 @@
+import argparse
+import contextlib
+import tkinter as tk
+from tkinter import filedialog, messagebox, simpledialog, ttk
+
+from .autocompletar import Autocompletar
+from .grade import EstadoGrade, INSERIR, ATUALIZAR, buscar_alteracoes, valores_emprestimo, valores_livro
+from .instrumentacao import Instrumentacao, definir_acao
+from .relatorios import RELATORIOS, LIMITE_RELATORIO
+from .tarefas import ExecutorBD
+
+# Núcleo (SQLAlchemy, modelos e funções CRUD), importado e iniciado em segundo plano
+# depois que a janela principal aparece; até lá os botões ficam desabilitados
+nucleo = None
+# Executor de tarefas de banco criado junto com a janela principal (ver tarefas.py)
+executor = None
+# Instrumentação das consultas SQL, ligada pela opção --instrumentar (ver instrumentacao.py)
+instrumentacao_sql = None
+
+def mostrar_erro(erro):
+    messagebox.showerror("Erro", f"Falha ao acessar o banco de dados: {erro}")
+
+# Caixa de autocompletar (ver autocompletar.py) com as sugestões de uma função do núcleo
+def criar_autocompletar(janela, sugerir):
+    return Autocompletar(janela, executor, sugerir, ao_falhar=mostrar_erro)
+
+# Ids das linhas selecionadas (o iid de cada linha é o id do registro)
+def ids_selecionados(lista):
+    return [int(iid) for iid in lista.selection()]
+
+# Id da linha a editar: None se nenhuma ou várias linhas estiverem selecionadas
+def id_unico_selecionado(lista):
+    ids = ids_selecionados(lista)
+    return ids[0] if len(ids) == 1 else None
+
+# Pede confirmação antes de uma operação sobre várias linhas
+def confirmar_em_massa(ids, descricao):
+    return len(ids) == 1 or messagebox.askyesno("Confirmar", f"{descricao} {len(ids)} registros selecionados?")
+
+def informar_exclusao(pedidos, removidos, entidade, motivo_mantidos=""):
+    mensagem = f"{len(removidos)} {entidade} removido(s)."
+    if len(removidos) < len(pedidos):
+        mensagem += f" {len(pedidos) - len(removidos)} mantido(s){motivo_mantidos}."
+    messagebox.showinfo("Sucesso", mensagem)
+
+# Lista virtualizada: o Treeview recebe só a primeira página e as seguintes são
+# buscadas quando a rolagem se aproxima do fim. Depois de uma gravação, a grade aplica
+# só as linhas alteradas desde a última atualização (ver alteracoes.py e grade.py); o
+# restante das linhas, a rolagem e a seleção ficam como estão.
+#   tabelas: tabelas do registro de alterações cujas chaves são os ids das linhas
+#   dependencias: {tabela: buscar_dependentes} para tabelas exibidas nas linhas; uma
+#     alteração nelas atualiza só as linhas carregadas que a mostram (ver grade.py)
+#   ao_exibir_linha(registro_id, valores): chamada depois que uma linha entra ou muda
+# Retorna as funções (atualizar, recarregar).
+def criar_lista_paginada(lista, barra_rolagem, buscar_pagina, valores_linha, tabelas=(), dependencias=None,
+                         ao_exibir_linha=None):
+    grade = EstadoGrade()
+    dependencias = dependencias or {}
+    controle = {'ocupada': False, 'atualizar_depois': False}
+    chave = ('lista', str(lista))
+
+    def buscar(apos_id):
+        return [valores_linha(registro) for registro in buscar_pagina(apos_id, nucleo.TAMANHO_PAGINA)]
+
+    def buscar_linhas(ids):
+        return [valores_linha(registro) for registro in buscar_pagina(None, len(ids), ids=ids)]
+
+    def buscar_alteracoes_grade(seq, ate_id):
+        return buscar_alteracoes(nucleo.registro_alteracoes, seq, tabelas, dependencias, buscar_linhas, ate_id)
+
+    def aplicar(operacoes):
+        for operacao in operacoes:
+            if operacao[0] == INSERIR:
+                _, indice, registro_id, valores = operacao
+                lista.insert("", indice, iid=str(registro_id), values=valores)
+            elif operacao[0] == ATUALIZAR:
+                _, registro_id, valores = operacao
+                lista.item(str(registro_id), values=valores)
+            else:
+                lista.delete(str(operacao[1]))
+                continue
+            if ao_exibir_linha:
+                ao_exibir_linha(registro_id, valores)
+
+    def liberar():
+        controle['ocupada'] = False
+        if controle['atualizar_depois']:
+            controle['atualizar_depois'] = False
+            atualizar()
+
+    def exibir_pagina(pagina):
+        if lista.winfo_exists():
+            aplicar(grade.receber_pagina(pagina, nucleo.TAMANHO_PAGINA))
+            liberar()
+
+    def exibir_alteracoes(resultado):
+        nova_seq, linhas, removidos = resultado
+        controle['ocupada'] = False
+        if linhas is None:
+            recarregar()
+        elif lista.winfo_exists():
+            grade.seq = nova_seq
+            aplicar(grade.aplicar_alteracoes(linhas, removidos))
+            liberar()
+
+    def falhar(erro):
+        controle['ocupada'] = False
+        mostrar_erro(erro)
+
+    def carregar_proxima_pagina():
+        if grade.esgotada or controle['ocupada']:
+            return
+        controle['ocupada'] = True
+        executor.submeter(buscar, grade.ultimo_id, ao_concluir=exibir_pagina, ao_falhar=falhar, chave=chave)
+
+    def ao_rolar(inicio, fim):
+        barra_rolagem.set(inicio, fim)
+        if float(fim) >= 0.9:
+            lista.after_idle(carregar_proxima_pagina)
+
+    def atualizar():
+        if not lista.winfo_exists():
+            return
+        # Páginas e alterações são buscadas uma de cada vez, para que uma página lida
+        # antes de uma remoção não traga a linha de volta
+        if controle['ocupada']:
+            controle['atualizar_depois'] = True
+            return
+        controle['ocupada'] = True
+        executor.submeter(buscar_alteracoes_grade, grade.seq, grade.ultimo_id, ao_concluir=exibir_alteracoes,
+                          ao_falhar=falhar, chave=chave)
+
+    def recarregar():
+        if not lista.winfo_exists():
+            return
+        # Uma nova carga substitui a que estiver pendente (mesma chave no executor)
+        lista.delete(*lista.get_children())
+        grade.reiniciar(nucleo.registro_alteracoes.seq_atual())
+        controle['ocupada'] = False
+        controle['atualizar_depois'] = False
+        carregar_proxima_pagina()
+
+    lista.configure(yscrollcommand=ao_rolar)
+    barra_rolagem.configure(command=lista.yview)
+    return atualizar, recarregar
+
+
+def abrir_janela_livros():
+    livro_window = tk.Toplevel()
+    livro_window.title("Gerenciar Livros")
+
+    # Com um termo de busca a lista mostra uma única página de resultados por relevância;
+    # sem termo, volta à listagem paginada completa
+    busca = {'termo': ''}
+
+    def buscar_pagina_livros(apos_id, limite, ids=None):
+        if busca['termo'] and ids is None:
+            return nucleo.buscar_livros(busca['termo'], limite) if apos_id is None else []
+        return nucleo.listar_livros_detalhado(apos_id, limite, ids)
+
+    def atualizar_lista_livros():
+        # Os resultados da busca seguem a ordem de relevância, então são refeitos por inteiro
+        if busca['termo']:
+            recarregar_livros()
+        else:
+            atualizar_livros()
+
+    def buscar(event=None):
+        busca['termo'] = entry_busca.get().strip()
+        recarregar_livros()
+
+    def salvar_livro():
+        titulo = entry_titulo.get()
+        isbn = entry_isbn.get()
+        autor_id = combo_autor.id_selecionado()
+        genero_id = combo_genero.id_selecionado()
+        if titulo and isbn and autor_id and genero_id:
+            def concluido(_):
+                messagebox.showinfo("Sucesso", "Livro adicionado com sucesso!")
+                atualizar_lista_livros()
+            executor.submeter(nucleo.adicionar_livro, titulo, isbn, autor_id, genero_id,
+                              ao_concluir=concluido, ao_falhar=mostrar_erro)
+        else:
+            messagebox.showerror("Erro", "Por favor, preencha todos os campos.")
+
+    def remover_livro():
+        ids = ids_selecionados(lista_livros)
+        if ids:
+            if not confirmar_em_massa(ids, "Remover os"):
+                return
+            def concluido(removidos):
+                informar_exclusao(ids, removidos, "livro(s)", " por ter(em) empréstimo ativo")
+                atualizar_lista_livros()
+            executor.submeter(nucleo.excluir_livros, ids, ao_concluir=concluido, ao_falhar=mostrar_erro)
+        else:
+            messagebox.showerror("Erro", "Selecione um livro para remover.")
+
+    # Passa todos os livros selecionados para o autor ou o gênero escolhido na Combobox
+    def reatribuir(reatribuir_livros, combo, descricao):
+        ids = ids_selecionados(lista_livros)
+        destino_id = combo.id_selecionado()
+        if not (ids and destino_id):
+            messagebox.showerror("Erro", f"Selecione os livros e o novo {descricao}.")
+            return
+        if not confirmar_em_massa(ids, f"Alterar o {descricao} dos"):
+            return
+
+        def concluido(alterados):
+            if alterados is None:
+                messagebox.showerror("Erro", f"O {descricao} escolhido não existe.")
+                return
+            messagebox.showinfo("Sucesso", f"{len(alterados)} livro(s) alterado(s).")
+            atualizar_lista_livros()
+
+        executor.submeter(reatribuir_livros, ids, destino_id, ao_concluir=concluido, ao_falhar=mostrar_erro)
+
+    def atualizar_livro():
+        livro_id = id_unico_selecionado(lista_livros)
+        if livro_id is not None:
+            novo_titulo = entry_titulo.get()
+            novo_isbn = entry_isbn.get()
+            autor_id = combo_autor.id_selecionado()
+            genero_id = combo_genero.id_selecionado()
+
+            def concluido(atualizado):
+                if atualizado:
+                    messagebox.showinfo("Sucesso", "Livro atualizado com sucesso!")
+                    atualizar_lista_livros()
+                else:
+                    messagebox.showerror("Erro", "Preencha todos os campos corretamente.")
+
+            if novo_titulo and novo_isbn and autor_id and genero_id:
+                executor.submeter(nucleo.editar_livro, livro_id, novo_titulo, novo_isbn, autor_id, genero_id,
+                                  ao_concluir=concluido, ao_falhar=mostrar_erro)
+            else:
+                messagebox.showerror("Erro", "Preencha todos os campos corretamente.")
+        else:
+            messagebox.showerror("Erro", "Selecione um único livro para atualizar.")
+
+    # Layout da janela de livros
+    tk.Label(livro_window, text="Título do Livro").grid(row=0, column=0)
+    tk.Label(livro_window, text="ISBN do Livro").grid(row=1, column=0)
+    tk.Label(livro_window, text="Autor").grid(row=2, column=0)
+    tk.Label(livro_window, text="Gênero").grid(row=3, column=0)
+
+    entry_titulo = tk.Entry(livro_window)
+    entry_titulo.grid(row=0, column=1)
+
+    entry_isbn = tk.Entry(livro_window)
+    entry_isbn.grid(row=1, column=1)
+
+    combo_autor = criar_autocompletar(livro_window, nucleo.sugerir_autores)
+    combo_autor.grid(row=2, column=1)
+
+    combo_genero = criar_autocompletar(livro_window, nucleo.sugerir_generos)
+    combo_genero.grid(row=3, column=1)
+
+    botao_adicionar_livro = tk.Button(livro_window, text="Adicionar Livro", command=salvar_livro)
+    botao_adicionar_livro.grid(row=4, column=0, columnspan=2)
+
+    botao_remover_livro = tk.Button(livro_window, text="Remover Livro", command=remover_livro)
+    botao_remover_livro.grid(row=5, column=0)
+
+    botao_atualizar_livro = tk.Button(livro_window, text="Atualizar Livro", command=atualizar_livro)
+    botao_atualizar_livro.grid(row=5, column=1)
+
+    botao_reatribuir_autor = tk.Button(livro_window, text="Reatribuir Autor",
+                                       command=lambda: reatribuir(nucleo.reatribuir_autor, combo_autor, "autor"))
+    botao_reatribuir_autor.grid(row=6, column=0)
+
+    botao_reatribuir_genero = tk.Button(livro_window, text="Reatribuir Gênero",
+                                        command=lambda: reatribuir(nucleo.reatribuir_genero, combo_genero, "gênero"))
+    botao_reatribuir_genero.grid(row=6, column=1)
+
+    tk.Label(livro_window, text="Buscar").grid(row=7, column=0)
+    entry_busca = tk.Entry(livro_window)
+    entry_busca.grid(row=7, column=1)
+    entry_busca.bind("<Return>", buscar)
+
+    lista_livros = ttk.Treeview(livro_window, columns=('ID', 'Título', 'ISBN', 'Autor', 'Gênero'), show='headings',
+                                selectmode='extended')
+    lista_livros.heading('ID', text="ID")
+    lista_livros.heading('Título', text="Título")
+    lista_livros.heading('ISBN', text="ISBN")
+    lista_livros.heading('Autor', text="Autor")
+    lista_livros.heading('Gênero', text="Gênero")
+    lista_livros.grid(row=8, column=0, columnspan=2)
+
+    barra_livros = ttk.Scrollbar(livro_window, orient="vertical")
+    barra_livros.grid(row=8, column=2, sticky="ns")
+    atualizar_livros, recarregar_livros = criar_lista_paginada(
+        lista_livros, barra_livros, buscar_pagina_livros, valores_livro,
+        tabelas=('livros',), dependencias={'autores': nucleo.livros_dos_autores, 'generos': nucleo.livros_dos_generos})
+
+    recarregar_livros()
+
+
+def abrir_janela_autores():
+    autor_window = tk.Toplevel()
+    autor_window.title("Gerenciar Autores")
+
+    def atualizar_lista_autores():
+        atualizar_autores()
+
+    def salvar_autor():
+        nome = entry_nome_autor.get()
+        biografia = entry_biografia_autor.get()
+        if nome:
+            def concluido(_):
+                messagebox.showinfo("Sucesso", "Autor adicionado com sucesso!")
+                atualizar_lista_autores()
+            executor.submeter(nucleo.adicionar_autor, nome, biografia, ao_concluir=concluido, ao_falhar=mostrar_erro)
+        else:
+            messagebox.showerror("Erro", "Por favor, preencha o nome do autor.")
+
+    def remover_autor():
+        ids = ids_selecionados(lista_autores)
+        if ids:
+            if not confirmar_em_massa(ids, "Remover os"):
+                return
+            def concluido(removidos):
+                informar_exclusao(ids, removidos, "autor(es)")
+                atualizar_lista_autores()
+            executor.submeter(nucleo.excluir_autores, ids, ao_concluir=concluido, ao_falhar=mostrar_erro)
+        else:
+            messagebox.showerror("Erro", "Selecione um autor para remover.")
+
+    def atualizar_autor():
+        autor_id = id_unico_selecionado(lista_autores)
+        if autor_id is not None:
+            nome = entry_nome_autor.get()
+            biografia = entry_biografia_autor.get()
+
+            def concluido(atualizado):
+                if atualizado:
+                    messagebox.showinfo("Sucesso", "Autor atualizado com sucesso!")
+                    atualizar_lista_autores()
+                else:
+                    messagebox.showerror("Erro", "Preencha todos os campos corretamente.")
+
+            if nome:
+                executor.submeter(nucleo.editar_autor, autor_id, nome, biografia, ao_concluir=concluido, ao_falhar=mostrar_erro)
+            else:
+                messagebox.showerror("Erro", "Preencha todos os campos corretamente.")
+        else:
+            messagebox.showerror("Erro", "Selecione um único autor para atualizar.")
+
+    # Layout da janela de autores
+    tk.Label(autor_window, text="Nome do Autor").grid(row=0, column=0)
+    tk.Label(autor_window, text="Biografia").grid(row=1, column=0)
+
+    entry_nome_autor = tk.Entry(autor_window)
+    entry_nome_autor.grid(row=0, column=1)
+
+    entry_biografia_autor = tk.Entry(autor_window)
+    entry_biografia_autor.grid(row=1, column=1)
+
+    botao_adicionar_autor = tk.Button(autor_window, text="Adicionar Autor", command=salvar_autor)
+    botao_adicionar_autor.grid(row=2, column=0, columnspan=2)
+
+    botao_remover_autor = tk.Button(autor_window, text="Remover Autor", command=remover_autor)
+    botao_remover_autor.grid(row=3, column=0)
+
+    botao_atualizar_autor = tk.Button(autor_window, text="Atualizar Autor", command=atualizar_autor)
+    botao_atualizar_autor.grid(row=3, column=1)
+
+    lista_autores = ttk.Treeview(autor_window, columns=('ID', 'Nome', 'Biografia'), show='headings',
+                                 selectmode='extended')
+    lista_autores.heading('ID', text="ID")
+    lista_autores.heading('Nome', text="Nome")
+    lista_autores.heading('Biografia', text="Biografia")
+    lista_autores.grid(row=4, column=0, columnspan=2)
+
+    barra_autores = ttk.Scrollbar(autor_window, orient="vertical")
+    barra_autores.grid(row=4, column=2, sticky="ns")
+    atualizar_autores, recarregar_autores = criar_lista_paginada(
+        lista_autores, barra_autores, nucleo.listar_autores_paginado, lambda autor: (autor.id, autor.nome, autor.biografia),
+        tabelas=('autores',))
+
+    recarregar_autores()
+
+
+def abrir_janela_generos():
+    genero_window = tk.Toplevel()
+    genero_window.title("Gerenciar Gêneros")
+
+    def atualizar_lista_generos():
+        atualizar_generos()
+
+    def salvar_genero():
+        nome = entry_nome_genero.get()
+        if nome:
+            def concluido(_):
+                messagebox.showinfo("Sucesso", "Gênero adicionado com sucesso!")
+                atualizar_lista_generos()
+            executor.submeter(nucleo.adicionar_genero, nome, ao_concluir=concluido, ao_falhar=mostrar_erro)
+        else:
+            messagebox.showerror("Erro", "Por favor, preencha o nome do gênero.")
+
+    def remover_genero():
+        ids = ids_selecionados(lista_generos)
+        if ids:
+            if not confirmar_em_massa(ids, "Remover os"):
+                return
+            def concluido(removidos):
+                informar_exclusao(ids, removidos, "gênero(s)")
+                atualizar_lista_generos()
+            executor.submeter(nucleo.excluir_generos, ids, ao_concluir=concluido, ao_falhar=mostrar_erro)
+        else:
+            messagebox.showerror("Erro", "Selecione um gênero para remover.")
+
+    def atualizar_genero():
+        genero_id = id_unico_selecionado(lista_generos)
+        if genero_id is not None:
+            nome = entry_nome_genero.get()
+
+            def concluido(atualizado):
+                if atualizado:
+                    messagebox.showinfo("Sucesso", "Gênero atualizado com sucesso!")
+                    atualizar_lista_generos()
+                else:
+                    messagebox.showerror("Erro", "Preencha o nome corretamente.")
+
+            if nome:
+                executor.submeter(nucleo.editar_genero, genero_id, nome, ao_concluir=concluido, ao_falhar=mostrar_erro)
+            else:
+                messagebox.showerror("Erro", "Preencha o nome corretamente.")
+        else:
+            messagebox.showerror("Erro", "Selecione um único gênero para atualizar.")
+
+    # Layout da janela de gêneros
+    tk.Label(genero_window, text="Nome do Gênero").grid(row=0, column=0)
+
+    entry_nome_genero = tk.Entry(genero_window)
+    entry_nome_genero.grid(row=0, column=1)
+
+    botao_adicionar_genero = tk.Button(genero_window, text="Adicionar Gênero", command=salvar_genero)
+    botao_adicionar_genero.grid(row=1, column=0, columnspan=2)
+
+    botao_remover_genero = tk.Button(genero_window, text="Remover Gênero", command=remover_genero)
+    botao_remover_genero.grid(row=2, column=0)
+
+    botao_atualizar_genero = tk.Button(genero_window, text="Atualizar Gênero", command=atualizar_genero)
+    botao_atualizar_genero.grid(row=2, column=1)
+
+    lista_generos = ttk.Treeview(genero_window, columns=('ID', 'Nome'), show='headings', selectmode='extended')
+    lista_generos.heading('ID', text="ID")
+    lista_generos.heading('Nome', text="Nome")
+    lista_generos.grid(row=3, column=0, columnspan=2)
+
+    barra_generos = ttk.Scrollbar(genero_window, orient="vertical")
+    barra_generos.grid(row=3, column=2, sticky="ns")
+    atualizar_generos, recarregar_generos = criar_lista_paginada(
+        lista_generos, barra_generos, nucleo.listar_generos_paginado, lambda genero: (genero.id, genero.nome),
+        tabelas=('generos',))
+
+    recarregar_generos()
+
+
+# Grade de empréstimos em árvore: cada leitor é uma linha (paginada, ver
+# criar_lista_paginada) e os seus empréstimos ativos são linhas filhas, lidas quando o
+# leitor é expandido. O iid de uma linha filha é o id do empréstimo com o prefixo abaixo;
+# devolução e transferência agem sobre os empréstimos selecionados.
+PREFIXO_EMPRESTIMO = 'e'
+
+def abrir_janela_emprestimos():
+    emprestimo_window = tk.Toplevel()
+    emprestimo_window.title("Gerenciar Empréstimos")
+    # Livros a emprestar de uma vez ao leitor: {id: texto exibido}, na ordem de inclusão
+    livros_a_emprestar = {}
+
+    def buscar_livro(event=None):
+        termo = entry_busca_livro.get().strip()
+        if not termo:
+            return
+
+        def exibir(opcoes):
+            if combo_livro.combo.winfo_exists():
+                combo_livro.definir_sugestoes(opcoes, selecionar_primeira=True)
+
+        executor.submeter(nucleo.buscar_opcoes_livros, termo, ao_concluir=exibir, ao_falhar=mostrar_erro,
+                          chave=('busca', str(combo_livro.combo)))
+
+    def adicionar_livro():
+        livro_id = combo_livro.id_selecionado()
+        if not livro_id:
+            messagebox.showerror("Erro", "Selecione um livro para adicionar.")
+        elif livro_id not in livros_a_emprestar:
+            livros_a_emprestar[livro_id] = combo_livro.get().strip()
+            lista_a_emprestar.insert(tk.END, livros_a_emprestar[livro_id])
+
+    def retirar_livros(livro_ids):
+        for livro_id in livro_ids:
+            if livro_id in livros_a_emprestar:
+                lista_a_emprestar.delete(list(livros_a_emprestar).index(livro_id))
+                del livros_a_emprestar[livro_id]
+
+    def remover_livro():
+        ordem = list(livros_a_emprestar)
+        retirar_livros([ordem[indice] for indice in lista_a_emprestar.curselection()])
+
+    def registrar():
+        leitor_id = combo_leitor.id_selecionado()
+        # Sem livros na lista, empresta o livro escolhido na caixa
+        livro_ids = list(livros_a_emprestar) or [livro_id for livro_id in [combo_livro.id_selecionado()] if livro_id]
+        if not (leitor_id and livro_ids):
+            messagebox.showerror("Erro", "Por favor, selecione um leitor e ao menos um livro.")
+            return
+
+        def concluido(emprestados):
+            if emprestados is None:
+                messagebox.showerror("Erro", "Leitor inexistente.")
+            elif not emprestados:
+                messagebox.showerror("Erro", "Livros inexistentes ou já emprestados.")
+            else:
+                mensagem = f"{len(emprestados)} livro(s) emprestado(s)."
+                if len(emprestados) < len(livro_ids):
+                    mensagem += f" {len(livro_ids) - len(emprestados)} indisponível(is), mantido(s) na lista."
+                messagebox.showinfo("Sucesso", mensagem)
+                retirar_livros(emprestados)
+                atualizar_emprestimos()
+
+        executor.submeter(nucleo.emprestar_livros, leitor_id, livro_ids, ao_concluir=concluido, ao_falhar=mostrar_erro)
+
+    def emprestimos_selecionados():
+        return [int(iid[len(PREFIXO_EMPRESTIMO):]) for iid in lista_emprestimos.selection()
+                if iid.startswith(PREFIXO_EMPRESTIMO)]
+
+    def devolver():
+        ids = emprestimos_selecionados()
+        if not ids:
+            messagebox.showerror("Erro", "Expanda o leitor e selecione os empréstimos a devolver.")
+            return
+        if not confirmar_em_massa(ids, "Devolver os"):
+            return
+
+        def concluido(devolvidos):
+            messagebox.showinfo("Sucesso", f"{len(devolvidos)} devolução(ões) registrada(s).")
+            atualizar_emprestimos()
+
+        executor.submeter(nucleo.devolver_emprestimos, ids, ao_concluir=concluido, ao_falhar=mostrar_erro)
+
+    def transferir():
+        ids = emprestimos_selecionados()
+        novo_leitor_id = combo_leitor.id_selecionado()
+        if not (ids and novo_leitor_id):
+            messagebox.showerror("Erro", "Selecione o novo leitor e os empréstimos a transferir.")
+            return
+        if not confirmar_em_massa(ids, "Transferir os"):
+            return
+
+        def concluido(transferidos):
+            if transferidos is None:
+                messagebox.showerror("Erro", "Leitor inexistente.")
+            else:
+                messagebox.showinfo("Sucesso", f"{len(transferidos)} empréstimo(s) transferido(s).")
+                atualizar_emprestimos()
+
+        executor.submeter(nucleo.transferir_emprestimos, ids, novo_leitor_id, ao_concluir=concluido,
+                          ao_falhar=mostrar_erro)
+
+    def carregar_emprestimos_do_leitor(leitor_iid):
+        def exibir(emprestimos):
+            if not (lista_emprestimos.winfo_exists() and lista_emprestimos.exists(leitor_iid)):
+                return
+            lista_emprestimos.delete(*lista_emprestimos.get_children(leitor_iid))
+            for emprestimo_id, livro_id, titulo, data_emprestimo, data_prevista in emprestimos:
+                lista_emprestimos.insert(
+                    leitor_iid, tk.END, iid=f"{PREFIXO_EMPRESTIMO}{emprestimo_id}",
+                    values=(emprestimo_id, f"{livro_id} - {titulo}",
+                            f"{data_emprestimo:%d/%m/%Y} até {data_prevista:%d/%m/%Y}"))
+
+        executor.submeter(nucleo.listar_emprestimos_ativos, int(leitor_iid), ao_concluir=exibir,
+                          ao_falhar=mostrar_erro, chave=('emprestimos', str(lista_emprestimos), leitor_iid))
+
+    def ao_expandir(evento):
+        leitor_iid = lista_emprestimos.focus()
+        if leitor_iid and not leitor_iid.startswith(PREFIXO_EMPRESTIMO):
+            carregar_emprestimos_do_leitor(leitor_iid)
+
+    def ao_exibir_leitor(leitor_id, valores):
+        # Leitor expandido: relê os empréstimos; recolhido: só o marcador que permite expandir
+        leitor_iid = str(leitor_id)
+        if lista_emprestimos.tk.getboolean(lista_emprestimos.item(leitor_iid, 'open')):
+            carregar_emprestimos_do_leitor(leitor_iid)
+            return
+        lista_emprestimos.delete(*lista_emprestimos.get_children(leitor_iid))
+        if valores[2]:
+            lista_emprestimos.insert(leitor_iid, tk.END, values=("", "Carregando...", ""))
+
+    # Layout da janela de empréstimos
+    tk.Label(emprestimo_window, text="Leitor").grid(row=0, column=0)
+    tk.Label(emprestimo_window, text="Buscar Livro").grid(row=1, column=0)
+    tk.Label(emprestimo_window, text="Livro").grid(row=2, column=0)
+    tk.Label(emprestimo_window, text="Livros a Emprestar").grid(row=3, column=0)
+
+    combo_leitor = criar_autocompletar(emprestimo_window, nucleo.sugerir_leitores)
+    combo_leitor.grid(row=0, column=1)
+
+    entry_busca_livro = tk.Entry(emprestimo_window)
+    entry_busca_livro.grid(row=1, column=1)
+    entry_busca_livro.bind("<Return>", buscar_livro)
+
+    combo_livro = criar_autocompletar(emprestimo_window, nucleo.sugerir_livros)
+    combo_livro.grid(row=2, column=1)
+    tk.Button(emprestimo_window, text="Adicionar à Lista", command=adicionar_livro).grid(row=2, column=2)
+
+    lista_a_emprestar = tk.Listbox(emprestimo_window, height=4, selectmode='extended')
+    lista_a_emprestar.grid(row=3, column=1, sticky="ew")
+    tk.Button(emprestimo_window, text="Remover da Lista", command=remover_livro).grid(row=3, column=2)
+
+    botao_registrar = tk.Button(emprestimo_window, text="Registrar Empréstimo", command=registrar)
+    botao_registrar.grid(row=4, column=0, columnspan=2)
+
+    botao_devolver_emprestimo = tk.Button(emprestimo_window, text="Registrar Devolução", command=devolver)
+    botao_devolver_emprestimo.grid(row=5, column=0)
+
+    botao_transferir_emprestimo = tk.Button(emprestimo_window, text="Transferir Empréstimo", command=transferir)
+    botao_transferir_emprestimo.grid(row=5, column=1)
+
+    lista_emprestimos = ttk.Treeview(emprestimo_window, columns=('ID', 'Nome', 'Livros'), show='tree headings')
+    lista_emprestimos.column('#0', width=30, stretch=False)
+    lista_emprestimos.heading('ID', text="ID")
+    lista_emprestimos.heading('Nome', text="Leitor / Livro")
+    lista_emprestimos.heading('Livros', text="Livros Emprestados / Período")
+    lista_emprestimos.grid(row=6, column=0, columnspan=2)
+    lista_emprestimos.bind("<<TreeviewOpen>>", ao_expandir)
+
+    barra_emprestimos = ttk.Scrollbar(emprestimo_window, orient="vertical")
+    barra_emprestimos.grid(row=6, column=2, sticky="ns")
+    atualizar_emprestimos, recarregar_emprestimos = criar_lista_paginada(
+        lista_emprestimos, barra_emprestimos, nucleo.listar_emprestimos_agrupados, valores_emprestimo,
+        tabelas=('leitores', 'emprestimos'), dependencias={'livros': nucleo.leitores_dos_livros},
+        ao_exibir_linha=ao_exibir_leitor)
+
+    recarregar_emprestimos()
+
+
+def abrir_janela_leitores():
+    leitor_window = tk.Toplevel()
+    leitor_window.title("Gerenciar Leitores")
+
+    def atualizar_lista_leitores():
+        atualizar_leitores()
+
+    def salvar_leitor():
+        nome = entry_nome_leitor.get()
+        email = entry_email_leitor.get()
+        if nome and email:
+            def concluido(_):
+                messagebox.showinfo("Sucesso", "Leitor adicionado com sucesso!")
+                atualizar_lista_leitores()
+            executor.submeter(nucleo.adicionar_leitor, nome, email, ao_concluir=concluido, ao_falhar=mostrar_erro)
+        else:
+            messagebox.showerror("Erro", "Por favor, preencha todos os campos.")
+
+    def remover_leitor():
+        ids = ids_selecionados(lista_leitores)
+        if ids:
+            if not confirmar_em_massa(ids, "Remover os"):
+                return
+            def concluido(removidos):
+                informar_exclusao(ids, removidos, "leitor(es)", " por ter(em) empréstimo ativo")
+                atualizar_lista_leitores()
+            executor.submeter(nucleo.excluir_leitores, ids, ao_concluir=concluido, ao_falhar=mostrar_erro)
+        else:
+            messagebox.showerror("Erro", "Selecione um leitor para remover.")
+
+    def atualizar_leitor():
+        leitor_id = id_unico_selecionado(lista_leitores)
+        if leitor_id is not None:
+            nome = entry_nome_leitor.get()
+            email = entry_email_leitor.get()
+
+            def concluido(atualizado):
+                if atualizado:
+                    messagebox.showinfo("Sucesso", "Leitor atualizado com sucesso!")
+                    atualizar_lista_leitores()
+                else:
+                    messagebox.showerror("Erro", "Preencha todos os campos corretamente.")
+
+            if nome and email:
+                executor.submeter(nucleo.editar_leitor, leitor_id, nome, email, ao_concluir=concluido, ao_falhar=mostrar_erro)
+            else:
+                messagebox.showerror("Erro", "Preencha todos os campos corretamente.")
+        else:
+            messagebox.showerror("Erro", "Selecione um único leitor para atualizar.")
+
+    # Layout da janela de leitores
+    tk.Label(leitor_window, text="Nome do Leitor").grid(row=0, column=0)
+    tk.Label(leitor_window, text="Email").grid(row=1, column=0)
+
+    entry_nome_leitor = tk.Entry(leitor_window)
+    entry_nome_leitor.grid(row=0, column=1)
+
+    entry_email_leitor = tk.Entry(leitor_window)
+    entry_email_leitor.grid(row=1, column=1)
+
+    botao_adicionar_leitor = tk.Button(leitor_window, text="Adicionar Leitor", command=salvar_leitor)
+    botao_adicionar_leitor.grid(row=2, column=0, columnspan=2)
+
+    botao_remover_leitor = tk.Button(leitor_window, text="Remover Leitor", command=remover_leitor)
+    botao_remover_leitor.grid(row=3, column=0)
+
+    botao_atualizar_leitor = tk.Button(leitor_window, text="Atualizar Leitor", command=atualizar_leitor)
+    botao_atualizar_leitor.grid(row=3, column=1)
+
+    lista_leitores = ttk.Treeview(leitor_window, columns=('ID', 'Nome', 'Email'), show='headings', selectmode='extended')
+    lista_leitores.heading('ID', text="ID")
+    lista_leitores.heading('Nome', text="Nome")
+    lista_leitores.heading('Email', text="Email")
+    lista_leitores.grid(row=4, column=0, columnspan=2)
+
+    barra_leitores = ttk.Scrollbar(leitor_window, orient="vertical")
+    barra_leitores.grid(row=4, column=2, sticky="ns")
+    atualizar_leitores, recarregar_leitores = criar_lista_paginada(
+        lista_leitores, barra_leitores, nucleo.listar_leitores_paginado, lambda leitor: (leitor.id, leitor.nome, leitor.email),
+        tabelas=('leitores',))
+
+    recarregar_leitores()
+
+
+# Relatórios de circulação, uma aba por relatório. Lê só as tabelas de resumo, então
+# abrir ou atualizar a janela não depende do volume de empréstimos.
+def abrir_janela_relatorios():
+    relatorio_window = tk.Toplevel()
+    relatorio_window.title("Relatórios")
+
+    abas = ttk.Notebook(relatorio_window)
+    abas.grid(row=0, column=0, columnspan=3)
+    listas = {}
+    for nome, (titulo, colunas, _) in RELATORIOS.items():
+        lista = ttk.Treeview(abas, columns=colunas, show='headings')
+        for coluna in colunas:
+            lista.heading(coluna, text=coluna)
+        abas.add(lista, text=titulo)
+        listas[nome] = lista
+
+    tk.Label(relatorio_window, text="Mostrar").grid(row=1, column=0)
+    spin_limite = tk.Spinbox(relatorio_window, from_=5, to=1000, increment=5, width=6)
+    spin_limite.delete(0, "end")
+    spin_limite.insert(0, LIMITE_RELATORIO)
+    spin_limite.grid(row=1, column=1)
+
+    def atualizar_relatorios():
+        try:
+            limite = int(spin_limite.get())
+        except ValueError:
+            limite = LIMITE_RELATORIO
+        for nome, lista in listas.items():
+            def exibir(linhas, lista=lista):
+                if lista.winfo_exists():
+                    lista.delete(*lista.get_children())
+                    for linha in linhas:
+                        lista.insert("", "end", values=tuple(linha))
+            executor.submeter(nucleo.consultar_relatorio, nome, limite, ao_concluir=exibir, ao_falhar=mostrar_erro,
+                              chave=('relatorio', str(lista)))
+
+    def reconstruir():
+        def concluido(_):
+            messagebox.showinfo("Sucesso", "Resumos reconstruídos a partir dos empréstimos.")
+            atualizar_relatorios()
+        executor.submeter(nucleo.reconstruir_resumos, ao_concluir=concluido, ao_falhar=mostrar_erro)
+
+    tk.Button(relatorio_window, text="Atualizar", command=atualizar_relatorios).grid(row=1, column=2)
+    tk.Button(relatorio_window, text="Reconstruir Resumos", command=reconstruir).grid(row=2, column=0, columnspan=3)
+
+    atualizar_relatorios()
+
+
+# Cópia de segurança e exportação (ver copia.py) rodam no executor. A thread de trabalho
+# escreve o texto do progresso em um dicionário, que a janela lê a cada 200 ms.
+def executar_com_progresso(titulo, tarefa, descrever_resultado):
+    janela = tk.Toplevel()
+    janela.title(titulo)
+    rotulo = tk.Label(janela, text="Iniciando...", width=60)
+    rotulo.pack(padx=10, pady=10)
+    progresso = {'texto': None, 'ativo': True}
+
+    def acompanhar():
+        if progresso['ativo'] and janela.winfo_exists():
+            if progresso['texto']:
+                rotulo.configure(text=progresso['texto'])
+            janela.after(200, acompanhar)
+
+    def encerrar():
+        progresso['ativo'] = False
+        if janela.winfo_exists():
+            janela.destroy()
+
+    def concluido(resultado):
+        encerrar()
+        messagebox.showinfo("Sucesso", descrever_resultado(resultado))
+
+    def falhou(erro):
+        encerrar()
+        mostrar_erro(erro)
+
+    executor.submeter(tarefa, progresso, ao_concluir=concluido, ao_falhar=falhou)
+    acompanhar()
+
+def fazer_copia_seguranca():
+    destino = filedialog.asksaveasfilename(title="Cópia de Segurança", defaultextension=".db",
+                                           filetypes=[("Banco SQLite", "*.db")])
+    if not destino:
+        return
+
+    def tarefa(progresso):
+        from . import copia
+        return copia.copiar_banco(
+            destino, lambda copiadas, total: progresso.update(texto=f"{copiadas} de {total} páginas copiadas"))
+
+    def descrever(resultado):
+        _, tamanho, segundos = resultado
+        return f"Cópia concluída: {tamanho / 1e6:.1f} MB em {segundos:.1f}s ({tamanho / 1e6 / max(segundos, 1e-3):.1f} MB/s)."
+
+    executar_com_progresso("Cópia de Segurança", tarefa, descrever)
+
+def exportar_entidade(entidade):
+    destino = filedialog.asksaveasfilename(title=f"Exportar {entidade}", initialfile=f"{entidade}.csv",
+                                           filetypes=[("CSV", "*.csv"), ("JSONL comprimido", "*.jsonl.gz")])
+    if not destino:
+        return
+
+    def tarefa(progresso):
+        from . import copia
+        return copia.exportar(entidade, destino, ao_progredir=lambda linhas: progresso.update(texto=f"{linhas} linhas exportadas"))
+
+    def descrever(resultado):
+        linhas, tamanho, segundos = resultado
+        return (f"{linhas} linhas exportadas ({tamanho / 1e6:.1f} MB) em {segundos:.1f}s "
+                f"({linhas / max(segundos, 1e-3):.0f} linhas/s).")
+
+    executar_com_progresso(f"Exportar {entidade}", tarefa, descrever)
+
+def exportar_para_filial():
+    filial = simpledialog.askstring("Exportar Alterações", "Filial de destino:")
+    if not filial:
+        return
+    destino = filedialog.asksaveasfilename(title="Exportar Alterações", initialfile=f"{filial}.jsonl.gz",
+                                           filetypes=[("Pacote de alterações", "*.jsonl.gz")])
+    if not destino:
+        return
+
+    def tarefa(progresso):
+        from . import sincronizacao
+        return sincronizacao.exportar(
+            filial.strip(), destino, ao_progredir=lambda registros: progresso.update(texto=f"{registros} registros exportados"))
+
+    def descrever(resultado):
+        registros, tamanho, segundos = resultado
+        return f"{registros} registros exportados para {filial} ({tamanho / 1e3:.1f} kB) em {segundos:.1f}s."
+
+    executar_com_progresso("Exportar Alterações", tarefa, descrever)
+
+def aplicar_pacote_filial():
+    origem = filedialog.askopenfilename(title="Aplicar Pacote de Filial",
+                                        filetypes=[("Pacote de alterações", "*.jsonl.gz")])
+    if not origem:
+        return
+
+    def tarefa(progresso):
+        from . import sincronizacao
+        return sincronizacao.aplicar(
+            origem, ao_progredir=lambda registros: progresso.update(texto=f"{registros} registros aplicados"))
+
+    def descrever(resultado):
+        texto = (f"Aplicados: {resultado['aplicados']}, mantida a versão local: {resultado['mantidos']}, "
+                 f"recusados: {resultado['rejeitados']} ({resultado['segundos']:.1f}s).")
+        return "\n".join([texto] + resultado['motivos'][:10])
+
+    executar_com_progresso("Aplicar Pacote de Filial", tarefa, descrever)
+
+def criar_menu(root):
+    menu = tk.Menu(root)
+    arquivo = tk.Menu(menu, tearoff=0)
+    arquivo.add_command(label="Cópia de Segurança...", command=fazer_copia_seguranca)
+    exportar = tk.Menu(arquivo, tearoff=0)
+    for entidade, rotulo in (('livros', "Livros"), ('leitores', "Leitores"), ('emprestimos', "Empréstimos")):
+        exportar.add_command(label=f"{rotulo}...", command=lambda entidade=entidade: exportar_entidade(entidade))
+    arquivo.add_cascade(label="Exportar", menu=exportar)
+    arquivo.add_separator()
+    arquivo.add_command(label="Exportar Alterações para Filial...", command=exportar_para_filial)
+    arquivo.add_command(label="Aplicar Pacote de Filial...", command=aplicar_pacote_filial)
+    menu.add_cascade(label="Arquivo", menu=arquivo)
+    root.configure(menu=menu)
+
+
+def marcar_acao(evento):
+    # A ação atribuída às consultas é a última interação do usuário: a janela e, se for
+    # um botão, o texto dele (ex.: "Gerenciar Empréstimos: Registrar Empréstimo")
+    widget = evento.widget
+    if isinstance(widget, str):
+        return
+    rotulo = widget.winfo_toplevel().title()
+    if isinstance(widget, tk.Button):
+        rotulo = f"{rotulo}: {widget.cget('text')}"
+    definir_acao(rotulo)
+
+# Consultas por ação e, depois de o núcleo ser carregado, o aproveitamento do cache_opcoes
+def relatorio_sql():
+    relatorio = instrumentacao_sql.relatorio()
+    if nucleo is not None:
+        cache = nucleo.cache_opcoes.estatisticas()
+        consultas = cache['acertos'] + cache['falhas']
+        relatorio += (f"\n\nCache de opções: {cache['acertos']} acertos, {cache['falhas']} falhas "
+                      f"({cache['acertos'] / consultas if consultas else 0:.0%}), "
+                      f"{cache['itens']} de {cache['capacidade']} itens")
+    return relatorio
+
+def mostrar_estatisticas_sql(evento=None):
+    janela = tk.Toplevel()
+    janela.title("Estatísticas SQL")
+    texto = tk.Text(janela, width=130, height=30, font=("Courier", 9))
+    texto.insert("1.0", relatorio_sql())
+    texto.configure(state="disabled")
+    texto.pack(fill="both", expand=True)
+
+
+def carregar_nucleo():
+    # Roda em uma thread do executor: importa o SQLAlchemy e abre o banco
+    from . import nucleo as modulo
+    modulo.iniciar()
+    return modulo
+
+# Cada tarefa da interface é uma unidade de trabalho do núcleo (ver nucleo.unidade_de_trabalho);
+# antes de o núcleo ser carregado não há sessão a fechar
+def unidade_de_trabalho():
+    return contextlib.nullcontext() if nucleo is None else nucleo.unidade_de_trabalho()
+
+def main(argv=None):
+    global executor, instrumentacao_sql
+
+    parser = argparse.ArgumentParser(description="Sistema de Biblioteca")
+    parser.add_argument('--instrumentar', action='store_true',
+                        help="mede as consultas SQL de cada ação (F12 mostra o resumo)")
+    parser.add_argument('--sql-lenta-ms', type=float, default=100,
+                        help="consultas a partir desse tempo vão para o log (padrão: 100)")
+    parser.add_argument('--log-sql-lenta', default='consultas_lentas.log')
+    parser.add_argument('--estatisticas-sql', action='store_true',
+                        help="instrumenta e imprime o resumo das consultas ao sair")
+    # Usada por benchmarks/inicializacao.py: anuncia o primeiro quadro e o banco pronto e sai
+    parser.add_argument('--medir-inicio', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    # Interface principal de Tkinter
+    root = tk.Tk()
+    root.title("Sistema de Biblioteca")
+
+    # Consultas e gravações rodam em threads de trabalho, cada uma com a sua sessão
+    executor = ExecutorBD(root, unidade_de_trabalho=unidade_de_trabalho)
+
+    # Botões principais para abrir as janelas de gerenciamento, habilitados quando o banco estiver pronto
+    botoes = [
+        tk.Button(root, text="Gerenciar Livros", command=abrir_janela_livros),
+        tk.Button(root, text="Gerenciar Autores", command=abrir_janela_autores),
+        tk.Button(root, text="Gerenciar Gêneros", command=abrir_janela_generos),
+        tk.Button(root, text="Gerenciar Leitores", command=abrir_janela_leitores),
+        tk.Button(root, text="Registrar Empréstimos", command=abrir_janela_emprestimos),
+        tk.Button(root, text="Relatórios", command=abrir_janela_relatorios),
+    ]
+    for linha, botao in enumerate(botoes):
+        botao.configure(state="disabled")
+        botao.grid(row=linha, column=0)
+
+    # Indicador de atividade enquanto houver tarefas de banco em andamento
+    rotulo_ocupado = tk.Label(root, text="")
+    rotulo_ocupado.grid(row=len(botoes), column=0)
+
+    def indicar_ocupacao(ocupado):
+        rotulo_ocupado.configure(text="Carregando..." if ocupado else "")
+        root.configure(cursor="watch" if ocupado else "")
+
+    executor.ao_mudar_ocupacao(indicar_ocupacao)
+
+    if args.instrumentar or args.estatisticas_sql:
+        instrumentacao_sql = Instrumentacao(args.sql_lenta_ms, args.log_sql_lenta)
+        root.bind_all("<ButtonPress>", marcar_acao, add="+")
+        root.bind_all("<KeyPress>", marcar_acao, add="+")
+        root.bind_all("<F12>", mostrar_estatisticas_sql)
+
+    # Arquivamento periódico dos empréstimos devolvidos
+    INTERVALO_ARQUIVAMENTO_MS = 60 * 60 * 1000
+
+    def agendar_arquivamento():
+        executor.submeter(nucleo.arquivar_emprestimos, ao_falhar=mostrar_erro)
+        root.after(INTERVALO_ARQUIVAMENTO_MS, agendar_arquivamento)
+
+    def banco_pronto(modulo):
+        global nucleo
+        nucleo = modulo
+        if instrumentacao_sql is not None:
+            instrumentacao_sql.instalar(nucleo.engine, nucleo.engine_leitura)
+        for botao in botoes:
+            botao.configure(state="normal")
+        criar_menu(root)
+        if args.medir_inicio:
+            print("banco_pronto", flush=True)
+            root.after_idle(root.destroy)
+            return
+        root.after(5000, agendar_arquivamento)
+
+    def falha_ao_abrir(erro):
+        messagebox.showerror("Erro", f"Não foi possível abrir o banco de dados: {erro}")
+        root.destroy()
+
+    # A janela é desenhada antes de qualquer acesso ao banco
+    root.update()
+    if args.medir_inicio:
+        print("primeiro_quadro", flush=True)
+    executor.submeter(carregar_nucleo, ao_concluir=banco_pronto, ao_falhar=falha_ao_abrir)
+
+    # Iniciar o loop da interface
+    root.mainloop()
+    executor.encerrar()
+    if args.estatisticas_sql:
+        print(relatorio_sql())
+
+
+if __name__ == "__main__":
+    main()
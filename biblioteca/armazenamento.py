@@ -0,0 +1,88 @@
+import configparser
+import os
+
+from sqlalchemy import create_engine, event
+
+# Configuração do armazenamento SQLite: caminho do banco, perfil de PRAGMAs e número de
+# conexões de leitura. Os valores vêm, em ordem de prioridade crescente, do perfil, da
+# seção [armazenamento] do biblioteca.ini e das variáveis de ambiente BIBLIOTECA_*:
+#
+#   [armazenamento]
+#   banco = biblioteca.db
+#   perfil = equilibrado
+#   leitores = 4
+#   cache_size = -131072
+#
+#   BIBLIOTECA_PERFIL=seguro BIBLIOTECA_MMAP_SIZE=0 python -m biblioteca
+#
+# As gravações usam uma única conexão (o SQLite só admite um escritor por vez); as
+# listagens usam um pool separado de conexões somente leitura. Em WAL, leitores não
+# bloqueiam o escritor e veem sempre o último commit confirmado.
+
+PRAGMAS = ('journal_mode', 'synchronous', 'cache_size', 'mmap_size', 'busy_timeout', 'temp_store')
+
+PERFIS = {
+    # Padrões do próprio SQLite, para comparação
+    'padrao': {
+        'journal_mode': 'DELETE', 'synchronous': 'FULL', 'cache_size': -2000,
+        'mmap_size': 0, 'busy_timeout': 0, 'temp_store': 'DEFAULT',
+    },
+    # WAL com fsync só nos checkpoints: um commit recente pode se perder em queda de
+    # energia, mas o banco nunca fica corrompido
+    'equilibrado': {
+        'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'cache_size': -65536,
+        'mmap_size': 268435456, 'busy_timeout': 5000, 'temp_store': 'MEMORY',
+    },
+    # WAL com fsync a cada commit
+    'seguro': {
+        'journal_mode': 'WAL', 'synchronous': 'FULL', 'cache_size': -65536,
+        'mmap_size': 268435456, 'busy_timeout': 5000, 'temp_store': 'MEMORY',
+    },
+}
+PERFIL_PADRAO = 'equilibrado'
+ARQUIVO_CONFIGURACAO = 'biblioteca.ini'
+
+
+def carregar_configuracao(caminho=None, ambiente=None):
+    ambiente = os.environ if ambiente is None else ambiente
+    caminho = caminho or ambiente.get('BIBLIOTECA_CONFIG', ARQUIVO_CONFIGURACAO)
+    arquivo = configparser.ConfigParser()
+    arquivo.read(caminho, encoding='utf-8')
+    secao = arquivo['armazenamento'] if arquivo.has_section('armazenamento') else {}
+
+    def valor(chave, padrao=None):
+        return ambiente.get(f'BIBLIOTECA_{chave.upper()}', secao.get(chave, padrao))
+
+    perfil = valor('perfil', PERFIL_PADRAO)
+    if perfil not in PERFIS:
+        raise ValueError(f"Perfil de armazenamento desconhecido: {perfil} (use {', '.join(PERFIS)})")
+    return {
+        'banco': valor('banco', 'biblioteca.db'),
+        'perfil': perfil,
+        'leitores': int(valor('leitores', 4)),
+        'pragmas': {pragma: valor(pragma, PERFIS[perfil][pragma]) for pragma in PRAGMAS},
+    }
+
+
+def aplicar_pragmas(engine, pragmas, somente_leitura=False):
+    @event.listens_for(engine, 'connect')
+    def configurar(conexao_dbapi, registro):
+        cursor = conexao_dbapi.cursor()
+        for pragma, valor in pragmas.items():
+            # O modo de journal é do arquivo, não da conexão: quem define é o escritor
+            if pragma == 'journal_mode' and somente_leitura:
+                continue
+            cursor.execute(f"PRAGMA {pragma} = {valor}")
+        if somente_leitura:
+            cursor.execute("PRAGMA query_only = ON")
+        cursor.close()
+
+
+def criar_engines(configuracao):
+    # Devolve (engine de escrita, engine de leitura)
+    url = f"sqlite:///{configuracao['banco']}"
+    escrita = create_engine(url, pool_size=1, max_overflow=0)
+    leitura = create_engine(url, pool_size=configuracao['leitores'], max_overflow=0)
+    aplicar_pragmas(escrita, configuracao['pragmas'])
+    aplicar_pragmas(leitura, configuracao['pragmas'], somente_leitura=True)
+    return escrita, leitura
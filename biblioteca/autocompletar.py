@@ -0,0 +1,67 @@
+from tkinter import ttk
+
+# Combobox com sugestões enquanto o usuário digita. Nada é carregado ao abrir a janela:
+# depois de uma pausa na digitação, buscar_sugestoes(texto) roda no executor e devolve
+# no máximo algumas dezenas de pares (id, nome), que viram as opções da lista.
+# id_selecionado() devolve o id da opção escolhida ou, se o usuário digitou só um
+# número, esse número como id.
+
+ESPERA_DIGITACAO_MS = 250
+# Teclas que não mudam o texto e não devem disparar uma nova busca
+TECLAS_NAVEGACAO = {'Up', 'Down', 'Left', 'Right', 'Return', 'Escape', 'Tab', 'Home', 'End',
+                    'Shift_L', 'Shift_R', 'Control_L', 'Control_R', 'Alt_L', 'Alt_R'}
+
+
+class Autocompletar:
+    def __init__(self, janela, executor, buscar_sugestoes, ao_falhar=None, **opcoes):
+        self.combo = ttk.Combobox(janela, **opcoes)
+        self._executor = executor
+        self._buscar_sugestoes = buscar_sugestoes
+        self._ao_falhar = ao_falhar
+        self._ids = {}
+        self._agendada = None
+        self.combo.bind("<KeyRelease>", self._ao_digitar)
+
+    def grid(self, **opcoes):
+        self.combo.grid(**opcoes)
+
+    def get(self):
+        return self.combo.get()
+
+    def id_selecionado(self):
+        texto = self.combo.get().strip()
+        if texto in self._ids:
+            return self._ids[texto]
+        if texto.isdigit():
+            return int(texto)
+        return None
+
+    def definir_sugestoes(self, pares, selecionar_primeira=False):
+        opcoes = [f"{registro_id} - {nome}" for registro_id, nome in pares]
+        self._ids = dict(zip(opcoes, (registro_id for registro_id, _ in pares)))
+        self.combo.configure(values=opcoes)
+        if selecionar_primeira:
+            self.combo.set(opcoes[0] if opcoes else "")
+
+    def _ao_digitar(self, evento):
+        if evento.keysym in TECLAS_NAVEGACAO:
+            return
+        if self._agendada is not None:
+            self.combo.after_cancel(self._agendada)
+        self._agendada = self.combo.after(ESPERA_DIGITACAO_MS, self._buscar)
+
+    def _buscar(self):
+        self._agendada = None
+        texto = self.combo.get().strip()
+        if not texto or texto in self._ids:
+            return
+
+        def exibir(pares):
+            # Descarta a resposta se o texto mudou enquanto a consulta rodava
+            if self.combo.winfo_exists() and self.combo.get().strip() == texto:
+                self.definir_sugestoes(pares)
+
+        # A mesma chave faz a busca nova substituir a anterior ainda pendente
+        self._executor.submeter(self._buscar_sugestoes, texto, ao_concluir=exibir, ao_falhar=self._ao_falhar,
+                                chave=('autocompletar', str(self.combo)))
+
@@ -0,0 +1,93 @@
+import threading
+from collections import OrderedDict
+from itertools import chain
+
+from sqlalchemy import event
+
+# Cache de dados de referência (opções das Comboboxes, resultados de busca) com
+# descarte LRU. Cada chave começa pela tupla de tabelas de que o valor depende, por
+# exemplo (('autores',),) ou (('livros', 'autores'), 'busca', termo); gravar em uma
+# dessas tabelas invalida apenas as chaves que a citam.
+
+
+class CacheLRU:
+    def __init__(self, capacidade=64):
+        self.capacidade = capacidade
+        self.acertos = 0
+        self.falhas = 0
+        self._itens = OrderedDict()
+        self._versoes = {}
+        self._lock = threading.Lock()
+
+    def obter(self, chave, carregar):
+        with self._lock:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                self.acertos += 1
+                return self._itens[chave]
+            self.falhas += 1
+            versao = self._versao(chave)
+
+        valor = carregar()
+
+        with self._lock:
+            # Se uma das tabelas foi invalidada durante a carga, o valor já nasce velho
+            if self._versao(chave) == versao:
+                self._itens[chave] = valor
+                self._itens.move_to_end(chave)
+                while len(self._itens) > self.capacidade:
+                    self._itens.popitem(last=False)
+        return valor
+
+    def invalidar(self, *tabelas):
+        with self._lock:
+            for tabela in tabelas:
+                self._versoes[tabela] = self._versoes.get(tabela, 0) + 1
+            for chave in [chave for chave in self._itens if set(chave[0]) & set(tabelas)]:
+                del self._itens[chave]
+
+    def limpar(self):
+        with self._lock:
+            for tabela in list(self._versoes):
+                self._versoes[tabela] += 1
+            self._itens.clear()
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'itens': len(self._itens),
+                'capacidade': self.capacidade,
+            }
+
+    def _versao(self, chave):
+        return tuple(self._versoes.get(tabela, 0) for tabela in chave[0])
+
+
+def invalidar_ao_confirmar(cache, fabrica_sessao):
+    # As tabelas tocadas por um flush (ou por um UPDATE/DELETE/INSERT em massa pelo ORM)
+    # são acumuladas na sessão e só invalidam o cache depois do commit
+    def _alteradas(sessao):
+        return sessao.info.setdefault('tabelas_alteradas', set())
+
+    @event.listens_for(fabrica_sessao, 'after_flush')
+    def registrar_flush(sessao, contexto):
+        for objeto in chain(sessao.new, sessao.dirty, sessao.deleted):
+            _alteradas(sessao).add(objeto.__table__.name)
+
+    @event.listens_for(fabrica_sessao, 'do_orm_execute')
+    def registrar_em_massa(estado):
+        if estado.is_insert or estado.is_update or estado.is_delete:
+            for mapper in estado.all_mappers:
+                _alteradas(estado.session).add(mapper.local_table.name)
+
+    @event.listens_for(fabrica_sessao, 'after_commit')
+    def invalidar(sessao):
+        tabelas = sessao.info.pop('tabelas_alteradas', None)
+        if tabelas:
+            cache.invalidar(*tabelas)
+
+    @event.listens_for(fabrica_sessao, 'after_rollback')
+    def descartar(sessao):
+        sessao.info.pop('tabelas_alteradas', None)
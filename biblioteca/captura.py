@@ -0,0 +1,102 @@
+# Captura de alterações para a sincronização entre filiais (ver sincronizacao.py).
+#
+# Triggers acrescentam uma linha em sinc_log a cada inserção, alteração e exclusão de
+# livros, autores, gêneros, leitores e empréstimos, com um número de sequência
+# crescente. Por valerem para qualquer comando, os triggers registram também as
+# operações em massa e as gravações feitas fora do ORM. O log guarda só a tabela, o id
+# local e a operação: o conteúdo é lido da própria tabela na hora de exportar, então
+# várias alterações da mesma linha viram um único envio.
+#
+# Os ids são locais de cada filial; entre filiais a linha é identificada pela chave
+# natural (ISBN do livro, email do leitor, nome do gênero ou do autor). Quando uma
+# alteração muda a chave, e quando a linha é excluída, o trigger guarda a chave antiga,
+# para que a outra filial ainda encontre a linha. Empréstimos têm uma chave global
+# própria, "<filial>:<id>", e o mapa sinc_chaves liga as chaves vindas de outras
+# filiais aos ids locais.
+#
+# Enquanto um pacote de outra filial é aplicado, sinc_estado.origem_aplicacao guarda o
+# nome dela; as linhas do log herdam essa origem e não são devolvidas à mesma filial.
+# Cada linha do log guarda o momento da alteração na filial onde ela foi feita, usado
+# para decidir conflitos pela alteração mais recente.
+# A exclusão de empréstimos pelo arquivamento (que só muda a linha de tabela) não é
+# registrada.
+
+# Coluna da chave natural de cada tabela sincronizada (empréstimos usam a chave global)
+CHAVES_NATURAIS = {
+    'generos': 'nome',
+    'autores': 'nome',
+    'livros': 'isbn',
+    'leitores': 'email',
+    'emprestimos': None,
+}
+
+DDL_SINCRONIZACAO = [
+    """CREATE TABLE sinc_log (
+        seq INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+        tabela TEXT NOT NULL,
+        registro_id INTEGER NOT NULL,
+        operacao TEXT NOT NULL,
+        chave_antiga TEXT,
+        origem TEXT,
+        momento REAL NOT NULL)""",
+    "CREATE INDEX ix_sinc_log_tabela_registro ON sinc_log (tabela, registro_id, seq)",
+    # Só as linhas que trocaram ou excluíram uma chave, para achar a linha pela chave antiga
+    """CREATE INDEX ix_sinc_log_chave_antiga ON sinc_log (tabela, chave_antiga, seq)
+        WHERE chave_antiga IS NOT NULL""",
+    # Uma linha: o nome desta filial e a origem do pacote em aplicação (NULL fora dela).
+    # Durante a aplicação, também o momento original da alteração recebida
+    """CREATE TABLE sinc_estado (
+        id INTEGER NOT NULL PRIMARY KEY CHECK (id = 1),
+        filial TEXT NOT NULL,
+        origem_aplicacao TEXT,
+        momento_aplicacao REAL)""",
+    "INSERT INTO sinc_estado (id, filial) VALUES (1, lower(hex(randomblob(6))))",
+    # Marcas d'água por filial parceira: último seq local enviado e último seq dela aplicado
+    """CREATE TABLE sinc_marcas (
+        filial TEXT NOT NULL PRIMARY KEY,
+        enviado INTEGER NOT NULL DEFAULT 0,
+        recebido INTEGER NOT NULL DEFAULT 0)""",
+    # Chave global dos empréstimos criados em outras filiais -> id local
+    """CREATE TABLE sinc_chaves (
+        tabela TEXT NOT NULL,
+        chave TEXT NOT NULL,
+        registro_id INTEGER NOT NULL,
+        PRIMARY KEY (tabela, chave))""",
+    "CREATE INDEX ix_sinc_chaves_registro ON sinc_chaves (tabela, registro_id)",
+]
+
+# Segundos desde 1970, como o time.time() do Python
+AGORA = "((julianday('now') - 2440587.5) * 86400.0)"
+_ORIGEM = "(SELECT origem_aplicacao FROM sinc_estado WHERE id = 1)"
+# Alterações recebidas mantêm o momento em que foram feitas na filial de origem
+_MOMENTO = f"COALESCE((SELECT momento_aplicacao FROM sinc_estado WHERE id = 1), {AGORA})"
+
+
+def _gatilhos(tabela, chave):
+    antiga_alteracao = f"CASE WHEN OLD.{chave} IS NOT NEW.{chave} THEN OLD.{chave} END" if chave else "NULL"
+    antiga_exclusao = f"OLD.{chave}" if chave else "NULL"
+    # Arquivar empréstimos copia a linha para emprestimos_arquivo antes de apagá-la
+    arquivamento = ("WHEN NOT EXISTS (SELECT 1 FROM emprestimos_arquivo WHERE id = OLD.id)"
+                    if tabela == 'emprestimos' else "")
+    return [
+        f"""CREATE TRIGGER sinc_{tabela}_ai AFTER INSERT ON {tabela} BEGIN
+            INSERT INTO sinc_log (tabela, registro_id, operacao, origem, momento)
+            VALUES ('{tabela}', NEW.id, 'I', {_ORIGEM}, {_MOMENTO});
+        END""",
+        f"""CREATE TRIGGER sinc_{tabela}_au AFTER UPDATE ON {tabela} BEGIN
+            INSERT INTO sinc_log (tabela, registro_id, operacao, chave_antiga, origem, momento)
+            VALUES ('{tabela}', NEW.id, 'U', {antiga_alteracao}, {_ORIGEM}, {_MOMENTO});
+        END""",
+        f"""CREATE TRIGGER sinc_{tabela}_ad AFTER DELETE ON {tabela} {arquivamento} BEGIN
+            INSERT INTO sinc_log (tabela, registro_id, operacao, chave_antiga, origem, momento)
+            VALUES ('{tabela}', OLD.id, 'D', {antiga_exclusao}, {_ORIGEM}, {_MOMENTO});
+        END""",
+    ]
+
+
+def criar_captura(conexao):
+    comandos = list(DDL_SINCRONIZACAO)
+    for tabela, chave in CHAVES_NATURAIS.items():
+        comandos += _gatilhos(tabela, chave)
+    for comando in comandos:
+        conexao.exec_driver_sql(comando)
@@ -0,0 +1,204 @@
+import argparse
+import csv
+import gzip
+import json
+import os
+import sqlite3
+import time
+
+from sqlalchemy import literal, select
+
+from . import nucleo
+from .nucleo import Autor, Emprestimo, EmprestimoArquivado, Genero, Leitor, Livro
+
+# Cópia de segurança e exportação com a aplicação em uso.
+#
+# A cópia usa a API de backup do SQLite em etapas de poucas páginas, com uma pausa entre
+# elas, para que a conexão de escrita não fique esperando. Se o banco for alterado por
+# outra conexão no meio da cópia, o SQLite recomeça do início; depois de algumas
+# tentativas, em WAL, a cópia é feita em uma etapa só, o que também não bloqueia as
+# gravações (o leitor só vê o último commit anterior ao início).
+#
+# A exportação lê cada entidade por uma conexão do pool de leitura, em fluxo (yield_per),
+# e grava CSV ou JSONL comprimido (.jsonl.gz) linha a linha, com memória constante.
+# Os dois gravam em um arquivo temporário ao lado do destino e só o renomeiam no final.
+#
+#   python -m biblioteca.copia backup /backup/biblioteca-2024-05-01.db
+#   python -m biblioteca.copia exportar livros livros.jsonl.gz
+
+PAGINAS_POR_ETAPA = 256
+PAUSA_ENTRE_ETAPAS = 0.005
+TENTATIVAS_EM_ETAPAS = 3
+LINHAS_POR_LOTE = 1000
+# O nível 9 do gzip (padrão) custa várias vezes o tempo da consulta e ganha pouco espaço
+NIVEL_COMPRESSAO = 5
+
+
+class _CopiaReiniciada(Exception):
+    pass
+
+
+def _caminho_banco():
+    return nucleo.configuracao['banco']
+
+
+def copiar_banco(destino, ao_progredir=None, paginas_por_etapa=PAGINAS_POR_ETAPA, pausa=PAUSA_ENTRE_ETAPAS):
+    # ao_progredir(copiadas, total) a cada etapa. Devolve (páginas, bytes, segundos).
+    nucleo.iniciar()
+    temporario = destino + '.parcial'
+    if os.path.exists(temporario):
+        os.remove(temporario)
+
+    inicio = time.perf_counter()
+    origem = sqlite3.connect(_caminho_banco())
+    copia = sqlite3.connect(temporario)
+    try:
+        em_wal = origem.execute("PRAGMA journal_mode").fetchone()[0].lower() == 'wal'
+        tamanho_pagina = origem.execute("PRAGMA page_size").fetchone()[0]
+        estado = {'restantes': None, 'total': 0}
+
+        def progresso(situacao, restantes, total):
+            # Páginas restantes aumentando: o banco mudou e o SQLite recomeçou a cópia
+            if estado['restantes'] is not None and restantes > estado['restantes']:
+                raise _CopiaReiniciada()
+            estado['restantes'], estado['total'] = restantes, total
+            if ao_progredir:
+                ao_progredir(total - restantes, total)
+
+        for _ in range(TENTATIVAS_EM_ETAPAS):
+            estado['restantes'] = None
+            try:
+                origem.backup(copia, pages=paginas_por_etapa, progress=progresso, sleep=pausa)
+                break
+            except _CopiaReiniciada:
+                continue
+        else:
+            if not em_wal:
+                raise RuntimeError("O banco mudou durante todas as tentativas de cópia; tente com menos gravações")
+            origem.backup(copia, pages=-1, progress=progresso)
+    except BaseException:
+        copia.close()
+        os.remove(temporario)
+        raise
+    finally:
+        copia.close()
+        origem.close()
+
+    os.replace(temporario, destino)
+    return estado['total'], estado['total'] * tamanho_pagina, time.perf_counter() - inicio
+
+
+# Consultas de exportação: colunas legíveis, com os nomes de autor, gênero, livro e leitor.
+# Cada entidade é uma lista de consultas gravadas em sequência no mesmo arquivo, todas
+# na ordem da chave primária, para que o SQLite não precise ordenar o resultado inteiro.
+def _consulta_livros():
+    return [select(Livro.id, Livro.titulo, Livro.isbn, Autor.nome.label('autor'), Genero.nome.label('genero'))
+            .outerjoin(Autor, Livro.autor_id == Autor.id)
+            .outerjoin(Genero, Livro.genero_id == Genero.id)
+            .order_by(Livro.id)]
+
+
+def _consulta_leitores():
+    return [select(Leitor.id, Leitor.nome, Leitor.email).order_by(Leitor.id)]
+
+
+def _consulta_emprestimos():
+    # Ativos e devolvidos, depois os arquivados
+    return [
+        select(modelo.id.label('id'), modelo.livro_id, Livro.titulo, modelo.leitor_id, Leitor.nome.label('leitor'),
+               modelo.data_emprestimo, modelo.data_prevista, modelo.data_devolucao, modelo.devolvido,
+               literal(arquivado).label('arquivado'))
+        .outerjoin(Livro, Livro.id == modelo.livro_id)
+        .outerjoin(Leitor, Leitor.id == modelo.leitor_id)
+        .order_by(modelo.id)
+        for modelo, arquivado in ((Emprestimo, False), (EmprestimoArquivado, True))
+    ]
+
+
+CONSULTAS_EXPORTACAO = {
+    'livros': _consulta_livros,
+    'leitores': _consulta_leitores,
+    'emprestimos': _consulta_emprestimos,
+}
+FORMATOS = ('csv', 'jsonl.gz')
+
+
+def formato_do_arquivo(caminho):
+    return 'jsonl.gz' if caminho.endswith(('.jsonl.gz', '.gz')) else 'csv'
+
+
+def _valor_texto(valor):
+    return valor.isoformat() if hasattr(valor, 'isoformat') else valor
+
+
+def exportar(entidade, destino, formato=None, ao_progredir=None):
+    # ao_progredir(linhas) a cada lote. Devolve (linhas, bytes, segundos).
+    nucleo.iniciar()
+    formato = formato or formato_do_arquivo(destino)
+    temporario = destino + '.parcial'
+    inicio = time.perf_counter()
+    linhas = 0
+
+    consultas = CONSULTAS_EXPORTACAO[entidade]()
+    colunas = [coluna.name for coluna in consultas[0].selected_columns]
+    if formato == 'csv':
+        arquivo = open(temporario, 'w', newline='', encoding='utf-8')
+        escritor = csv.writer(arquivo)
+        escritor.writerow(colunas)
+        gravar = escritor.writerows
+    else:
+        arquivo = gzip.open(temporario, 'wt', encoding='utf-8', compresslevel=NIVEL_COMPRESSAO)
+
+        def gravar(lote):
+            arquivo.writelines(json.dumps(dict(zip(colunas, map(_valor_texto, linha))), ensure_ascii=False) + '\n'
+                               for linha in lote)
+
+    # Uma única transação de leitura: todas as consultas veem o mesmo instante do banco
+    try:
+        with arquivo, nucleo.engine_leitura.connect() as conexao, conexao.begin():
+            for consulta in consultas:
+                for lote in conexao.execution_options(yield_per=LINHAS_POR_LOTE).execute(consulta).partitions():
+                    gravar(lote)
+                    linhas += len(lote)
+                    if ao_progredir:
+                        ao_progredir(linhas)
+    except BaseException:
+        os.remove(temporario)
+        raise
+
+    os.replace(temporario, destino)
+    return linhas, os.path.getsize(destino), time.perf_counter() - inicio
+
+
+def _mostrar_progresso(texto):
+    print(f"\r{texto}", end='', flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cópia de segurança e exportação da biblioteca")
+    comandos = parser.add_subparsers(dest='comando', required=True)
+    backup = comandos.add_parser('backup', help="copia o banco com a aplicação em uso")
+    backup.add_argument('destino')
+    backup.add_argument('--paginas', type=int, default=PAGINAS_POR_ETAPA, help="páginas por etapa")
+    backup.add_argument('--pausa', type=float, default=PAUSA_ENTRE_ETAPAS, help="segundos entre etapas")
+    exportacao = comandos.add_parser('exportar', help="exporta uma entidade para CSV ou JSONL comprimido")
+    exportacao.add_argument('entidade', choices=list(CONSULTAS_EXPORTACAO))
+    exportacao.add_argument('destino')
+    exportacao.add_argument('--formato', choices=FORMATOS, help="padrão: pela extensão do destino")
+    args = parser.parse_args()
+
+    if args.comando == 'backup':
+        paginas, tamanho, segundos = copiar_banco(
+            args.destino, lambda copiadas, total: _mostrar_progresso(f"{copiadas}/{total} páginas"),
+            args.paginas, args.pausa)
+        print(f"\nCópia concluída: {tamanho / 1e6:.1f} MB em {segundos:.2f}s "
+              f"({tamanho / 1e6 / segundos:.1f} MB/s, {paginas / segundos:.0f} páginas/s)")
+    else:
+        linhas, tamanho, segundos = exportar(
+            args.entidade, args.destino, args.formato, lambda total: _mostrar_progresso(f"{total} linhas"))
+        print(f"\nExportação concluída: {linhas} linhas, {tamanho / 1e6:.1f} MB em {segundos:.2f}s "
+              f"({linhas / segundos:.0f} linhas/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import argparse
+import os
+import random
+import time
+from datetime import date, timedelta
+
+# Gerador determinístico de dados sintéticos para testes de volume e benchmarks. A mesma
+# semente e o mesmo tamanho produzem sempre o mesmo banco. O tamanho é dado pelo número
+# de empréstimos; as demais tabelas crescem na mesma proporção:
+#
+#   empréstimos  livros  leitores  autores  gêneros
+#   N            N/5     N/20      N/200    50
+#
+# Um em cada dez empréstimos está ativo, cada um em um livro diferente; os demais já
+# foram devolvidos.
+#
+#   python -m biblioteca.gerador_dados --tamanho 1m --semente 42
+#   BIBLIOTECA_BANCO=/tmp/volume.db python -m biblioteca.gerador_dados --emprestimos 250000
+
+TAMANHOS = {'10k': 10_000, '1m': 1_000_000, '10m': 10_000_000}
+TAMANHO_LOTE = 50_000
+DATA_BASE = date(2024, 1, 1)
+PALAVRAS = [
+    'amor', 'casa', 'noite', 'mar', 'sombra', 'tempo', 'cidade', 'memória', 'jardim', 'rio',
+    'silêncio', 'vento', 'caminho', 'segredo', 'guerra', 'estrela', 'ilha', 'fogo', 'sertão', 'espelho',
+    'história', 'viagem', 'carta', 'sonho', 'inverno', 'verão', 'ponte', 'dom', 'pedra', 'luz',
+    'deserto', 'montanha', 'floresta', 'janela', 'relógio', 'labirinto', 'coração', 'destino', 'ouro', 'névoa',
+]
+
+
+def proporcoes(emprestimos):
+    return {
+        'emprestimos': emprestimos,
+        'livros': max(1000, emprestimos // 5),
+        'leitores': max(500, emprestimos // 20),
+        'autores': max(100, emprestimos // 200),
+        'generos': 50,
+    }
+
+
+def _frase(sorteio, palavras):
+    return ' '.join(sorteio.choice(PALAVRAS) for _ in range(palavras))
+
+
+def gerar_autores(sorteio, quantidade):
+    for i in range(1, quantidade + 1):
+        yield {'id': i, 'nome': f'Autor {i} {_frase(sorteio, 1).title()}', 'biografia': _frase(sorteio, 12)}
+
+
+def gerar_generos(quantidade):
+    for i in range(1, quantidade + 1):
+        yield {'id': i, 'nome': f'Gênero {i}'}
+
+
+def gerar_livros(sorteio, quantidade, autores, generos):
+    for i in range(1, quantidade + 1):
+        yield {'id': i, 'titulo': f'{_frase(sorteio, 3).capitalize()} {i}', 'isbn': f'978{i:010d}',
+               'autor_id': sorteio.randint(1, autores), 'genero_id': sorteio.randint(1, generos)}
+
+
+def gerar_leitores(quantidade):
+    for i in range(1, quantidade + 1):
+        yield {'id': i, 'nome': f'Leitor {i}', 'email': f'leitor{i}@exemplo.com'}
+
+
+def gerar_emprestimos(sorteio, quantidade, livros, leitores):
+    ativos = sorteio.sample(range(1, livros + 1), min(livros, quantidade // 10))
+    for i in range(1, quantidade + 1):
+        saida = DATA_BASE + timedelta(days=sorteio.randrange(700))
+        ativo = i <= len(ativos)
+        yield {
+            'id': i,
+            'livro_id': ativos[i - 1] if ativo else sorteio.randint(1, livros),
+            'leitor_id': sorteio.randint(1, leitores),
+            'data_emprestimo': saida,
+            'data_prevista': saida + timedelta(days=14),
+            'data_devolucao': None if ativo else saida + timedelta(days=sorteio.randint(1, 30)),
+            'devolvido': not ativo,
+        }
+
+
+def _lotes(registros, tamanho):
+    lote = []
+    for registro in registros:
+        lote.append(registro)
+        if len(lote) == tamanho:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def gerar(emprestimos, semente=42, ao_progredir=None):
+    # Povoa o banco configurado (ver armazenamento.py), que deve estar vazio
+    from sqlalchemy import func, insert, select
+    from . import nucleo
+
+    nucleo.iniciar()
+    with nucleo.engine.connect() as conexao:
+        if conexao.execute(select(func.count()).select_from(nucleo.Livro)).scalar():
+            raise RuntimeError(f"O banco {nucleo.configuracao['banco']} já tem livros; use um banco vazio")
+
+    sorteio = random.Random(semente)
+    tamanhos = proporcoes(emprestimos)
+    etapas = [
+        (nucleo.Autor, gerar_autores(sorteio, tamanhos['autores'])),
+        (nucleo.Genero, gerar_generos(tamanhos['generos'])),
+        (nucleo.Livro, gerar_livros(sorteio, tamanhos['livros'], tamanhos['autores'], tamanhos['generos'])),
+        (nucleo.Leitor, gerar_leitores(tamanhos['leitores'])),
+        (nucleo.Emprestimo, gerar_emprestimos(sorteio, emprestimos, tamanhos['livros'], tamanhos['leitores'])),
+    ]
+    for modelo, registros in etapas:
+        gravados = 0
+        for lote in _lotes(registros, TAMANHO_LOTE):
+            with nucleo.engine.begin() as conexao:
+                conexao.execute(insert(modelo), lote)
+            gravados += len(lote)
+            if ao_progredir:
+                ao_progredir(modelo.__tablename__, gravados)
+    return tamanhos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera dados sintéticos determinísticos para a biblioteca")
+    grupo = parser.add_mutually_exclusive_group()
+    grupo.add_argument('--tamanho', choices=list(TAMANHOS), default='10k', help="número de empréstimos")
+    grupo.add_argument('--emprestimos', type=int, help="número exato de empréstimos")
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--banco', help="arquivo do banco (padrão: o da configuração de armazenamento)")
+    args = parser.parse_args()
+
+    if args.banco:
+        os.environ['BIBLIOTECA_BANCO'] = args.banco
+    inicio = time.perf_counter()
+    tamanhos = gerar(args.emprestimos or TAMANHOS[args.tamanho], args.semente,
+                     ao_progredir=lambda tabela, total: print(f"\r{tabela:<12}{total:>10}", end='', flush=True))
+    print(f"\nGerados em {time.perf_counter() - inicio:.1f}s: "
+          + ', '.join(f"{quantidade} {tabela}" for tabela, quantidade in tamanhos.items()))
+
+
+if __name__ == "__main__":
+    main()
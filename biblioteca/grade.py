@@ -0,0 +1,100 @@
+from bisect import bisect_left
+
+from .alteracoes import INSERIDO, REMOVIDO
+
+# Estado de uma grade paginada por id crescente, independente do Tkinter. A partir de
+# uma página nova ou de um conjunto de linhas alteradas, decide quais operações aplicar
+# no widget (inserir, atualizar, remover), sem tocar nas demais linhas.
+
+INSERIR = 'inserir'
+ATUALIZAR = 'atualizar'
+REMOVER = 'remover'
+
+
+class EstadoGrade:
+    def __init__(self, seq=0):
+        self.reiniciar(seq)
+
+    def reiniciar(self, seq):
+        # seq: posição do registro de alterações a partir da qual a grade está em dia
+        self.ids = []
+        self.valores = {}
+        self.ultimo_id = None
+        self.esgotada = False
+        self.seq = seq
+
+    def receber_pagina(self, linhas, tamanho_pagina):
+        operacoes = []
+        for valores in linhas:
+            registro_id = valores[0]
+            self.ultimo_id = registro_id
+            # A linha pode já ter entrado por uma atualização incremental
+            if registro_id in self.valores:
+                continue
+            self.ids.append(registro_id)
+            self.valores[registro_id] = valores
+            operacoes.append((INSERIR, len(self.ids) - 1, registro_id, valores))
+        self.esgotada = len(linhas) < tamanho_pagina
+        return operacoes
+
+    def aplicar_alteracoes(self, linhas, removidos):
+        operacoes = []
+        for registro_id in removidos:
+            if registro_id in self.valores:
+                del self.ids[bisect_left(self.ids, registro_id)]
+                del self.valores[registro_id]
+                operacoes.append((REMOVER, registro_id))
+
+        for valores in linhas:
+            registro_id = valores[0]
+            if registro_id in self.valores:
+                if self.valores[registro_id] != valores:
+                    self.valores[registro_id] = valores
+                    operacoes.append((ATUALIZAR, registro_id, valores))
+            elif self.esgotada or (self.ultimo_id is not None and registro_id < self.ultimo_id):
+                # Linhas além da última página carregada chegam com a próxima página
+                indice = bisect_left(self.ids, registro_id)
+                self.ids.insert(indice, registro_id)
+                self.valores[registro_id] = valores
+                if self.ultimo_id is None or registro_id > self.ultimo_id:
+                    self.ultimo_id = registro_id
+                operacoes.append((INSERIR, indice, registro_id, valores))
+        return operacoes
+
+
+def buscar_alteracoes(registro, seq, tabelas, dependencias, buscar_linhas, ate_id=None):
+    # Linhas alteradas desde seq, para EstadoGrade.aplicar_alteracoes; buscar_linhas(ids)
+    # devolve os valores atuais dessas linhas. Devolve (nova_seq, linhas, removidos), ou
+    # (nova_seq, None, None) quando a grade precisa ser recarregada por inteiro.
+    # dependencias: {tabela: buscar_dependentes(chaves, ate_id)} para tabelas exibidas nas
+    # linhas (ex.: o nome do autor na grade de livros); buscar_dependentes devolve os ids
+    # das linhas até ate_id (a última carregada) que mostram essas chaves
+    nova_seq, alteracoes = registro.desde(seq, tuple(tabelas) + tuple(dependencias))
+    if alteracoes is None:
+        return nova_seq, None, None
+    removidos = {registro_id for (tabela, registro_id), operacao in alteracoes.items()
+                 if tabela in tabelas and operacao == REMOVIDO}
+    ids = {registro_id for tabela, registro_id in alteracoes if tabela in tabelas} - removidos
+    if ate_id is not None:
+        for tabela, buscar_dependentes in dependencias.items():
+            # Um registro novo só aparece em uma linha quando ela mesma é alterada
+            chaves = {chave for (alterada, chave), operacao in alteracoes.items()
+                      if alterada == tabela and operacao != INSERIDO}
+            if chaves:
+                ids |= set(buscar_dependentes(chaves, ate_id)) - removidos
+    linhas = buscar_linhas(ids) if ids else []
+    # Linhas que sumiram entre a alteração e a consulta também saem da grade
+    removidos |= ids - {valores[0] for valores in linhas}
+    return nova_seq, linhas, removidos
+
+
+# Valores exibidos em cada linha das grades de livros e de empréstimos; o aplicativo e a
+# suíte de benchmarks usam as mesmas funções
+def valores_livro(linha):
+    livro_id, titulo, isbn, autor, genero = linha
+    return (livro_id, titulo, isbn, autor or "Desconhecido", genero or "Desconhecido")
+
+
+def valores_emprestimo(linha):
+    leitor_id, nome, livros = linha
+    return (leitor_id, nome, livros or "")
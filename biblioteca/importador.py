@@ -0,0 +1,120 @@
+import argparse
+import csv
+import json
+import time
+
+from sqlalchemy import insert, select
+
+from . import nucleo
+from .nucleo import Autor, Genero, Livro, Leitor
+
+# Importação em massa: o arquivo é lido em fluxo e gravado em lotes com executemany,
+# uma transação por lote, em vez de um session.commit() por registro
+
+# Campos obrigatórios e opcionais de cada entidade
+CAMPOS = {
+    'autores': (Autor, ('nome',), ('biografia',)),
+    'generos': (Genero, ('nome',), ()),
+    'leitores': (Leitor, ('nome', 'email'), ()),
+    'livros': (Livro, ('titulo', 'isbn', 'autor', 'genero'), ()),
+}
+
+
+def ler_registros(caminho):
+    with open(caminho, newline='', encoding='utf-8') as arquivo:
+        if caminho.endswith('.jsonl'):
+            for linha in arquivo:
+                if linha.strip():
+                    yield json.loads(linha)
+        else:
+            yield from csv.DictReader(arquivo)
+
+
+def _carregar_mapa(conexao, modelo):
+    # Nome -> id de autores e gêneros já existentes; para autores homônimos fica o primeiro id
+    mapa = {}
+    for registro_id, nome in conexao.execute(select(modelo.id, modelo.nome).order_by(modelo.id)):
+        mapa.setdefault(nome, registro_id)
+    return mapa
+
+
+def _resolver_id(conexao, modelo, mapa, nome):
+    registro_id = mapa.get(nome)
+    if registro_id is None:
+        resultado = conexao.execute(insert(modelo.__table__).values(nome=nome))
+        registro_id = mapa[nome] = resultado.inserted_primary_key[0]
+    return registro_id
+
+
+def _gravar_lote(conexao, entidade, lote, mapas):
+    modelo = CAMPOS[entidade][0]
+    with conexao.begin():
+        if entidade == 'livros':
+            mapa_autores, mapa_generos = mapas
+            lote = [
+                {
+                    'titulo': registro['titulo'],
+                    'isbn': registro['isbn'],
+                    'autor_id': _resolver_id(conexao, Autor, mapa_autores, registro['autor']),
+                    'genero_id': _resolver_id(conexao, Genero, mapa_generos, registro['genero']),
+                }
+                for registro in lote
+            ]
+        # OR IGNORE descarta as linhas que violam isbn/email/nome únicos sem abortar o lote
+        resultado = conexao.execute(insert(modelo.__table__).prefix_with('OR IGNORE'), lote)
+    return resultado.rowcount
+
+
+def importar(entidade, caminho, tamanho_lote=5000):
+    _, obrigatorios, opcionais = CAMPOS[entidade]
+    lidos = inseridos = invalidos = 0
+    inicio = time.perf_counter()
+
+    nucleo.iniciar()
+    with nucleo.engine.connect() as conexao:
+        mapas = None
+        if entidade == 'livros':
+            mapas = (_carregar_mapa(conexao, Autor), _carregar_mapa(conexao, Genero))
+            conexao.commit()
+
+        lote = []
+        for registro in ler_registros(caminho):
+            lidos += 1
+            if not all(registro.get(campo) for campo in obrigatorios):
+                invalidos += 1
+                continue
+            lote.append({campo: registro.get(campo) for campo in obrigatorios + opcionais})
+            if len(lote) >= tamanho_lote:
+                inseridos += _gravar_lote(conexao, entidade, lote, mapas)
+                lote = []
+        if lote:
+            inseridos += _gravar_lote(conexao, entidade, lote, mapas)
+
+    duracao = time.perf_counter() - inicio
+    return {
+        'lidos': lidos,
+        'inseridos': inseridos,
+        'invalidos': invalidos,
+        'duplicados': lidos - invalidos - inseridos,
+        'segundos': duracao,
+        'registros_por_segundo': lidos / duracao if duracao else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importação em massa de registros a partir de CSV ou JSONL")
+    parser.add_argument('entidade', choices=sorted(CAMPOS))
+    parser.add_argument('arquivo', help="arquivo .csv (com cabeçalho) ou .jsonl")
+    parser.add_argument('--lote', type=int, default=5000, help="registros por transação (padrão: 5000)")
+    args = parser.parse_args()
+
+    relatorio = importar(args.entidade, args.arquivo, args.lote)
+    print(f"{relatorio['lidos']} registros lidos em {relatorio['segundos']:.2f} s "
+          f"({relatorio['registros_por_segundo']:.0f} registros/s)")
+    print(f"Inseridos: {relatorio['inseridos']}")
+    print(f"Rejeitados por campos ausentes: {relatorio['invalidos']}")
+    print(f"Rejeitados por duplicidade: {relatorio['duplicados']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+import logging
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Instrumentação das consultas SQL: contagem, tempo total, percentis e linhas por
+# (ação, função), mais um log das consultas lentas. A ação é um rótulo definido por quem
+# origina o trabalho (a janela da interface, a rota HTTP) e viaja com o contexto até as
+# threads de trabalho; a função é a função pública do núcleo que emitiu o comando.
+#
+# Desligada, não há nenhum ouvinte registrado nas engines: o único custo que sobra é
+# manter o rótulo da ação no contexto.
+
+_acao = ContextVar('acao', default=None)
+
+# Módulo cujas funções públicas recebem a autoria dos comandos
+MODULO_RASTREADO = 'biblioteca.nucleo'
+
+log_lentas = logging.getLogger('biblioteca.sql_lenta')
+
+
+def definir_acao(nome):
+    # Para a thread principal da interface, onde a ação vale até a próxima interação
+    _acao.set(nome)
+
+
+def acao_atual():
+    return _acao.get()
+
+
+@contextmanager
+def acao(nome):
+    token = _acao.set(nome)
+    try:
+        yield
+    finally:
+        _acao.reset(token)
+
+
+def _funcao_de_origem():
+    # A função mais externa do módulo rastreado na pilha (ex.: registrar_emprestimo, e
+    # não novo_emprestimo); sem ela, a primeira função fora do SQLAlchemy
+    quadro = sys._getframe(2)
+    origem = externa = None
+    while quadro is not None:
+        modulo = quadro.f_globals.get('__name__', '')
+        if modulo == MODULO_RASTREADO:
+            origem = quadro.f_code.co_name
+        elif externa is None and not modulo.startswith('sqlalchemy') and modulo != __name__:
+            externa = f"{modulo}.{quadro.f_code.co_name}"
+        quadro = quadro.f_back
+    return origem or externa or '?'
+
+
+class _Execucao:
+    # Um comando em andamento. No SQLite o trabalho de um SELECT acontece enquanto as
+    # linhas são lidas, então a duração vai até a última linha consumida; a execução é
+    # contabilizada no comando seguinte da mesma conexão ou quando ela volta ao pool
+    __slots__ = ('chave', 'comando', 'parametros', 'inicio', 'fim', 'linhas')
+
+    def __init__(self, chave, comando, parametros):
+        self.chave = chave
+        self.comando = comando
+        self.parametros = parametros
+        self.linhas = 0
+        self.inicio = self.fim = time.perf_counter()
+
+    def __call__(self, cursor, linha):
+        # row_factory do cursor
+        self.linhas += 1
+        self.fim = time.perf_counter()
+        return linha
+
+
+class _Estatistica:
+    __slots__ = ('comandos', 'total_s', 'maximo_s', 'linhas', 'amostras')
+
+    def __init__(self, amostras):
+        self.comandos = 0
+        self.total_s = 0.0
+        self.maximo_s = 0.0
+        self.linhas = 0
+        self.amostras = deque(maxlen=amostras)
+
+
+def _percentil(ordenados, fracao):
+    return ordenados[min(len(ordenados) - 1, int(fracao * len(ordenados)))]
+
+
+class Instrumentacao:
+    def __init__(self, limite_lento_ms=100, arquivo_lentas=None, amostras=1000):
+        # amostras: quantas durações recentes guardar por (ação, função) para os percentis
+        self.limite_lento_s = limite_lento_ms / 1000
+        self._amostras = amostras
+        self._estatisticas = {}
+        self._lock = threading.Lock()
+        self._engines = []
+        if arquivo_lentas:
+            manipulador = logging.FileHandler(arquivo_lentas, encoding='utf-8')
+            manipulador.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+            log_lentas.addHandler(manipulador)
+            log_lentas.setLevel(logging.WARNING)
+
+    def instalar(self, *engines):
+        # O SQLAlchemy é importado só aqui, para que a interface possa importar este
+        # módulo antes de o núcleo ser carregado
+        from sqlalchemy import event
+        for engine in engines:
+            event.listen(engine, 'before_cursor_execute', self._antes)
+            event.listen(engine, 'after_cursor_execute', self._depois)
+            event.listen(engine, 'checkin', self._devolvida)
+            self._engines.append(engine)
+
+    def remover(self):
+        from sqlalchemy import event
+        for engine in self._engines:
+            event.remove(engine, 'before_cursor_execute', self._antes)
+            event.remove(engine, 'after_cursor_execute', self._depois)
+            event.remove(engine, 'checkin', self._devolvida)
+        self._engines = []
+
+    def zerar(self):
+        with self._lock:
+            self._estatisticas.clear()
+
+    def _antes(self, conexao, cursor, comando, parametros, contexto, executemany):
+        self._contabilizar(conexao.info.pop('execucao_sql', None))
+        execucao = _Execucao((_acao.get() or '-', _funcao_de_origem()), comando, parametros)
+        cursor.row_factory = execucao
+        conexao.info['execucao_sql'] = execucao
+
+    def _depois(self, conexao, cursor, comando, parametros, contexto, executemany):
+        execucao = conexao.info.get('execucao_sql')
+        if execucao is not None:
+            execucao.fim = time.perf_counter()
+            # Linhas afetadas por INSERT/UPDATE/DELETE; as de SELECT são contadas na leitura
+            if cursor.rowcount > 0:
+                execucao.linhas += cursor.rowcount
+
+    def _devolvida(self, conexao_dbapi, registro):
+        if registro is not None:
+            self._contabilizar(registro.info.pop('execucao_sql', None))
+
+    def _contabilizar(self, execucao):
+        if execucao is None:
+            return
+        duracao = execucao.fim - execucao.inicio
+        with self._lock:
+            estatistica = self._estatisticas.get(execucao.chave)
+            if estatistica is None:
+                estatistica = self._estatisticas[execucao.chave] = _Estatistica(self._amostras)
+            estatistica.comandos += 1
+            estatistica.total_s += duracao
+            estatistica.maximo_s = max(estatistica.maximo_s, duracao)
+            estatistica.linhas += execucao.linhas
+            estatistica.amostras.append(duracao)
+        if duracao >= self.limite_lento_s:
+            log_lentas.warning("%.1f ms, %d linhas [%s / %s] %s %r", duracao * 1000, execucao.linhas,
+                               execucao.chave[0], execucao.chave[1], ' '.join(execucao.comando.split()),
+                               execucao.parametros)
+
+    def estatisticas(self):
+        # Uma entrada por (ação, função), da que mais consumiu tempo para a que menos
+        with self._lock:
+            itens = [(chave, estatistica, sorted(estatistica.amostras))
+                     for chave, estatistica in self._estatisticas.items() if estatistica.comandos]
+            resultado = [{
+                'acao': acao_,
+                'funcao': funcao,
+                'comandos': estatistica.comandos,
+                'linhas': estatistica.linhas,
+                'total_ms': estatistica.total_s * 1000,
+                'p50_ms': _percentil(amostras, 0.50) * 1000,
+                'p95_ms': _percentil(amostras, 0.95) * 1000,
+                'p99_ms': _percentil(amostras, 0.99) * 1000,
+                'max_ms': estatistica.maximo_s * 1000,
+            } for (acao_, funcao), estatistica, amostras in itens]
+        return sorted(resultado, key=lambda item: item['total_ms'], reverse=True)
+
+    def relatorio(self):
+        linhas = [f"{'ação':<28} {'função':<30} {'cmds':>7} {'linhas':>9} {'total ms':>10} "
+                  f"{'p50':>7} {'p95':>7} {'p99':>7} {'máx':>8}"]
+        for item in self.estatisticas():
+            linhas.append(f"{item['acao'][:28]:<28} {item['funcao'][:30]:<30} {item['comandos']:>7} "
+                          f"{item['linhas']:>9} {item['total_ms']:>10.1f} {item['p50_ms']:>7.2f} "
+                          f"{item['p95_ms']:>7.2f} {item['p99_ms']:>7.2f} {item['max_ms']:>8.1f}")
+        return '\n'.join(linhas)
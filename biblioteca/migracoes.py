@@ -0,0 +1,216 @@
+from sqlalchemy import inspect
+
+from .captura import AGORA, criar_captura
+from .relatorios import criar_gatilhos_exclusao, criar_resumos
+
+# Migrações versionadas do esquema. A versão fica em PRAGMA user_version no próprio
+# arquivo do banco; create_all só cria tabelas novas e não altera as existentes, então
+# índices, chaves e tabelas virtuais em bancos antigos são aplicados aqui, em ordem.
+
+# Índice de busca textual (FTS5) sobre título, nome e biografia do autor, um documento
+# por livro (rowid = id do livro). Os triggers mantêm o índice em dia a cada gravação.
+DDL_INDICE_BUSCA = [
+    """CREATE VIRTUAL TABLE livros_busca USING fts5(
+        titulo, autor, biografia, prefix='2 3', tokenize='unicode61 remove_diacritics 2')""",
+    # Título pesa mais que o nome do autor, que pesa mais que a biografia
+    """INSERT INTO livros_busca(livros_busca, rank) VALUES ('rank', 'bm25(10.0, 5.0, 1.0)')""",
+    """INSERT INTO livros_busca(rowid, titulo, autor, biografia)
+        SELECT l.id, l.titulo, a.nome, a.biografia FROM livros l LEFT JOIN autores a ON a.id = l.autor_id""",
+    """CREATE TRIGGER livros_busca_ai AFTER INSERT ON livros BEGIN
+        INSERT INTO livros_busca(rowid, titulo, autor, biografia)
+        VALUES (NEW.id, NEW.titulo,
+                (SELECT nome FROM autores WHERE id = NEW.autor_id),
+                (SELECT biografia FROM autores WHERE id = NEW.autor_id));
+    END""",
+    """CREATE TRIGGER livros_busca_au AFTER UPDATE OF titulo, autor_id ON livros BEGIN
+        UPDATE livros_busca SET titulo = NEW.titulo,
+            autor = (SELECT nome FROM autores WHERE id = NEW.autor_id),
+            biografia = (SELECT biografia FROM autores WHERE id = NEW.autor_id)
+        WHERE rowid = NEW.id;
+    END""",
+    """CREATE TRIGGER livros_busca_ad AFTER DELETE ON livros BEGIN
+        DELETE FROM livros_busca WHERE rowid = OLD.id;
+    END""",
+    """CREATE TRIGGER autores_busca_au AFTER UPDATE OF nome, biografia ON autores BEGIN
+        UPDATE livros_busca SET autor = NEW.nome, biografia = NEW.biografia
+        WHERE rowid IN (SELECT id FROM livros WHERE autor_id = NEW.id);
+    END""",
+    """CREATE TRIGGER autores_busca_ad AFTER DELETE ON autores BEGIN
+        UPDATE livros_busca SET autor = NULL, biografia = NULL
+        WHERE rowid IN (SELECT id FROM livros WHERE autor_id = OLD.id);
+    END""",
+]
+
+
+def _executar(conexao, comandos):
+    for comando in comandos:
+        conexao.exec_driver_sql(comando)
+
+
+def _criar_indice_busca(conexao):
+    if not inspect(conexao).has_table('livros_busca'):
+        _executar(conexao, DDL_INDICE_BUSCA)
+
+
+def _migracao_1(conexao):
+    # Índices nas chaves estrangeiras de livros e chave primária em livro_leitor.
+    # Empréstimos duplicados do mesmo livro para o mesmo leitor são fundidos, mantendo
+    # a data mais antiga.
+    _executar(conexao, [
+        "CREATE INDEX IF NOT EXISTS ix_livros_autor_id ON livros (autor_id)",
+        "CREATE INDEX IF NOT EXISTS ix_livros_genero_id ON livros (genero_id)",
+        """CREATE TABLE livro_leitor_nova (
+            livro_id INTEGER NOT NULL REFERENCES livros (id),
+            leitor_id INTEGER NOT NULL REFERENCES leitores (id),
+            data_emprestimo DATE,
+            PRIMARY KEY (livro_id, leitor_id))""",
+        """INSERT INTO livro_leitor_nova (livro_id, leitor_id, data_emprestimo)
+            SELECT livro_id, leitor_id, MIN(data_emprestimo) FROM livro_leitor
+            WHERE livro_id IS NOT NULL AND leitor_id IS NOT NULL
+            GROUP BY livro_id, leitor_id""",
+        "DROP TABLE livro_leitor",
+        "ALTER TABLE livro_leitor_nova RENAME TO livro_leitor",
+        "CREATE INDEX ix_livro_leitor_leitor_id ON livro_leitor (leitor_id, livro_id)",
+    ])
+    _criar_indice_busca(conexao)
+
+
+def _migracao_2(conexao):
+    # Empréstimos passam de livro_leitor para o registro emprestimos, com datas de saída,
+    # prevista e de devolução; os devolvidos vão para emprestimos_arquivo
+    _executar(conexao, [
+        """CREATE TABLE emprestimos (
+            id INTEGER NOT NULL PRIMARY KEY,
+            livro_id INTEGER NOT NULL REFERENCES livros (id),
+            leitor_id INTEGER NOT NULL REFERENCES leitores (id),
+            data_emprestimo DATE NOT NULL,
+            data_prevista DATE NOT NULL,
+            data_devolucao DATE,
+            devolvido BOOLEAN NOT NULL)""",
+        "CREATE INDEX ix_emprestimos_livro_id ON emprestimos (livro_id)",
+        "CREATE INDEX ix_emprestimos_data_prevista ON emprestimos (data_prevista)",
+        "CREATE INDEX ix_emprestimos_leitor_id_devolvido ON emprestimos (leitor_id, devolvido)",
+        """CREATE TABLE emprestimos_arquivo (
+            id INTEGER NOT NULL PRIMARY KEY,
+            livro_id INTEGER NOT NULL,
+            leitor_id INTEGER NOT NULL,
+            data_emprestimo DATE NOT NULL,
+            data_prevista DATE NOT NULL,
+            data_devolucao DATE,
+            devolvido BOOLEAN NOT NULL)""",
+        "CREATE INDEX ix_emprestimos_arquivo_livro_id ON emprestimos_arquivo (livro_id)",
+        "CREATE INDEX ix_emprestimos_arquivo_leitor_id ON emprestimos_arquivo (leitor_id)",
+        """INSERT INTO emprestimos (livro_id, leitor_id, data_emprestimo, data_prevista, devolvido)
+            SELECT livro_id, leitor_id, COALESCE(data_emprestimo, date('now')),
+                   date(COALESCE(data_emprestimo, date('now')), '+14 days'), 0
+            FROM livro_leitor ORDER BY data_emprestimo""",
+        "DROP TABLE livro_leitor",
+    ])
+
+
+def _migracao_3(conexao):
+    # Tabelas de resumo dos relatórios de circulação, mantidas por triggers (ver relatorios.py)
+    criar_resumos(conexao)
+
+
+def _migracao_4(conexao):
+    # Autores e gêneros excluídos em massa deixam de aparecer nos resumos
+    criar_gatilhos_exclusao(conexao)
+
+
+def _migracao_5(conexao):
+    # Índices sem diferença de maiúsculas para as sugestões por prefixo (autocompletar)
+    _executar(conexao, [
+        "CREATE INDEX ix_autores_nome_nocase ON autores (nome COLLATE NOCASE)",
+        "CREATE INDEX ix_generos_nome_nocase ON generos (nome COLLATE NOCASE)",
+        "CREATE INDEX ix_leitores_nome_nocase ON leitores (nome COLLATE NOCASE)",
+        "CREATE INDEX ix_livros_titulo_nocase ON livros (titulo COLLATE NOCASE)",
+    ])
+
+
+def _migracao_6(conexao):
+    # Log de alterações e estado da sincronização entre filiais (ver captura.py). O que
+    # já existe no banco não entra no log: a primeira exportação para uma filial nova
+    # deve ser completa (ver sincronizacao.py)
+    criar_captura(conexao)
+
+
+def _migracao_7(conexao):
+    # emprestimos passa a ter AUTOINCREMENT: sem ele o SQLite reaproveita o id mais alto
+    # depois do arquivamento, e o id novo colide com o do empréstimo já arquivado (chave
+    # de emprestimos_arquivo, dos triggers de resumo e da chave global da sincronização).
+    # A sequência começa acima dos ids arquivados; empréstimos que já reaproveitaram um id
+    # arquivado recebem um id novo, registrado no log de captura como inserção.
+    dependentes = [sql for sql, in conexao.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE tbl_name = 'emprestimos' AND type IN ('index', 'trigger') "
+        "AND sql IS NOT NULL")]
+    colunas = "livro_id, leitor_id, data_emprestimo, data_prevista, data_devolucao, devolvido"
+    _executar(conexao, [
+        """CREATE TABLE emprestimos_nova (
+            id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+            livro_id INTEGER NOT NULL REFERENCES livros (id),
+            leitor_id INTEGER NOT NULL REFERENCES leitores (id),
+            data_emprestimo DATE NOT NULL,
+            data_prevista DATE NOT NULL,
+            data_devolucao DATE,
+            devolvido BOOLEAN NOT NULL)""",
+        f"""INSERT INTO emprestimos_nova (id, {colunas})
+            SELECT id, {colunas} FROM emprestimos WHERE id NOT IN (SELECT id FROM emprestimos_arquivo)""",
+        "DELETE FROM sqlite_sequence WHERE name = 'emprestimos_nova'",
+        """INSERT INTO sqlite_sequence (name, seq) VALUES ('emprestimos_nova', max(
+            COALESCE((SELECT max(id) FROM emprestimos), 0), COALESCE((SELECT max(id) FROM emprestimos_arquivo), 0)))""",
+        f"""INSERT INTO emprestimos_nova ({colunas})
+            SELECT {colunas} FROM emprestimos WHERE id IN (SELECT id FROM emprestimos_arquivo) ORDER BY id""",
+        f"""INSERT INTO sinc_log (tabela, registro_id, operacao, momento)
+            SELECT 'emprestimos', id, 'I', {AGORA} FROM emprestimos_nova
+            WHERE id > (SELECT COALESCE(max(id), 0) FROM emprestimos)
+              AND id > (SELECT COALESCE(max(id), 0) FROM emprestimos_arquivo)""",
+        "DROP TABLE emprestimos",
+        "ALTER TABLE emprestimos_nova RENAME TO emprestimos",
+    ] + dependentes)
+
+
+# Cada entrada leva o banco da versão anterior para a versão indicada
+MIGRACOES = {
+    1: _migracao_1,
+    2: _migracao_2,
+    3: _migracao_3,
+    4: _migracao_4,
+    5: _migracao_5,
+    6: _migracao_6,
+    7: _migracao_7,
+}
+VERSAO_ESQUEMA = max(MIGRACOES)
+
+
+def versao_do_banco(conexao):
+    return conexao.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def preparar_banco(engine, metadata):
+    # O pysqlite não abre transação antes de DDL; em AUTOCOMMIT a transação é aberta
+    # explicitamente, para que cada atualização seja aplicada por inteiro ou não seja
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conexao:
+        if versao_do_banco(conexao) == VERSAO_ESQUEMA:
+            return
+
+        conexao.exec_driver_sql("BEGIN IMMEDIATE")
+        try:
+            # Relê a versão dentro do lock de escrita: outro processo pode ter migrado antes
+            versao = versao_do_banco(conexao)
+            if versao > VERSAO_ESQUEMA:
+                raise RuntimeError(f"O banco está na versão {versao}, mais nova que a suportada ({VERSAO_ESQUEMA})")
+            if not inspect(conexao).has_table('livros'):
+                metadata.create_all(conexao)
+                _criar_indice_busca(conexao)
+                criar_resumos(conexao)
+                criar_captura(conexao)
+            else:
+                for numero in range(versao + 1, VERSAO_ESQUEMA + 1):
+                    MIGRACOES[numero](conexao)
+                metadata.create_all(conexao)
+            conexao.exec_driver_sql(f"PRAGMA user_version = {VERSAO_ESQUEMA}")
+            conexao.exec_driver_sql("COMMIT")
+        except Exception:
+            conexao.exec_driver_sql("ROLLBACK")
+            raise
@@ -0,0 +1,628 @@
+from sqlalchemy import (collate, delete, exists, func, insert, literal, select, text, update, Boolean, Column, Integer,
+                        String, ForeignKey, Date, Index)
+from sqlalchemy.orm import declarative_base, joinedload, relationship, scoped_session, selectinload, sessionmaker
+from datetime import date, timedelta
+from contextlib import contextmanager
+import functools
+import json
+import re
+import threading
+
+from .armazenamento import carregar_configuracao, criar_engines
+from .alteracoes import RegistroAlteracoes, anotar_alteracoes, registrar_ao_confirmar, ATUALIZADO, REMOVIDO
+from .cache import CacheLRU, invalidar_ao_confirmar
+from .migracoes import preparar_banco
+from . import relatorios
+
+# Núcleo da biblioteca: modelos, sessão e funções CRUD, sem dependência da interface.
+# Usado pela aplicação Tkinter (app.py), pelo importador e pelo serviço HTTP.
+# Importar o módulo não abre o banco: quem o usa chama iniciar() antes da primeira consulta.
+
+# Configuração do SQLAlchemy
+Base = declarative_base()
+
+PRAZO_EMPRESTIMO = timedelta(days=14)
+
+def _data_prevista_padrao():
+    return date.today() + PRAZO_EMPRESTIMO
+
+# Definição das Entidades
+class Livro(Base):
+    __tablename__ = 'livros'
+    id = Column(Integer, primary_key=True)
+    titulo = Column(String, nullable=False)
+    isbn = Column(String, unique=True, nullable=False)
+    autor_id = Column(Integer, ForeignKey('autores.id'), index=True)
+    genero_id = Column(Integer, ForeignKey('generos.id'), index=True)
+
+    __table_args__ = (Index('ix_livros_titulo_nocase', collate(titulo, 'NOCASE')),)
+
+    autor = relationship("Autor", back_populates="livros")
+    genero = relationship("Genero", back_populates="livros")
+    emprestimos = relationship("Emprestimo", back_populates="livro")
+    # Leitores com empréstimo ativo deste livro
+    leitores = relationship("Leitor", secondary='emprestimos',
+                            primaryjoin="and_(Livro.id == Emprestimo.livro_id, Emprestimo.devolvido == False)",
+                            secondaryjoin="Leitor.id == Emprestimo.leitor_id",
+                            viewonly=True)
+
+class Autor(Base):
+    __tablename__ = 'autores'
+    id = Column(Integer, primary_key=True)
+    nome = Column(String, nullable=False)
+    biografia = Column(String)
+    livros = relationship("Livro", back_populates="autor")
+
+    __table_args__ = (Index('ix_autores_nome_nocase', collate(nome, 'NOCASE')),)
+
+class Genero(Base):
+    __tablename__ = 'generos'
+    id = Column(Integer, primary_key=True)
+    nome = Column(String, unique=True, nullable=False)
+    livros = relationship("Livro", back_populates="genero")
+
+    __table_args__ = (Index('ix_generos_nome_nocase', collate(nome, 'NOCASE')),)
+
+class Leitor(Base):
+    __tablename__ = 'leitores'
+    id = Column(Integer, primary_key=True)
+    nome = Column(String, nullable=False)
+    email = Column(String, unique=True, nullable=False)
+    emprestimos = relationship("Emprestimo", back_populates="leitor")
+
+    __table_args__ = (Index('ix_leitores_nome_nocase', collate(nome, 'NOCASE')),)
+    # Livros emprestados e ainda não devolvidos
+    livros = relationship("Livro", secondary='emprestimos',
+                          primaryjoin="and_(Leitor.id == Emprestimo.leitor_id, Emprestimo.devolvido == False)",
+                          secondaryjoin="Livro.id == Emprestimo.livro_id",
+                          viewonly=True)
+
+# Registro de empréstimos: cada empréstimo é uma linha com datas de saída, prevista e
+# de devolução. Devolver não apaga a linha; os devolvidos são movidos periodicamente para
+# emprestimos_arquivo, para que a tabela de empréstimos ativos continue pequena.
+class Emprestimo(Base):
+    __tablename__ = 'emprestimos'
+    id = Column(Integer, primary_key=True)
+    livro_id = Column(Integer, ForeignKey('livros.id'), nullable=False, index=True)
+    leitor_id = Column(Integer, ForeignKey('leitores.id'), nullable=False)
+    data_emprestimo = Column(Date, nullable=False, default=date.today)
+    data_prevista = Column(Date, nullable=False, default=_data_prevista_padrao, index=True)
+    data_devolucao = Column(Date)
+    devolvido = Column(Boolean, nullable=False, default=False)
+
+    livro = relationship("Livro", back_populates="emprestimos")
+    leitor = relationship("Leitor", back_populates="emprestimos")
+
+    # AUTOINCREMENT: o id de um empréstimo arquivado nunca é reaproveitado (ver migracoes._migracao_7)
+    __table_args__ = (Index('ix_emprestimos_leitor_id_devolvido', 'leitor_id', 'devolvido'),
+                      {'sqlite_autoincrement': True})
+
+class EmprestimoArquivado(Base):
+    __tablename__ = 'emprestimos_arquivo'
+    id = Column(Integer, primary_key=True)
+    livro_id = Column(Integer, nullable=False, index=True)
+    leitor_id = Column(Integer, nullable=False, index=True)
+    data_emprestimo = Column(Date, nullable=False)
+    data_prevista = Column(Date, nullable=False)
+    data_devolucao = Column(Date)
+    devolvido = Column(Boolean, nullable=False)
+
+# Configuração do banco de dados SQLite (ver armazenamento.py), preenchida por iniciar():
+# engine é a conexão única de escrita; engine_leitura, o pool de conexões somente
+# leitura das listagens
+configuracao = None
+engine = None
+engine_leitura = None
+_lock_inicio = threading.Lock()
+
+# Sessão de escrita por thread: a thread principal e cada thread do executor de tarefas têm a sua
+Session = sessionmaker()
+session = scoped_session(Session)
+
+# Unidade de trabalho: cada ação (uma função CRUD, um lote do serviço HTTP) usa a sessão
+# da thread e a fecha ao terminar. O mapa de identidade é descartado a cada ação, então
+# a memória não cresce com o uso e a ação seguinte relê do banco o que as outras estações
+# gravaram, em vez de servir objetos velhos. Unidades aninhadas compartilham a sessão e
+# só a mais externa a fecha; uma exceção desfaz o que não foi confirmado.
+_unidades = threading.local()
+
+@contextmanager
+def unidade_de_trabalho():
+    externa = not getattr(_unidades, 'ativa', False)
+    _unidades.ativa = True
+    try:
+        yield session
+    finally:
+        if externa:
+            _unidades.ativa = False
+            session.remove()
+
+def em_unidade_de_trabalho(funcao):
+    @functools.wraps(funcao)
+    def executar(*args, **kwargs):
+        with unidade_de_trabalho():
+            return funcao(*args, **kwargs)
+    return executar
+
+# Sessões curtas de leitura, abertas com "with SessaoLeitura() as leitura:" e devolvidas
+# ao pool ao final da consulta, sem segurar a conexão de escrita
+SessaoLeitura = sessionmaker()
+
+def iniciar(config=None):
+    # Abre o banco e aplica as migrações pendentes; chamadas seguintes não fazem nada
+    global configuracao, engine, engine_leitura
+    with _lock_inicio:
+        if engine is not None:
+            return
+        config = config or carregar_configuracao()
+        escrita, leitura = criar_engines(config)
+        preparar_banco(escrita, Base.metadata)
+        Session.configure(bind=escrita)
+        SessaoLeitura.configure(bind=leitura)
+        configuracao, engine, engine_leitura = config, escrita, leitura
+
+# Cache das listas de opções, invalidado pelos commits que tocam as tabelas de origem
+cache_opcoes = CacheLRU(capacidade=64)
+invalidar_ao_confirmar(cache_opcoes, Session)
+
+# Registro das alterações confirmadas, usado para atualizar as grades incrementalmente.
+# Na grade de empréstimos cada linha é um leitor, então empréstimos são registrados por leitor_id.
+registro_alteracoes = RegistroAlteracoes()
+registrar_ao_confirmar(registro_alteracoes, Session, agrupamentos={'emprestimos': 'leitor_id'})
+
+# Funções CRUD
+@em_unidade_de_trabalho
+def adicionar_livro(titulo, isbn, autor_id, genero_id):
+    novo_livro = Livro(titulo=titulo, isbn=isbn, autor_id=autor_id, genero_id=genero_id)
+    session.add(novo_livro)
+    session.commit()
+
+# A unidade de trabalho fecha a sessão ao sair, então as relações que as telas usam
+# (livro.autor, livro.genero, leitor.livros) já vêm carregadas na mesma consulta
+@em_unidade_de_trabalho
+def listar_livros():
+    return session.query(Livro).options(joinedload(Livro.autor), joinedload(Livro.genero)).all()
+
+@em_unidade_de_trabalho
+def editar_livro(livro_id, titulo, isbn, autor_id, genero_id):
+    livro = session.query(Livro).get(livro_id)
+    if not livro:
+        return False
+    livro.titulo = titulo
+    livro.isbn = isbn
+    livro.autor_id = autor_id
+    livro.genero_id = genero_id
+    session.commit()
+    return True
+
+@em_unidade_de_trabalho
+def excluir_livro(livro_id):
+    return bool(excluir_livros([livro_id]))
+
+@em_unidade_de_trabalho
+def adicionar_autor(nome, biografia):
+    novo_autor = Autor(nome=nome, biografia=biografia)
+    session.add(novo_autor)
+    session.commit()
+
+@em_unidade_de_trabalho
+def listar_autores():
+    return session.query(Autor).all()
+
+@em_unidade_de_trabalho
+def editar_autor(autor_id, nome, biografia):
+    autor = session.query(Autor).get(autor_id)
+    if not autor:
+        return False
+    autor.nome = nome
+    autor.biografia = biografia
+    session.commit()
+    return True
+
+@em_unidade_de_trabalho
+def excluir_autor(autor_id):
+    return bool(excluir_autores([autor_id]))
+
+@em_unidade_de_trabalho
+def adicionar_genero(nome):
+    novo_genero = Genero(nome=nome)
+    session.add(novo_genero)
+    session.commit()
+
+@em_unidade_de_trabalho
+def listar_generos():
+    return session.query(Genero).all()
+
+@em_unidade_de_trabalho
+def editar_genero(genero_id, nome):
+    genero = session.query(Genero).get(genero_id)
+    if not genero:
+        return False
+    genero.nome = nome
+    session.commit()
+    return True
+
+@em_unidade_de_trabalho
+def excluir_genero(genero_id):
+    return bool(excluir_generos([genero_id]))
+
+@em_unidade_de_trabalho
+def adicionar_leitor(nome, email):
+    novo_leitor = Leitor(nome=nome, email=email)
+    session.add(novo_leitor)
+    session.commit()
+
+@em_unidade_de_trabalho
+def listar_leitores():
+    return session.query(Leitor).all()
+
+@em_unidade_de_trabalho
+def editar_leitor(leitor_id, nome, email):
+    leitor = session.query(Leitor).get(leitor_id)
+    if not leitor:
+        return False
+    leitor.nome = nome
+    leitor.email = email
+    session.commit()
+    return True
+
+@em_unidade_de_trabalho
+def excluir_leitor(leitor_id):
+    return bool(excluir_leitores([leitor_id]))
+
+# Operações em massa sobre a seleção das grades. Cada tabela é alterada por um único
+# comando, com os ids passados como um array JSON lido por json_each (sem o limite de
+# parâmetros do SQLite), tudo em uma transação. Devolvem os ids efetivamente alterados.
+def _lista_ids(ids):
+    valores = func.json_each(json.dumps([int(registro_id) for registro_id in ids])).table_valued('value')
+    return select(valores.c.value)
+
+def _executar_em_massa(comando):
+    return session.scalars(comando.execution_options(synchronize_session=False)).all()
+
+def _sem_emprestimo_ativo(coluna, coluna_id):
+    return ~exists().where(coluna == coluna_id, Emprestimo.devolvido == False)
+
+# Copia os empréstimos para emprestimos_arquivo e os apaga de emprestimos (os triggers de
+# resumo e de captura ignoram essa exclusão)
+def _mover_para_arquivo(emprestimo_ids):
+    colunas = [coluna.name for coluna in EmprestimoArquivado.__table__.columns]
+    alvo = Emprestimo.id.in_(_lista_ids(emprestimo_ids))
+    session.execute(insert(EmprestimoArquivado).from_select(
+        colunas, select(*[Emprestimo.__table__.c[coluna] for coluna in colunas]).where(alvo)))
+    session.execute(delete(Emprestimo).where(alvo))
+
+# O histórico dos livros e leitores excluídos vai para o arquivo, que não referencia
+# livros nem leitores; em emprestimos ficariam linhas com a chave estrangeira quebrada
+def arquivar_devolvidos(coluna, ids):
+    _mover_para_arquivo(session.scalars(
+        select(Emprestimo.id).where(coluna.in_(_lista_ids(ids)), Emprestimo.devolvido == True)).all())
+
+# Livros com empréstimo ativo são mantidos; os empréstimos já devolvidos vão para o arquivo
+@em_unidade_de_trabalho
+def excluir_livros(ids):
+    arquivar_devolvidos(Emprestimo.livro_id, ids)
+    removidos = _executar_em_massa(
+        delete(Livro).where(Livro.id.in_(_lista_ids(ids)), _sem_emprestimo_ativo(Emprestimo.livro_id, Livro.id))
+        .returning(Livro.id))
+    anotar_alteracoes(session, 'livros', removidos, REMOVIDO)
+    session.commit()
+    return removidos
+
+# Os livros dos autores e gêneros removidos ficam sem autor ou gênero
+def _excluir_referenciado(modelo, tabela, coluna_livro, ids):
+    alvo = _lista_ids(ids)
+    livros = _executar_em_massa(
+        update(Livro).where(coluna_livro.in_(alvo)).values({coluna_livro: None}).returning(Livro.id))
+    removidos = _executar_em_massa(delete(modelo).where(modelo.id.in_(alvo)).returning(modelo.id))
+    anotar_alteracoes(session, 'livros', livros, ATUALIZADO)
+    anotar_alteracoes(session, tabela, removidos, REMOVIDO)
+    session.commit()
+    return removidos
+
+@em_unidade_de_trabalho
+def excluir_autores(ids):
+    return _excluir_referenciado(Autor, 'autores', Livro.autor_id, ids)
+
+@em_unidade_de_trabalho
+def excluir_generos(ids):
+    return _excluir_referenciado(Genero, 'generos', Livro.genero_id, ids)
+
+# Leitores com empréstimo ativo são mantidos; os empréstimos já devolvidos vão para o arquivo
+@em_unidade_de_trabalho
+def excluir_leitores(ids):
+    arquivar_devolvidos(Emprestimo.leitor_id, ids)
+    removidos = _executar_em_massa(
+        delete(Leitor).where(Leitor.id.in_(_lista_ids(ids)), _sem_emprestimo_ativo(Emprestimo.leitor_id, Leitor.id))
+        .returning(Leitor.id))
+    anotar_alteracoes(session, 'leitores', removidos, REMOVIDO)
+    session.commit()
+    return removidos
+
+# Passa os livros para outro autor ou gênero; None se o destino não existe
+def _reatribuir(modelo, coluna_livro, livro_ids, destino_id):
+    if not session.get(modelo, destino_id):
+        return None
+    alterados = _executar_em_massa(
+        update(Livro).where(Livro.id.in_(_lista_ids(livro_ids)), coluna_livro.is_distinct_from(destino_id))
+        .values({coluna_livro: destino_id}).returning(Livro.id))
+    anotar_alteracoes(session, 'livros', alterados, ATUALIZADO)
+    session.commit()
+    return alterados
+
+@em_unidade_de_trabalho
+def reatribuir_autor(livro_ids, autor_id):
+    return _reatribuir(Autor, Livro.autor_id, livro_ids, int(autor_id))
+
+@em_unidade_de_trabalho
+def reatribuir_genero(livro_ids, genero_id):
+    return _reatribuir(Genero, Livro.genero_id, livro_ids, int(genero_id))
+
+# Cria o empréstimo na sessão, sem confirmar; None se o livro ou o leitor não existem
+# ou se o livro já está emprestado. Deve rodar dentro da unidade de trabalho de quem
+# confirma (lote do serviço HTTP).
+def novo_emprestimo(livro_id, leitor_id):
+    if not (session.get(Livro, livro_id) and session.get(Leitor, leitor_id)) or _emprestimo_ativo_do_livro(livro_id):
+        return None
+    emprestimo = Emprestimo(livro_id=livro_id, leitor_id=leitor_id)
+    session.add(emprestimo)
+    return emprestimo
+
+def _leitor_existe(leitor_id):
+    return session.scalar(select(Leitor.id).where(Leitor.id == leitor_id)) is not None
+
+# Empréstimos em lote, por id de livro ou de empréstimo. Cada operação é um único
+# comando sobre a lista de ids (ver _lista_ids), em uma transação, sem carregar o leitor
+# nem a coleção de empréstimos dele. Na grade de empréstimos a linha é o leitor, então
+# as alterações são anotadas pelo leitor_id (antes e depois, na transferência).
+
+# Empresta os livros ao leitor. Livros inexistentes, já emprestados ou repetidos na lista
+# são ignorados. Devolve os ids dos livros emprestados, ou None se o leitor não existe.
+@em_unidade_de_trabalho
+def emprestar_livros(leitor_id, livro_ids):
+    leitor_id = int(leitor_id)
+    if not _leitor_existe(leitor_id):
+        return None
+    hoje = date.today()
+    disponiveis = select(Livro.id, literal(leitor_id), literal(hoje), literal(hoje + PRAZO_EMPRESTIMO), literal(False)) \
+        .where(Livro.id.in_(_lista_ids(livro_ids)), _sem_emprestimo_ativo(Emprestimo.livro_id, Livro.id))
+    emprestados = session.scalars(
+        insert(Emprestimo).from_select(
+            ['livro_id', 'leitor_id', 'data_emprestimo', 'data_prevista', 'devolvido'], disponiveis)
+        .returning(Emprestimo.livro_id)).all()
+    if emprestados:
+        anotar_alteracoes(session, 'emprestimos', [leitor_id], ATUALIZADO)
+    session.commit()
+    return emprestados
+
+@em_unidade_de_trabalho
+def registrar_emprestimo(livro_id, leitor_id):
+    return bool(emprestar_livros(leitor_id, [livro_id]))
+
+def _devolver(condicao):
+    devolvidos = session.execute(
+        update(Emprestimo).where(condicao, Emprestimo.devolvido == False)
+        .values(devolvido=True, data_devolucao=date.today())
+        .returning(Emprestimo.id, Emprestimo.leitor_id)
+        .execution_options(synchronize_session=False)).all()
+    anotar_alteracoes(session, 'emprestimos', {leitor_id for _, leitor_id in devolvidos}, ATUALIZADO)
+    session.commit()
+    return [emprestimo_id for emprestimo_id, _ in devolvidos]
+
+# Devolve os empréstimos ativos entre os ids; devolve os ids dos empréstimos encerrados
+@em_unidade_de_trabalho
+def devolver_emprestimos(emprestimo_ids):
+    return _devolver(Emprestimo.id.in_(_lista_ids(emprestimo_ids)))
+
+# Devolução no balcão pelo livro, sem informar o leitor
+@em_unidade_de_trabalho
+def devolver_livros(livro_ids):
+    return _devolver(Emprestimo.livro_id.in_(_lista_ids(livro_ids)))
+
+# Passa os empréstimos ativos entre os ids para outro leitor; devolve os ids
+# transferidos, ou None se o leitor não existe
+@em_unidade_de_trabalho
+def transferir_emprestimos(emprestimo_ids, novo_leitor_id):
+    novo_leitor_id = int(novo_leitor_id)
+    if not _leitor_existe(novo_leitor_id):
+        return None
+    condicao = (Emprestimo.id.in_(_lista_ids(emprestimo_ids)), Emprestimo.devolvido == False,
+                Emprestimo.leitor_id != novo_leitor_id)
+    # O UPDATE ... RETURNING do SQLite só devolve os valores novos: os leitores de origem
+    # são lidos antes, na mesma transação
+    origens = set(session.scalars(select(Emprestimo.leitor_id).where(*condicao).distinct()))
+    transferidos = _executar_em_massa(
+        update(Emprestimo).where(*condicao).values(leitor_id=novo_leitor_id).returning(Emprestimo.id))
+    if transferidos:
+        anotar_alteracoes(session, 'emprestimos', origens | {novo_leitor_id}, ATUALIZADO)
+    session.commit()
+    return transferidos
+
+@em_unidade_de_trabalho
+def listar_emprestimos():
+    return session.query(Leitor).options(selectinload(Leitor.livros)).all()
+
+def _emprestimo_ativo_do_livro(livro_id):
+    return session.query(Emprestimo).filter_by(livro_id=livro_id, devolvido=False).first()
+
+def _emprestimo_ativo_por_titulo(leitor_id, titulo_livro):
+    return session.scalar(
+        select(Emprestimo.id)
+        .join(Livro, Livro.id == Emprestimo.livro_id)
+        .where(Emprestimo.leitor_id == leitor_id, Emprestimo.devolvido == False, Livro.titulo == titulo_livro)
+        .limit(1))
+
+# Versões por título, mantidas para quem ainda identifica o empréstimo pelo nome do
+# livro; títulos repetidos tornam a escolha ambígua, prefira as funções por id
+@em_unidade_de_trabalho
+def devolver_emprestimo(leitor_id, titulo_livro):
+    emprestimo_id = _emprestimo_ativo_por_titulo(leitor_id, titulo_livro)
+    return bool(emprestimo_id and devolver_emprestimos([emprestimo_id]))
+
+@em_unidade_de_trabalho
+def transferir_emprestimo(leitor_id_atual, titulo_livro, novo_leitor_id):
+    emprestimo_id = _emprestimo_ativo_por_titulo(leitor_id_atual, titulo_livro)
+    return bool(emprestimo_id and transferir_emprestimos([emprestimo_id], novo_leitor_id))
+
+# Move os empréstimos devolvidos para emprestimos_arquivo, um lote por transação
+@em_unidade_de_trabalho
+def arquivar_emprestimos(tamanho_lote=1000):
+    arquivados = 0
+    while True:
+        ids = session.scalars(
+            select(Emprestimo.id).where(Emprestimo.devolvido == True).order_by(Emprestimo.id).limit(tamanho_lote)
+        ).all()
+        if not ids:
+            return arquivados
+        _mover_para_arquivo(ids)
+        session.commit()
+        arquivados += len(ids)
+
+# Sugestões das caixas de autocompletar: os registros cujo nome começa pelo texto
+# digitado, sem diferenciar maiúsculas, em ordem alfabética e no máximo LIMITE_SUGESTOES.
+# O LIKE com prefixo e a ordenação percorrem o índice NOCASE da coluna, então o custo
+# não depende do tamanho da tabela. Um número também traz o registro com esse id.
+LIMITE_SUGESTOES = 20
+
+def _sugerir(modelo, coluna, texto, limite):
+    padrao = re.sub(r'([\\%_])', r'\\\1', texto) + '%'
+    with SessaoLeitura() as leitura:
+        pares = [tuple(linha) for linha in leitura.execute(
+            select(modelo.id, coluna).where(coluna.like(padrao, escape='\\'))
+            .order_by(collate(coluna, 'NOCASE')).limit(limite))]
+        if texto.isdigit():
+            exato = leitura.execute(select(modelo.id, coluna).where(modelo.id == int(texto))).first()
+            if exato and tuple(exato) not in pares:
+                pares = [tuple(exato)] + pares[:limite - 1]
+        return pares
+
+def sugerir_autores(texto, limite=LIMITE_SUGESTOES):
+    return cache_opcoes.obter((('autores',), 'sugestoes', texto, limite),
+                              lambda: _sugerir(Autor, Autor.nome, texto, limite))
+
+def sugerir_generos(texto, limite=LIMITE_SUGESTOES):
+    return cache_opcoes.obter((('generos',), 'sugestoes', texto, limite),
+                              lambda: _sugerir(Genero, Genero.nome, texto, limite))
+
+def sugerir_leitores(texto, limite=LIMITE_SUGESTOES):
+    return cache_opcoes.obter((('leitores',), 'sugestoes', texto, limite),
+                              lambda: _sugerir(Leitor, Leitor.nome, texto, limite))
+
+def sugerir_livros(texto, limite=LIMITE_SUGESTOES):
+    return cache_opcoes.obter((('livros',), 'sugestoes', texto, limite),
+                              lambda: _sugerir(Livro, Livro.titulo, texto, limite))
+
+# Leitura paginada por chave (keyset): busca a página seguinte a partir do último id
+# já carregado, sem OFFSET, para que o custo de cada página não cresça com a tabela
+TAMANHO_PAGINA = 200
+
+# Com ids, em vez da página seguinte, traz apenas essas linhas (atualização incremental)
+def _filtrar_pagina(consulta, coluna_id, apos_id, ids):
+    if apos_id is not None:
+        consulta = consulta.filter(coluna_id > apos_id)
+    if ids is not None:
+        consulta = consulta.filter(coluna_id.in_(ids))
+    return consulta
+
+def _listar_pagina(modelo, apos_id, limite, ids):
+    with SessaoLeitura() as leitura:
+        consulta = _filtrar_pagina(leitura.query(modelo).order_by(modelo.id), modelo.id, apos_id, ids)
+        return consulta.limit(limite).all()
+
+def listar_livros_paginado(apos_id=None, limite=TAMANHO_PAGINA, ids=None):
+    return _listar_pagina(Livro, apos_id, limite, ids)
+
+def listar_autores_paginado(apos_id=None, limite=TAMANHO_PAGINA, ids=None):
+    return _listar_pagina(Autor, apos_id, limite, ids)
+
+def listar_generos_paginado(apos_id=None, limite=TAMANHO_PAGINA, ids=None):
+    return _listar_pagina(Genero, apos_id, limite, ids)
+
+def listar_leitores_paginado(apos_id=None, limite=TAMANHO_PAGINA, ids=None):
+    return _listar_pagina(Leitor, apos_id, limite, ids)
+
+# Consultas de leitura das grades: trazem tudo o que a linha exibe em um único SELECT,
+# evitando um carregamento preguiçoso (lazy load) por linha
+def listar_livros_detalhado(apos_id=None, limite=TAMANHO_PAGINA, ids=None):
+    with SessaoLeitura() as leitura:
+        consulta = (leitura.query(Livro.id, Livro.titulo, Livro.isbn, Autor.nome, Genero.nome)
+                    .outerjoin(Autor, Livro.autor_id == Autor.id)
+                    .outerjoin(Genero, Livro.genero_id == Genero.id)
+                    .order_by(Livro.id))
+        return _filtrar_pagina(consulta, Livro.id, apos_id, ids).limit(limite).all()
+
+def listar_emprestimos_agrupados(apos_id=None, limite=TAMANHO_PAGINA, ids=None):
+    with SessaoLeitura() as leitura:
+        consulta = (leitura.query(Leitor.id, Leitor.nome, func.group_concat(Livro.titulo, ', '))
+                    .outerjoin(Emprestimo, (Emprestimo.leitor_id == Leitor.id) & (Emprestimo.devolvido == False))
+                    .outerjoin(Livro, Livro.id == Emprestimo.livro_id)
+                    .group_by(Leitor.id)
+                    .order_by(Leitor.id))
+        return _filtrar_pagina(consulta, Leitor.id, apos_id, ids).limit(limite).all()
+
+# Linhas das grades que exibem um autor, gênero ou livro alterado, até a última linha
+# carregada (ver grade.buscar_alteracoes): renomear um autor atualiza só os livros dele
+def _ids_dependentes(coluna_id, coluna, chaves, ate_id, *condicoes):
+    with SessaoLeitura() as leitura:
+        return leitura.scalars(
+            select(coluna_id).where(coluna.in_(_lista_ids(chaves)), coluna_id <= ate_id, *condicoes).distinct()).all()
+
+def livros_dos_autores(autor_ids, ate_id):
+    return _ids_dependentes(Livro.id, Livro.autor_id, autor_ids, ate_id)
+
+def livros_dos_generos(genero_ids, ate_id):
+    return _ids_dependentes(Livro.id, Livro.genero_id, genero_ids, ate_id)
+
+def leitores_dos_livros(livro_ids, ate_id):
+    return _ids_dependentes(Emprestimo.leitor_id, Emprestimo.livro_id, livro_ids, ate_id, Emprestimo.devolvido == False)
+
+# Empréstimos ativos de um leitor, exibidos sob a linha dele na grade de empréstimos
+def listar_emprestimos_ativos(leitor_id):
+    with SessaoLeitura() as leitura:
+        return leitura.execute(
+            select(Emprestimo.id, Livro.id, Livro.titulo, Emprestimo.data_emprestimo, Emprestimo.data_prevista)
+            .join(Livro, Livro.id == Emprestimo.livro_id)
+            .where(Emprestimo.leitor_id == leitor_id, Emprestimo.devolvido == False)
+            .order_by(Emprestimo.id)).all()
+
+LIMITE_BUSCA = 100
+
+def _consulta_fts(texto):
+    # Cada palavra vira um termo entre aspas com prefixo (*), o que também evita que
+    # caracteres especiais do usuário sejam interpretados como sintaxe do FTS5
+    return ' '.join(f'"{termo}"*' for termo in re.findall(r'\w+', texto))
+
+# Busca textual ranqueada por relevância; devolve as mesmas colunas de listar_livros_detalhado
+def buscar_livros(consulta, limite=LIMITE_BUSCA):
+    termos = _consulta_fts(consulta)
+    if not termos:
+        return []
+    with SessaoLeitura() as leitura:
+        return leitura.execute(text("""
+            SELECT l.id, l.titulo, l.isbn, a.nome, g.nome
+            FROM (SELECT rowid, rank FROM livros_busca WHERE livros_busca MATCH :termos
+                  ORDER BY rank LIMIT :limite) AS r
+            JOIN livros l ON l.id = r.rowid
+            LEFT JOIN autores a ON a.id = l.autor_id
+            LEFT JOIN generos g ON g.id = l.genero_id
+            ORDER BY r.rank
+        """), {'termos': termos, 'limite': limite}).all()
+
+# Pares (id, título) da busca textual, para as caixas de autocompletar. O índice de
+# busca também cobre nome e biografia do autor, daí a dependência de autores
+def buscar_opcoes_livros(consulta, limite=LIMITE_BUSCA):
+    return cache_opcoes.obter(
+        (('livros', 'autores'), 'busca', consulta, limite),
+        lambda: [(linha[0], linha[1]) for linha in buscar_livros(consulta, limite)]
+    )
+
+# Relatórios de circulação: leem só as tabelas de resumo (ver relatorios.py)
+def consultar_relatorio(nome, limite=relatorios.LIMITE_RELATORIO):
+    with SessaoLeitura() as leitura:
+        return leitura.execute(text(relatorios.RELATORIOS[nome][2]), {'limite': limite}).all()
+
+# Recalcula os resumos a partir dos empréstimos, caso tenham se desencontrado
+@em_unidade_de_trabalho
+def reconstruir_resumos():
+    relatorios.reconstruir_resumos(session.connection())
+    session.commit()
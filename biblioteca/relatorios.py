@@ -0,0 +1,193 @@
+import argparse
+import time
+
+# Relatórios de circulação a partir de tabelas de resumo mantidas pelo próprio SQLite.
+# Os triggers abaixo atualizam os totais a cada empréstimo, transferência, exclusão e
+# alteração de livro, então os relatórios leem só algumas linhas já agregadas, qualquer
+# que seja o volume de empréstimos. reconstruir_resumos() recalcula tudo a partir das
+# tabelas de origem, para reparo ("python -m biblioteca.relatorios --reconstruir").
+#
+# Os empréstimos contam o histórico inteiro: ativos, devolvidos e arquivados. Arquivar
+# move a linha de emprestimos para emprestimos_arquivo sem mudar os totais.
+
+DDL_RESUMOS = [
+    """CREATE TABLE resumo_livros (
+        livro_id INTEGER NOT NULL PRIMARY KEY,
+        emprestimos INTEGER NOT NULL DEFAULT 0)""",
+    "CREATE INDEX ix_resumo_livros_emprestimos ON resumo_livros (emprestimos)",
+    """CREATE TABLE resumo_leitores (
+        leitor_id INTEGER NOT NULL PRIMARY KEY,
+        emprestimos INTEGER NOT NULL DEFAULT 0)""",
+    "CREATE INDEX ix_resumo_leitores_emprestimos ON resumo_leitores (emprestimos)",
+    """CREATE TABLE resumo_generos (
+        genero_id INTEGER NOT NULL PRIMARY KEY,
+        livros INTEGER NOT NULL DEFAULT 0,
+        emprestimos INTEGER NOT NULL DEFAULT 0)""",
+    """CREATE TABLE resumo_autores (
+        autor_id INTEGER NOT NULL PRIMARY KEY,
+        livros INTEGER NOT NULL DEFAULT 0)""",
+    "CREATE INDEX ix_resumo_autores_livros ON resumo_autores (livros)",
+
+    # Empréstimo novo: +1 para o livro, o leitor e o gênero do livro
+    """CREATE TRIGGER resumo_emprestimos_ai AFTER INSERT ON emprestimos BEGIN
+        INSERT INTO resumo_livros (livro_id, emprestimos) VALUES (NEW.livro_id, 1)
+            ON CONFLICT (livro_id) DO UPDATE SET emprestimos = emprestimos + 1;
+        INSERT INTO resumo_leitores (leitor_id, emprestimos) VALUES (NEW.leitor_id, 1)
+            ON CONFLICT (leitor_id) DO UPDATE SET emprestimos = emprestimos + 1;
+        INSERT INTO resumo_generos (genero_id, emprestimos)
+            SELECT genero_id, 1 FROM livros WHERE id = NEW.livro_id AND genero_id IS NOT NULL
+            ON CONFLICT (genero_id) DO UPDATE SET emprestimos = emprestimos + 1;
+    END""",
+    # Transferência (ou troca de livro): o empréstimo passa a contar para o novo dono
+    """CREATE TRIGGER resumo_emprestimos_au AFTER UPDATE OF livro_id, leitor_id ON emprestimos
+    WHEN OLD.livro_id <> NEW.livro_id OR OLD.leitor_id <> NEW.leitor_id BEGIN
+        UPDATE resumo_livros SET emprestimos = emprestimos - 1 WHERE livro_id = OLD.livro_id;
+        UPDATE resumo_leitores SET emprestimos = emprestimos - 1 WHERE leitor_id = OLD.leitor_id;
+        UPDATE resumo_generos SET emprestimos = emprestimos - 1
+            WHERE genero_id = (SELECT genero_id FROM livros WHERE id = OLD.livro_id);
+        INSERT INTO resumo_livros (livro_id, emprestimos) VALUES (NEW.livro_id, 1)
+            ON CONFLICT (livro_id) DO UPDATE SET emprestimos = emprestimos + 1;
+        INSERT INTO resumo_leitores (leitor_id, emprestimos) VALUES (NEW.leitor_id, 1)
+            ON CONFLICT (leitor_id) DO UPDATE SET emprestimos = emprestimos + 1;
+        INSERT INTO resumo_generos (genero_id, emprestimos)
+            SELECT genero_id, 1 FROM livros WHERE id = NEW.livro_id AND genero_id IS NOT NULL
+            ON CONFLICT (genero_id) DO UPDATE SET emprestimos = emprestimos + 1;
+    END""",
+    # Empréstimo removido; o arquivamento copia a linha para emprestimos_arquivo antes de
+    # apagá-la, e nesse caso os totais não mudam
+    """CREATE TRIGGER resumo_emprestimos_ad AFTER DELETE ON emprestimos
+    WHEN NOT EXISTS (SELECT 1 FROM emprestimos_arquivo WHERE id = OLD.id) BEGIN
+        UPDATE resumo_livros SET emprestimos = emprestimos - 1 WHERE livro_id = OLD.livro_id;
+        UPDATE resumo_leitores SET emprestimos = emprestimos - 1 WHERE leitor_id = OLD.leitor_id;
+        UPDATE resumo_generos SET emprestimos = emprestimos - 1
+            WHERE genero_id = (SELECT genero_id FROM livros WHERE id = OLD.livro_id);
+    END""",
+    """CREATE TRIGGER resumo_emprestimos_arquivo_ad AFTER DELETE ON emprestimos_arquivo BEGIN
+        UPDATE resumo_livros SET emprestimos = emprestimos - 1 WHERE livro_id = OLD.livro_id;
+        UPDATE resumo_leitores SET emprestimos = emprestimos - 1 WHERE leitor_id = OLD.leitor_id;
+        UPDATE resumo_generos SET emprestimos = emprestimos - 1
+            WHERE genero_id = (SELECT genero_id FROM livros WHERE id = OLD.livro_id);
+    END""",
+
+    # Livros por autor e por gênero
+    """CREATE TRIGGER resumo_livros_ai AFTER INSERT ON livros BEGIN
+        INSERT INTO resumo_autores (autor_id, livros) SELECT NEW.autor_id, 1 WHERE NEW.autor_id IS NOT NULL
+            ON CONFLICT (autor_id) DO UPDATE SET livros = livros + 1;
+        INSERT INTO resumo_generos (genero_id, livros) SELECT NEW.genero_id, 1 WHERE NEW.genero_id IS NOT NULL
+            ON CONFLICT (genero_id) DO UPDATE SET livros = livros + 1;
+    END""",
+    # Livro que muda de autor ou de gênero leva junto os seus empréstimos
+    """CREATE TRIGGER resumo_livros_au AFTER UPDATE OF autor_id, genero_id ON livros BEGIN
+        UPDATE resumo_autores SET livros = livros - 1 WHERE autor_id = OLD.autor_id;
+        INSERT INTO resumo_autores (autor_id, livros) SELECT NEW.autor_id, 1 WHERE NEW.autor_id IS NOT NULL
+            ON CONFLICT (autor_id) DO UPDATE SET livros = livros + 1;
+        UPDATE resumo_generos SET livros = livros - 1,
+            emprestimos = emprestimos - COALESCE((SELECT emprestimos FROM resumo_livros WHERE livro_id = OLD.id), 0)
+            WHERE genero_id = OLD.genero_id;
+        INSERT INTO resumo_generos (genero_id, livros, emprestimos)
+            SELECT NEW.genero_id, 1, COALESCE((SELECT emprestimos FROM resumo_livros WHERE livro_id = NEW.id), 0)
+            WHERE NEW.genero_id IS NOT NULL
+            ON CONFLICT (genero_id) DO UPDATE SET livros = livros + 1, emprestimos = emprestimos + excluded.emprestimos;
+    END""",
+    # Os empréstimos de um livro excluído deixam de contar para o gênero, mas continuam
+    # contando para os leitores
+    """CREATE TRIGGER resumo_livros_ad AFTER DELETE ON livros BEGIN
+        UPDATE resumo_autores SET livros = livros - 1 WHERE autor_id = OLD.autor_id;
+        UPDATE resumo_generos SET livros = livros - 1,
+            emprestimos = emprestimos - COALESCE((SELECT emprestimos FROM resumo_livros WHERE livro_id = OLD.id), 0)
+            WHERE genero_id = OLD.genero_id;
+        DELETE FROM resumo_livros WHERE livro_id = OLD.id;
+    END""",
+]
+
+# Autores e gêneros excluídos saem dos resumos; as exclusões em massa (ver nucleo.py)
+# tiram antes os livros deles, então os totais já estão zerados
+DDL_RESUMOS_EXCLUSOES = [
+    """CREATE TRIGGER IF NOT EXISTS resumo_autores_ad AFTER DELETE ON autores BEGIN
+        DELETE FROM resumo_autores WHERE autor_id = OLD.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS resumo_generos_ad AFTER DELETE ON generos BEGIN
+        DELETE FROM resumo_generos WHERE genero_id = OLD.id;
+    END""",
+]
+
+# Recalcula as tabelas de resumo a partir de livros, emprestimos e emprestimos_arquivo
+DML_RECONSTRUIR = [
+    "DELETE FROM resumo_livros",
+    "DELETE FROM resumo_leitores",
+    "DELETE FROM resumo_generos",
+    "DELETE FROM resumo_autores",
+    """CREATE TEMP VIEW IF NOT EXISTS todos_emprestimos AS
+        SELECT livro_id, leitor_id FROM emprestimos
+        UNION ALL SELECT livro_id, leitor_id FROM emprestimos_arquivo""",
+    """INSERT INTO resumo_livros (livro_id, emprestimos)
+        SELECT e.livro_id, COUNT(*) FROM todos_emprestimos e JOIN livros l ON l.id = e.livro_id
+        GROUP BY e.livro_id""",
+    """INSERT INTO resumo_leitores (leitor_id, emprestimos)
+        SELECT leitor_id, COUNT(*) FROM todos_emprestimos GROUP BY leitor_id""",
+    """INSERT INTO resumo_generos (genero_id, livros, emprestimos)
+        SELECT l.genero_id, COUNT(*), COALESCE(SUM(r.emprestimos), 0)
+        FROM livros l LEFT JOIN resumo_livros r ON r.livro_id = l.id
+        WHERE l.genero_id IS NOT NULL GROUP BY l.genero_id""",
+    """INSERT INTO resumo_autores (autor_id, livros)
+        SELECT autor_id, COUNT(*) FROM livros WHERE autor_id IS NOT NULL GROUP BY autor_id""",
+    "DROP VIEW todos_emprestimos",
+]
+
+# Relatórios disponíveis: título, cabeçalhos das colunas e consulta (parâmetro :limite).
+# Cada um lê só a tabela de resumo e os nomes das linhas exibidas.
+RELATORIOS = {
+    'generos': ("Empréstimos por gênero", ("Gênero", "Empréstimos", "Livros"), """
+        SELECT g.nome, r.emprestimos, r.livros FROM resumo_generos r JOIN generos g ON g.id = r.genero_id
+        ORDER BY r.emprestimos DESC LIMIT :limite"""),
+    'livros': ("Livros mais emprestados", ("Título", "Empréstimos"), """
+        SELECT l.titulo, r.emprestimos FROM resumo_livros r JOIN livros l ON l.id = r.livro_id
+        WHERE r.emprestimos > 0 ORDER BY r.emprestimos DESC LIMIT :limite"""),
+    'leitores': ("Leitores mais ativos", ("Leitor", "Empréstimos"), """
+        SELECT le.nome, r.emprestimos FROM resumo_leitores r JOIN leitores le ON le.id = r.leitor_id
+        WHERE r.emprestimos > 0 ORDER BY r.emprestimos DESC LIMIT :limite"""),
+    'autores': ("Livros por autor", ("Autor", "Livros"), """
+        SELECT a.nome, r.livros FROM resumo_autores r JOIN autores a ON a.id = r.autor_id
+        WHERE r.livros > 0 ORDER BY r.livros DESC LIMIT :limite"""),
+}
+
+LIMITE_RELATORIO = 20
+
+
+def criar_resumos(conexao):
+    for comando in DDL_RESUMOS + DDL_RESUMOS_EXCLUSOES:
+        conexao.exec_driver_sql(comando)
+    reconstruir_resumos(conexao)
+
+
+def criar_gatilhos_exclusao(conexao):
+    for comando in DDL_RESUMOS_EXCLUSOES:
+        conexao.exec_driver_sql(comando)
+
+
+def reconstruir_resumos(conexao):
+    for comando in DML_RECONSTRUIR:
+        conexao.exec_driver_sql(comando)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Relatórios de circulação da biblioteca")
+    parser.add_argument('--reconstruir', action='store_true',
+                        help="recalcula as tabelas de resumo a partir dos empréstimos")
+    parser.add_argument('--limite', type=int, default=LIMITE_RELATORIO)
+    args = parser.parse_args()
+
+    from . import nucleo
+    nucleo.iniciar()
+    if args.reconstruir:
+        inicio = time.perf_counter()
+        nucleo.reconstruir_resumos()
+        print(f"Resumos reconstruídos em {time.perf_counter() - inicio:.2f}s")
+    for nome, (titulo, colunas, _) in RELATORIOS.items():
+        print(f"\n{titulo}")
+        for linha in nucleo.consultar_relatorio(nome, args.limite):
+            print('  ' + '  '.join(str(valor) for valor in linha))
+
+
+if __name__ == "__main__":
+    main()
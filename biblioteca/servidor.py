@@ -0,0 +1,320 @@
+import argparse
+import asyncio
+import contextvars
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from sqlalchemy.exc import IntegrityError
+
+from . import nucleo
+from .instrumentacao import Instrumentacao, acao
+
+# Serviço HTTP/JSON sobre o núcleo, para que os balcões de atendimento sejam clientes
+# leves de um único processo dono do biblioteca.db. Leituras rodam em um pool limitado
+# de threads (cada uma com a sua sessão e conexão); gravações entram em uma fila e são
+# confirmadas em lotes por um único escritor, o que evita disputa pelo lock do SQLite.
+#
+#   GET  /livros | /autores | /generos | /leitores | /emprestimos   ?apos=<id>&limite=<n>
+#   GET  /livros/busca?q=<termos>&limite=<n>
+#   POST /livros | /autores | /generos | /leitores | /emprestimos   (corpo JSON)
+#   GET  /estatisticas   (com --instrumentar: consultas SQL por rota e função e o cache de opções)
+
+LIMITE_MAXIMO = 1000
+log = logging.getLogger('biblioteca.servidor')
+FRASES = {200: 'OK', 201: 'Created', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+          409: 'Conflict', 422: 'Unprocessable Entity', 500: 'Internal Server Error'}
+
+
+class ErroRequisicao(Exception):
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+
+
+# Leitura: função de página do núcleo e conversão de cada linha em dicionário
+LISTAGENS = {
+    '/livros': (nucleo.listar_livros_detalhado,
+                lambda linha: dict(zip(('id', 'titulo', 'isbn', 'autor', 'genero'), linha))),
+    '/autores': (nucleo.listar_autores_paginado,
+                 lambda autor: {'id': autor.id, 'nome': autor.nome, 'biografia': autor.biografia}),
+    '/generos': (nucleo.listar_generos_paginado,
+                 lambda genero: {'id': genero.id, 'nome': genero.nome}),
+    '/leitores': (nucleo.listar_leitores_paginado,
+                  lambda leitor: {'id': leitor.id, 'nome': leitor.nome, 'email': leitor.email}),
+    '/emprestimos': (nucleo.listar_emprestimos_agrupados,
+                     lambda linha: {'leitor_id': linha[0], 'leitor': linha[1], 'livros': linha[2] or ''}),
+}
+
+
+# Valida e converte os campos antes de chegarem ao SQLite: um tipo inesperado (lista,
+# objeto, número enorme) seria recusado pelo sqlite3 como parâmetro e não como conflito
+def _campos(dados, *obrigatorios, inteiros=()):
+    faltando = [campo for campo in obrigatorios if dados.get(campo) in (None, '')]
+    if faltando:
+        raise ErroRequisicao(400, f"Campos obrigatórios ausentes: {', '.join(faltando)}")
+    return [_inteiro(dados, campo) if campo in inteiros else _texto(dados, campo) for campo in obrigatorios]
+
+
+def _inteiro(dados, campo):
+    valor = dados[campo]
+    if isinstance(valor, str):
+        try:
+            valor = int(valor)
+        except ValueError:
+            pass
+    if isinstance(valor, bool) or not isinstance(valor, int) or not 0 < valor < 2 ** 63:
+        raise ErroRequisicao(400, f"Campo {campo} deve ser um id inteiro positivo")
+    return valor
+
+
+def _texto(dados, campo):
+    valor = dados.get(campo)
+    if valor is not None and not isinstance(valor, str):
+        raise ErroRequisicao(400, f"Campo {campo} deve ser texto")
+    return valor
+
+
+def _existe(modelo, **filtro):
+    return nucleo.session.query(modelo.id).filter_by(**filtro).first() is not None
+
+
+def _novo_registro(recurso, dados):
+    # Monta o objeto a gravar; conflitos de unicidade viram 409 em vez de abortar o lote
+    if recurso == '/autores':
+        nome, = _campos(dados, 'nome')
+        registro = nucleo.Autor(nome=nome, biografia=_texto(dados, 'biografia'))
+    elif recurso == '/generos':
+        nome, = _campos(dados, 'nome')
+        if _existe(nucleo.Genero, nome=nome):
+            raise ErroRequisicao(409, f"Gênero já cadastrado: {nome}")
+        registro = nucleo.Genero(nome=nome)
+    elif recurso == '/leitores':
+        nome, email = _campos(dados, 'nome', 'email')
+        if _existe(nucleo.Leitor, email=email):
+            raise ErroRequisicao(409, f"Email já cadastrado: {email}")
+        registro = nucleo.Leitor(nome=nome, email=email)
+    elif recurso == '/livros':
+        titulo, isbn, autor_id, genero_id = _campos(dados, 'titulo', 'isbn', 'autor_id', 'genero_id',
+                                                    inteiros=('autor_id', 'genero_id'))
+        if _existe(nucleo.Livro, isbn=isbn):
+            raise ErroRequisicao(409, f"ISBN já cadastrado: {isbn}")
+        # O SQLite não confere as chaves estrangeiras nesta conexão (PRAGMA foreign_keys)
+        if not _existe(nucleo.Autor, id=autor_id):
+            raise ErroRequisicao(422, f"Autor inexistente: {autor_id}")
+        if not _existe(nucleo.Genero, id=genero_id):
+            raise ErroRequisicao(422, f"Gênero inexistente: {genero_id}")
+        registro = nucleo.Livro(titulo=titulo, isbn=isbn, autor_id=autor_id, genero_id=genero_id)
+    elif recurso == '/emprestimos':
+        livro_id, leitor_id = _campos(dados, 'livro_id', 'leitor_id', inteiros=('livro_id', 'leitor_id'))
+        registro = nucleo.novo_emprestimo(livro_id, leitor_id)
+        if registro is None:
+            raise ErroRequisicao(409, "Livro ou leitor inexistente, ou livro já emprestado")
+        return registro
+    else:
+        raise ErroRequisicao(404, f"Recurso desconhecido: {recurso}")
+    nucleo.session.add(registro)
+    return registro
+
+
+def _gravar(pedidos):
+    # Um commit para o lote inteiro; o autoflush torna visíveis aos pedidos seguintes
+    # os registros ainda não confirmados (ex.: dois empréstimos do mesmo livro no lote)
+    registros = []
+    for recurso, dados in pedidos:
+        try:
+            with acao(f'POST {recurso}'):
+                registros.append(_novo_registro(recurso, dados))
+        except ErroRequisicao as erro:
+            registros.append(erro)
+    with acao('POST (commit do lote)'):
+        # Os ids são lidos depois do flush e antes do commit, que expira os objetos
+        nucleo.session.flush()
+        resultados = [registro if isinstance(registro, ErroRequisicao) else {'id': registro.id}
+                      for registro in registros]
+        nucleo.session.commit()
+    return resultados
+
+
+# O lote inteiro é uma unidade de trabalho (ver nucleo.unidade_de_trabalho)
+def gravar_lote(pedidos):
+    with nucleo.unidade_de_trabalho():
+        try:
+            return _gravar(pedidos)
+        except Exception:
+            # Um pedido inválido derrubou o lote: refaz um a um para isolar o culpado,
+            # que recebe o erro sozinho enquanto os demais são gravados
+            nucleo.session.rollback()
+            resultados = []
+            for recurso, dados in pedidos:
+                try:
+                    resultados.extend(_gravar([(recurso, dados)]))
+                except IntegrityError as erro:
+                    nucleo.session.rollback()
+                    resultados.append(ErroRequisicao(409, str(erro.orig)))
+                except Exception as erro:
+                    nucleo.session.rollback()
+                    resultados.append(erro)
+            return resultados
+
+
+def ler(funcao, *args):
+    with nucleo.unidade_de_trabalho():
+        return funcao(*args)
+
+
+class Servidor:
+    def __init__(self, leitores=8, conexoes_maximas=256, lote_escrita=200, instrumentacao=None):
+        self._pool_leitura = ThreadPoolExecutor(max_workers=leitores, thread_name_prefix='leitura')
+        self._pool_escrita = ThreadPoolExecutor(max_workers=1, thread_name_prefix='escrita')
+        self._conexoes = asyncio.Semaphore(conexoes_maximas)
+        self._lote_escrita = lote_escrita
+        self._fila_escrita = None
+        self.instrumentacao = instrumentacao
+
+    async def iniciar(self, host, porta):
+        self._fila_escrita = asyncio.Queue()
+        asyncio.create_task(self._escritor())
+        return await asyncio.start_server(self._atender, host, porta)
+
+    async def _escritor(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            lote = [await self._fila_escrita.get()]
+            while len(lote) < self._lote_escrita and not self._fila_escrita.empty():
+                lote.append(self._fila_escrita.get_nowait())
+            pedidos = [(recurso, dados) for recurso, dados, _ in lote]
+            try:
+                resultados = await loop.run_in_executor(self._pool_escrita, gravar_lote, pedidos)
+            except Exception as erro:
+                resultados = [erro] * len(lote)
+            for (_, _, futuro), resultado in zip(lote, resultados):
+                if isinstance(resultado, Exception):
+                    futuro.set_exception(resultado)
+                else:
+                    futuro.set_result(resultado)
+
+    async def _ler(self, funcao, *args):
+        # run_in_executor não leva o contexto para a thread; a cópia leva o rótulo da ação
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool_leitura, contextvars.copy_context().run, ler, funcao, *args)
+
+    async def despachar(self, metodo, alvo, corpo):
+        partes = urlsplit(alvo)
+        caminho = partes.path.rstrip('/') or '/'
+        parametros = {chave: valores[-1] for chave, valores in parse_qs(partes.query).items()}
+        try:
+            limite = max(1, min(int(parametros.get('limite', nucleo.TAMANHO_PAGINA)), LIMITE_MAXIMO))
+            apos = int(parametros['apos']) if 'apos' in parametros else None
+        except ValueError:
+            raise ErroRequisicao(400, "Parâmetros apos e limite devem ser inteiros")
+
+        if caminho == '/estatisticas' and self.instrumentacao is not None:
+            return 200, {'itens': self.instrumentacao.estatisticas(), 'cache': nucleo.cache_opcoes.estatisticas()}
+
+        if caminho == '/livros/busca':
+            if metodo != 'GET':
+                raise ErroRequisicao(405, "Use GET")
+            linhas = await self._ler(nucleo.buscar_livros, parametros.get('q', ''), limite)
+            return 200, {'itens': [LISTAGENS['/livros'][1](linha) for linha in linhas]}
+
+        if caminho not in LISTAGENS:
+            raise ErroRequisicao(404, f"Recurso desconhecido: {caminho}")
+
+        if metodo == 'GET':
+            buscar_pagina, converter = LISTAGENS[caminho]
+            itens = await self._ler(lambda: [converter(linha) for linha in buscar_pagina(apos, limite)])
+            proximo = itens[-1]['id' if 'id' in itens[-1] else 'leitor_id'] if len(itens) == limite else None
+            return 200, {'itens': itens, 'proximo': proximo}
+
+        if metodo == 'POST':
+            try:
+                dados = json.loads(corpo or b'{}')
+            except ValueError:
+                raise ErroRequisicao(400, "Corpo JSON inválido")
+            if not isinstance(dados, dict):
+                raise ErroRequisicao(400, "O corpo deve ser um objeto JSON")
+            futuro = asyncio.get_running_loop().create_future()
+            await self._fila_escrita.put((caminho, dados, futuro))
+            return 201, await futuro
+
+        raise ErroRequisicao(405, "Use GET ou POST")
+
+    async def _atender(self, leitor, escritor):
+        async with self._conexoes:
+            try:
+                while True:
+                    linha = await leitor.readline()
+                    if not linha.strip():
+                        break
+                    metodo, alvo, _ = linha.decode('latin-1').split(' ', 2)
+                    cabecalhos = {}
+                    while True:
+                        linha = await leitor.readline()
+                        if linha in (b'\r\n', b'\n', b''):
+                            break
+                        nome, _, valor = linha.decode('latin-1').partition(':')
+                        cabecalhos[nome.strip().lower()] = valor.strip()
+                    corpo = await leitor.readexactly(int(cabecalhos.get('content-length', 0)))
+
+                    try:
+                        with acao(f"{metodo} {urlsplit(alvo).path}"):
+                            status, resposta = await self.despachar(metodo, alvo, corpo)
+                    except ErroRequisicao as erro:
+                        status, resposta = erro.status, {'erro': str(erro)}
+                    except Exception:
+                        # A mensagem de erros do SQLAlchemy traz o SQL e os parâmetros: fica no log
+                        log.exception("Erro ao atender %s %s", metodo, alvo)
+                        status, resposta = 500, {'erro': "Erro interno do servidor"}
+
+                    dados = json.dumps(resposta, ensure_ascii=False, default=str).encode('utf-8')
+                    escritor.write(
+                        f"HTTP/1.1 {status} {FRASES[status]}\r\n"
+                        f"Content-Type: application/json; charset=utf-8\r\n"
+                        f"Content-Length: {len(dados)}\r\n\r\n".encode('latin-1') + dados
+                    )
+                    await escritor.drain()
+                    if cabecalhos.get('connection', '').lower() == 'close':
+                        break
+            except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+                pass
+            finally:
+                escritor.close()
+
+
+async def servir(host, porta, leitores, conexoes_maximas, lote_escrita, instrumentacao=None):
+    servidor = Servidor(leitores, conexoes_maximas, lote_escrita, instrumentacao)
+    async with await servidor.iniciar(host, porta) as servico:
+        print(f"Servindo em http://{host}:{porta}")
+        await servico.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serviço HTTP/JSON da biblioteca")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=8080)
+    parser.add_argument('--leitores', type=int, default=8, help="threads de leitura (padrão: 8)")
+    parser.add_argument('--conexoes', type=int, default=256, help="conexões HTTP simultâneas (padrão: 256)")
+    parser.add_argument('--lote', type=int, default=200, help="gravações por commit (padrão: 200)")
+    parser.add_argument('--instrumentar', action='store_true',
+                        help="mede as consultas SQL por rota (GET /estatisticas; resumo ao encerrar)")
+    parser.add_argument('--sql-lenta-ms', type=float, default=100)
+    parser.add_argument('--log-sql-lenta', default='consultas_lentas.log')
+    args = parser.parse_args()
+
+    nucleo.iniciar()
+    instrumentacao = None
+    if args.instrumentar:
+        instrumentacao = Instrumentacao(args.sql_lenta_ms, args.log_sql_lenta)
+        instrumentacao.instalar(nucleo.engine, nucleo.engine_leitura)
+    try:
+        asyncio.run(servir(args.host, args.porta, args.leitores, args.conexoes, args.lote, instrumentacao))
+    except KeyboardInterrupt:
+        pass
+    if instrumentacao is not None:
+        print(instrumentacao.relatorio())
+
+
+if __name__ == "__main__":
+    main()
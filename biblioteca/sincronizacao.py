@@ -0,0 +1,613 @@
+import argparse
+import gzip
+import json
+import os
+import time
+from datetime import date
+
+from sqlalchemy import bindparam, collate, delete, insert, select, text, update
+
+from . import nucleo
+from .alteracoes import ATUALIZADO, INSERIDO, REMOVIDO, anotar_alteracoes
+from .captura import CHAVES_NATURAIS
+from .copia import NIVEL_COMPRESSAO
+from .nucleo import Autor, Emprestimo, EmprestimoArquivado, Genero, Leitor, Livro
+
+# Sincronização entre filiais por pacotes de alterações, a partir do log de captura
+# (ver captura.py). Cada filial tem o seu biblioteca.db; para consolidar, uma exporta o
+# que mudou desde o último envio a outra e a outra aplica o pacote. O tamanho e o tempo
+# de um pacote dependem do número de linhas alteradas, não do tamanho do banco.
+#
+# O pacote é um JSONL comprimido: um cabeçalho (origem, destino e o intervalo de seq
+# do log), um registro por linha alterada, com o estado atual dela ou a sua exclusão, e
+# uma linha final com o total, que mostra que o arquivo chegou inteiro. As linhas são
+# identificadas pela chave natural (ver captura.py), com referências também por chave
+# (o livro cita autor e gênero pelo nome; o empréstimo, o livro pelo ISBN e o leitor pelo
+# email).
+#
+# Marcas d'água (sinc_marcas): exportar avança "enviado" para a filial de destino (um
+# pacote vazio não avança, então perdê-lo não abre uma lacuna);
+# aplicar avança "recebido" da filial de origem e recusa um pacote que comece depois do
+# último recebido (faltaria um pacote no meio). Um pacote já aplicado é ignorado, e
+# aplicar o mesmo pacote de novo não muda nada. Para uma filial nova, ou depois de
+# perder pacotes, exporte com --completo. O cabeçalho leva também "visto": até onde a
+# origem já tinha aplicado o log do destino; as alterações locais depois disso são
+# concorrentes às do pacote.
+#
+# Conflitos: um ISBN ou email recebido que já existe nesta filial é o mesmo livro ou
+# leitor, e o registro local é atualizado em vez de duplicado. A chave antiga de uma
+# linha cuja chave foi trocada aqui, sem a origem ter visto, também leva à linha local.
+# Se a linha local tem alteração concorrente, a regra escolhida decide:
+#   recente (padrão): vale a alteração mais recente, pelo momento em que foi feita
+#   local: vale a alteração local
+#   remoto: vale sempre o pacote
+# Uma alteração que levaria um ISBN ou email já usado por outra linha local, a exclusão
+# de livro ou leitor com empréstimo ativo aqui e o empréstimo de um livro já emprestado
+# aqui são recusados e listados no resultado.
+#
+#   python -m biblioteca.sincronizacao filial --nome centro
+#   python -m biblioteca.sincronizacao exportar sede alteracoes.jsonl.gz
+#   python -m biblioteca.sincronizacao aplicar alteracoes.jsonl.gz --conflito recente
+
+FORMATO_PACOTE = 1
+IDS_POR_CONSULTA = 500
+REGISTROS_POR_TRANSACAO = 500
+REGRAS_CONFLITO = ('recente', 'local', 'remoto')
+# Inserções e alterações seguem esta ordem (referenciadas antes das que as referenciam);
+# exclusões, a ordem inversa
+ORDEM_TABELAS = ('generos', 'autores', 'livros', 'leitores', 'emprestimos')
+MODELOS = {'generos': Genero, 'autores': Autor, 'livros': Livro, 'leitores': Leitor}
+ROTULOS_CHAVE = {'generos': "nome do gênero", 'autores': "nome do autor", 'livros': "ISBN", 'leitores': "email"}
+# Limite de motivos de recusa guardados no resultado (o total é contado à parte)
+MOTIVOS_LISTADOS = 100
+
+
+class ErroPacote(Exception):
+    pass
+
+
+def _filial(conexao):
+    return conexao.execute(text("SELECT filial FROM sinc_estado WHERE id = 1")).scalar()
+
+
+def _marcas(conexao, filial):
+    linha = conexao.execute(text("SELECT enviado, recebido FROM sinc_marcas WHERE filial = :filial"),
+                            {'filial': filial}).first()
+    return (linha.enviado, linha.recebido) if linha else (0, 0)
+
+
+def _gravar_marca(sessao, filial, coluna, seq):
+    sessao.execute(text(f"""INSERT INTO sinc_marcas (filial, {coluna}) VALUES (:filial, :seq)
+        ON CONFLICT (filial) DO UPDATE SET {coluna} = max({coluna}, excluded.{coluna})"""),
+                   {'filial': filial, 'seq': seq})
+
+
+# Exportação
+
+# Última alteração de cada linha no intervalo, menos as que vieram da própria filial de
+# destino. chave_antiga é a primeira do intervalo: a chave que o destino ainda conhece.
+# O "+" em +tabela faz o SQLite percorrer só o intervalo de seq (chave primária) em vez
+# de todas as linhas da tabela no índice.
+CONSULTA_ALTERACOES = text("""
+    SELECT l.registro_id, l.operacao, l.momento,
+           (SELECT a.chave_antiga FROM sinc_log a
+            WHERE a.tabela = l.tabela AND a.registro_id = l.registro_id
+              AND a.seq > :desde AND a.seq <= :ate AND a.chave_antiga IS NOT NULL
+            ORDER BY a.seq LIMIT 1) AS chave_antiga
+    FROM sinc_log l
+    WHERE l.seq IN (SELECT max(seq) FROM sinc_log
+                    WHERE seq > :desde AND seq <= :ate AND +tabela = :tabela GROUP BY registro_id)
+      AND l.origem IS NOT :destino AND (l.operacao = 'D') = :exclusoes
+    ORDER BY l.seq""")
+
+
+def _consulta_completa(tabela):
+    # Todas as linhas, com o momento da última alteração conhecida (0 se anterior ao log)
+    momento = ("COALESCE((SELECT max(momento) FROM sinc_log WHERE tabela = :tabela AND registro_id = t.id), 0)")
+    tabelas = [tabela, 'emprestimos_arquivo'] if tabela == 'emprestimos' else [tabela]
+    return text(" UNION ALL ".join(f"SELECT t.id, 'I', {momento}, NULL FROM {nome} t" for nome in tabelas)
+                + " ORDER BY 1")
+
+
+def _ler_generos(conexao, ids):
+    return {genero_id: {'nome': nome}
+            for genero_id, nome in conexao.execute(select(Genero.id, Genero.nome).where(Genero.id.in_(ids)))}
+
+
+def _ler_autores(conexao, ids):
+    return {autor_id: {'nome': nome, 'biografia': biografia}
+            for autor_id, nome, biografia in conexao.execute(
+                select(Autor.id, Autor.nome, Autor.biografia).where(Autor.id.in_(ids)))}
+
+
+def _ler_livros(conexao, ids):
+    consulta = (select(Livro.id, Livro.titulo, Livro.isbn, Autor.nome, Genero.nome)
+                .outerjoin(Autor, Livro.autor_id == Autor.id)
+                .outerjoin(Genero, Livro.genero_id == Genero.id)
+                .where(Livro.id.in_(ids)))
+    return {livro_id: {'titulo': titulo, 'isbn': isbn, 'autor': autor, 'genero': genero}
+            for livro_id, titulo, isbn, autor, genero in conexao.execute(consulta)}
+
+
+def _ler_leitores(conexao, ids):
+    return {leitor_id: {'nome': nome, 'email': email}
+            for leitor_id, nome, email in conexao.execute(
+                select(Leitor.id, Leitor.nome, Leitor.email).where(Leitor.id.in_(ids)))}
+
+
+def _ler_emprestimos(conexao, ids):
+    # Ativos, devolvidos e os já arquivados nesta filial
+    linhas = {}
+    for modelo in (Emprestimo, EmprestimoArquivado):
+        consulta = (select(modelo.id, Livro.isbn, Leitor.email, modelo.data_emprestimo, modelo.data_prevista,
+                           modelo.data_devolucao, modelo.devolvido)
+                    .join(Livro, Livro.id == modelo.livro_id)
+                    .join(Leitor, Leitor.id == modelo.leitor_id)
+                    .where(modelo.id.in_(ids)))
+        for emprestimo_id, isbn, email, saida, prevista, devolucao, devolvido in conexao.execute(consulta):
+            linhas[emprestimo_id] = {
+                'isbn': isbn, 'email': email, 'data_emprestimo': saida.isoformat(),
+                'data_prevista': prevista.isoformat(), 'data_devolucao': devolucao and devolucao.isoformat(),
+                'devolvido': devolvido,
+            }
+    return linhas
+
+
+LEITURAS = {
+    'generos': _ler_generos,
+    'autores': _ler_autores,
+    'livros': _ler_livros,
+    'leitores': _ler_leitores,
+    'emprestimos': _ler_emprestimos,
+}
+
+
+CONSULTA_CHAVES_RECEBIDAS = text(
+    "SELECT registro_id, chave FROM sinc_chaves WHERE tabela = 'emprestimos' AND registro_id IN :ids"
+).bindparams(bindparam('ids', expanding=True))
+
+
+def _chaves_emprestimos(conexao, filial, ids):
+    # Chave global: a recebida de outra filial (sinc_chaves) ou "<esta filial>:<id>". O id
+    # local é único também entre os arquivados (emprestimos tem AUTOINCREMENT)
+    recebidas = dict(conexao.execute(CONSULTA_CHAVES_RECEBIDAS, {'ids': ids}).all())
+    return {registro_id: recebidas.get(registro_id, f"{filial}:{registro_id}") for registro_id in ids}
+
+
+def _registros(conexao, tabela, alteracoes, filial):
+    # alteracoes: (registro_id, operacao, momento, chave_antiga) -> registros do pacote
+    ids = [alteracao[0] for alteracao in alteracoes]
+    linhas = LEITURAS[tabela](conexao, ids)
+    chaves = _chaves_emprestimos(conexao, filial, ids) if tabela == 'emprestimos' else {}
+    registros = []
+    for registro_id, operacao, momento, chave_antiga in alteracoes:
+        if operacao == 'D':
+            registros.append({'t': tabela, 'o': 'd', 'k': chaves.get(registro_id, chave_antiga), 'm': momento})
+        elif registro_id in linhas:
+            valores = linhas[registro_id]
+            chave = chaves.get(registro_id) or valores[CHAVES_NATURAIS[tabela]]
+            registro = {'t': tabela, 'o': 'u', 'k': chave, 'm': momento, 'v': valores}
+            if chave_antiga is not None and chave_antiga != chave:
+                registro['a'] = chave_antiga
+            registros.append(registro)
+    return registros
+
+
+def _lotes_exportacao(conexao, filial, destino, desde, ate, completo):
+    etapas = [(tabela, False) for tabela in ORDEM_TABELAS]
+    if not completo:
+        etapas += [(tabela, True) for tabela in reversed(ORDEM_TABELAS)]
+    for tabela, exclusoes in etapas:
+        if completo:
+            consulta, parametros = _consulta_completa(tabela), {'tabela': tabela}
+        else:
+            consulta = CONSULTA_ALTERACOES
+            parametros = {'tabela': tabela, 'desde': desde, 'ate': ate, 'destino': destino, 'exclusoes': exclusoes}
+        resultado = conexao.execution_options(stream_results=True).execute(consulta, parametros)
+        for parte in resultado.partitions(IDS_POR_CONSULTA):
+            yield _registros(conexao, tabela, parte, filial)
+
+
+def exportar(filial_destino, destino, completo=False, ao_progredir=None):
+    # ao_progredir(registros) a cada lote. Devolve (registros, bytes, segundos).
+    nucleo.iniciar()
+    temporario = destino + '.parcial'
+    inicio = time.perf_counter()
+    registros = 0
+
+    def gravar(arquivo, linhas):
+        arquivo.writelines(json.dumps(linha, ensure_ascii=False, separators=(',', ':')) + '\n' for linha in linhas)
+
+    # Uma transação de leitura: o limite "ate" e as linhas lidas são do mesmo instante
+    try:
+        with gzip.open(temporario, 'wt', encoding='utf-8', compresslevel=NIVEL_COMPRESSAO) as arquivo, \
+                nucleo.engine_leitura.connect() as conexao, conexao.begin():
+            filial = _filial(conexao)
+            if filial_destino == filial:
+                raise ErroPacote(f"O destino {filial_destino} é esta própria filial")
+            enviado, recebido = _marcas(conexao, filial_destino)
+            desde = 0 if completo else enviado
+            ate = conexao.execute(text("SELECT COALESCE(max(seq), 0) FROM sinc_log")).scalar()
+            gravar(arquivo, [{'formato': FORMATO_PACOTE, 'origem': filial, 'destino': filial_destino,
+                              'desde': desde, 'ate': ate, 'visto': recebido, 'completo': completo}])
+            for lote in _lotes_exportacao(conexao, filial, filial_destino, desde, ate, completo):
+                gravar(arquivo, lote)
+                registros += len(lote)
+                if ao_progredir:
+                    ao_progredir(registros)
+            gravar(arquivo, [{'fim': True, 'registros': registros}])
+    except BaseException:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+
+    os.replace(temporario, destino)
+    if registros:
+        with nucleo.unidade_de_trabalho() as sessao:
+            _gravar_marca(sessao, filial_destino, 'enviado', ate)
+            sessao.commit()
+    return registros, os.path.getsize(destino), time.perf_counter() - inicio
+
+
+# Aplicação
+#
+# As consultas da aplicação são montadas uma vez e lidas pela conexão da sessão. As
+# gravações nas tabelas da biblioteca também usam comandos prontos, mas passam pela
+# sessão, para que o cache de opções veja as tabelas alteradas; dml_strategy dispensa a
+# maquinaria de gravação em massa do ORM, feita para listas de registros.
+
+def _consulta_chave(tabela):
+    modelo = MODELOS[tabela]
+    coluna = getattr(modelo, CHAVES_NATURAIS[tabela])
+    # Nomes de autor não são únicos: vale o primeiro, sem diferença de maiúsculas
+    if tabela == 'autores':
+        coluna = collate(coluna, 'NOCASE')
+    return select(modelo.id).where(coluna == bindparam('chave')).order_by(modelo.id).limit(1)
+
+
+CONSULTAS_CHAVE = {tabela: _consulta_chave(tabela) for tabela in MODELOS}
+CONSULTA_ULTIMO_MOMENTO = text(
+    "SELECT max(momento) FROM sinc_log WHERE tabela = :tabela AND registro_id = :registro_id")
+CONSULTA_ALTERACAO_LOCAL = text(
+    "SELECT 1 FROM sinc_log WHERE tabela = :tabela AND registro_id = :registro_id AND seq > :visto "
+    "AND origem IS NOT :origem LIMIT 1")
+# Linha local cuja chave foi trocada aqui sem a filial de origem ter visto
+CONSULTAS_CHAVE_TROCADA = {
+    tabela: text(f"""SELECT registro_id FROM sinc_log
+        WHERE seq > :visto AND tabela = '{tabela}' AND operacao = 'U' AND chave_antiga = :chave
+          AND registro_id IN (SELECT id FROM {tabela})
+        ORDER BY seq DESC LIMIT 1""")
+    for tabela, chave in CHAVES_NATURAIS.items() if chave
+}
+CONSULTA_CHAVE_RECEBIDA = text("SELECT registro_id FROM sinc_chaves WHERE tabela = 'emprestimos' AND chave = :chave")
+GRAVAR_CHAVE_RECEBIDA = text("""INSERT INTO sinc_chaves (tabela, chave, registro_id) VALUES ('emprestimos', :chave, :id)
+    ON CONFLICT (tabela, chave) DO UPDATE SET registro_id = excluded.registro_id""")
+MARCAR_APLICACAO = text("UPDATE sinc_estado SET origem_aplicacao = :origem, momento_aplicacao = :momento WHERE id = 1")
+CONSULTA_EMPRESTIMO = select(Emprestimo.leitor_id).where(Emprestimo.id == bindparam('id'))
+_GRAVADOS = dict(MODELOS, emprestimos=Emprestimo)
+INSERCOES = {tabela: insert(modelo).returning(modelo.id).execution_options(dml_strategy='raw')
+             for tabela, modelo in _GRAVADOS.items()}
+# As colunas alteradas são as dos parâmetros
+ATUALIZACOES = {tabela: update(modelo).where(modelo.id == bindparam('registro_id'))
+                .execution_options(dml_strategy='core_only')
+                for tabela, modelo in _GRAVADOS.items()}
+CONSULTA_ARQUIVADO = select(EmprestimoArquivado.id).where(EmprestimoArquivado.id == bindparam('id'))
+CONSULTA_LIVRO_EMPRESTADO = (select(Emprestimo.id)
+                             .where(Emprestimo.livro_id == bindparam('livro_id'), Emprestimo.devolvido == False)
+                             .limit(1))
+
+
+def _localizar(contexto, tabela, chave):
+    if chave is None:
+        return None
+    return contexto['conexao'].execute(CONSULTAS_CHAVE[tabela], {'chave': chave}).scalar()
+
+
+def _localizar_linha(contexto, tabela, chave):
+    if chave is None:
+        return None
+    registro_id = _localizar(contexto, tabela, chave)
+    if registro_id is None:
+        registro_id = contexto['conexao'].execute(
+            CONSULTAS_CHAVE_TROCADA[tabela], {'chave': chave, 'visto': contexto['visto']}).scalar()
+    return registro_id
+
+
+def _inserir(contexto, tabela, valores):
+    return contexto['sessao'].scalars(INSERCOES[tabela], valores).one()
+
+
+def _atualizar(contexto, tabela, registro_id, valores):
+    contexto['sessao'].execute(ATUALIZACOES[tabela], dict(valores, registro_id=registro_id))
+
+
+def _rejeitar(contexto, registro, motivo):
+    resultado = contexto['resultado']
+    resultado['rejeitados'] += 1
+    if len(resultado['motivos']) < MOTIVOS_LISTADOS:
+        resultado['motivos'].append(f"{registro['t']} {registro['k']}: {motivo}")
+
+
+def _prevalece_local(contexto, tabela, registro_id, momento):
+    parametros = {'tabela': tabela, 'registro_id': registro_id}
+    if contexto['regra'] == 'remoto':
+        return False
+    if contexto['regra'] == 'local':
+        parametros.update(visto=contexto['visto'], origem=contexto['origem'])
+        return contexto['conexao'].execute(CONSULTA_ALTERACAO_LOCAL, parametros).first() is not None
+    ultimo = contexto['conexao'].execute(CONSULTA_ULTIMO_MOMENTO, parametros).scalar()
+    return ultimo is not None and ultimo > momento
+
+
+def _referencia(contexto, tabela, nome):
+    # Autor ou gênero citado por um livro e ainda ausente nesta filial é criado pelo nome
+    if nome is None:
+        return None
+    registro_id = _localizar(contexto, tabela, nome)
+    if registro_id is None:
+        registro_id = _inserir(contexto, tabela, {'nome': nome})
+        anotar_alteracoes(contexto['sessao'], tabela, [registro_id], INSERIDO)
+    return registro_id
+
+
+def _excluir_entidade(contexto, registro, local_id):
+    sessao, tabela = contexto['sessao'], registro['t']
+    if tabela in ('livros', 'leitores'):
+        coluna = Emprestimo.livro_id if tabela == 'livros' else Emprestimo.leitor_id
+        if sessao.scalar(select(Emprestimo.id).where(coluna == local_id, Emprestimo.devolvido == False).limit(1)):
+            return _rejeitar(contexto, registro, "exclusão recusada, há empréstimo ativo nesta filial")
+        # Como em nucleo.excluir_livros/excluir_leitores, o histórico vai para o arquivo
+        nucleo.arquivar_devolvidos(coluna, [local_id])
+    else:
+        # Como em nucleo.excluir_autores/excluir_generos, os livros ficam sem autor ou gênero
+        coluna_livro = Livro.autor_id if tabela == 'autores' else Livro.genero_id
+        livros = sessao.scalars(
+            update(Livro).where(coluna_livro == local_id).values({coluna_livro: None}).returning(Livro.id)
+            .execution_options(synchronize_session=False)).all()
+        anotar_alteracoes(sessao, 'livros', livros, ATUALIZADO)
+    modelo = MODELOS[tabela]
+    sessao.execute(delete(modelo).where(modelo.id == local_id).execution_options(synchronize_session=False))
+    anotar_alteracoes(sessao, tabela, [local_id], REMOVIDO)
+    contexto['resultado']['aplicados'] += 1
+
+
+def _aplicar_entidade(contexto, registro):
+    tabela = registro['t']
+    local_id = _localizar_linha(contexto, tabela, registro.get('a')) or _localizar_linha(contexto, tabela, registro['k'])
+    if local_id is not None and _prevalece_local(contexto, tabela, local_id, registro['m']):
+        contexto['resultado']['mantidos'] += 1
+        return
+    if registro['o'] == 'd':
+        if local_id is not None:
+            _excluir_entidade(contexto, registro, local_id)
+        return
+
+    # Chave nova (ISBN, email, nome do gênero) que já pertence a outra linha desta filial
+    if 'a' in registro and local_id is not None:
+        dono_da_chave = _localizar(contexto, tabela, registro['k'])
+        if dono_da_chave is not None and dono_da_chave != local_id:
+            return _rejeitar(contexto, registro, f"{ROTULOS_CHAVE[tabela]} já usado por outro registro nesta filial")
+
+    valores = dict(registro['v'])
+    if tabela == 'livros':
+        valores['autor_id'] = _referencia(contexto, 'autores', valores.pop('autor'))
+        valores['genero_id'] = _referencia(contexto, 'generos', valores.pop('genero'))
+    if local_id is None:
+        local_id = _inserir(contexto, tabela, valores)
+        operacao = INSERIDO
+    else:
+        _atualizar(contexto, tabela, local_id, valores)
+        operacao = ATUALIZADO
+    anotar_alteracoes(contexto['sessao'], tabela, [local_id], operacao)
+    contexto['resultado']['aplicados'] += 1
+
+
+def _localizar_emprestimo(contexto, chave):
+    # Devolve (id local, leitor_id) do empréstimo; leitor_id None se ele já foi
+    # arquivado; (None, None) se o empréstimo não existe aqui
+    conexao = contexto['conexao']
+    registro_id = conexao.execute(CONSULTA_CHAVE_RECEBIDA, {'chave': chave}).scalar()
+    if registro_id is None:
+        filial, _, numero = chave.rpartition(':')
+        if filial != contexto['filial'] or not numero.isdigit():
+            return None, None
+        registro_id = int(numero)
+    leitor_id = conexao.execute(CONSULTA_EMPRESTIMO, {'id': registro_id}).scalar()
+    if leitor_id is not None or conexao.execute(CONSULTA_ARQUIVADO, {'id': registro_id}).scalar() is not None:
+        return registro_id, leitor_id
+    return None, None
+
+
+def _aplicar_emprestimo(contexto, registro):
+    sessao = contexto['sessao']
+    local_id, leitor_anterior = _localizar_emprestimo(contexto, registro['k'])
+    # Empréstimo já devolvido e arquivado nesta filial: o histórico arquivado não muda
+    arquivado = local_id is not None and leitor_anterior is None
+    if arquivado or (local_id is not None and _prevalece_local(contexto, 'emprestimos', local_id, registro['m'])):
+        contexto['resultado']['mantidos'] += 1
+        return
+    if registro['o'] == 'd':
+        if local_id is not None:
+            sessao.execute(delete(Emprestimo).where(Emprestimo.id == local_id)
+                           .execution_options(synchronize_session=False))
+            anotar_alteracoes(sessao, 'emprestimos', [leitor_anterior], ATUALIZADO)
+            contexto['resultado']['aplicados'] += 1
+        return
+
+    valores = registro['v']
+    livro_id = _localizar(contexto, 'livros', valores['isbn'])
+    leitor_id = _localizar(contexto, 'leitores', valores['email'])
+    if livro_id is None or leitor_id is None:
+        return _rejeitar(contexto, registro, "livro ou leitor ausente nesta filial")
+    if not valores['devolvido']:
+        ativo = contexto['conexao'].execute(CONSULTA_LIVRO_EMPRESTADO, {'livro_id': livro_id}).scalar()
+        if ativo is not None and ativo != local_id:
+            return _rejeitar(contexto, registro, "livro já emprestado nesta filial")
+
+    campos = {
+        'livro_id': livro_id, 'leitor_id': leitor_id,
+        'data_emprestimo': date.fromisoformat(valores['data_emprestimo']),
+        'data_prevista': date.fromisoformat(valores['data_prevista']),
+        'data_devolucao': valores['data_devolucao'] and date.fromisoformat(valores['data_devolucao']),
+        'devolvido': valores['devolvido'],
+    }
+    if local_id is None:
+        local_id = _inserir(contexto, 'emprestimos', campos)
+        contexto['conexao'].execute(GRAVAR_CHAVE_RECEBIDA, {'chave': registro['k'], 'id': local_id})
+    else:
+        _atualizar(contexto, 'emprestimos', local_id, campos)
+    # Na grade de empréstimos a linha é o leitor (antes e depois de uma transferência)
+    anotar_alteracoes(sessao, 'emprestimos', {leitor_anterior, leitor_id} - {None}, ATUALIZADO)
+    contexto['resultado']['aplicados'] += 1
+
+
+def _aplicar_lote(contexto, registros, recebido=None):
+    # Um lote por transação. Os triggers de captura leem de sinc_estado a filial de origem
+    # e o momento original de cada alteração, limpos antes do commit.
+    sessao = contexto['sessao']
+    contexto['conexao'] = conexao = sessao.connection()
+    for registro in registros:
+        conexao.execute(MARCAR_APLICACAO, {'origem': contexto['origem'], 'momento': registro['m']})
+        if registro['t'] == 'emprestimos':
+            _aplicar_emprestimo(contexto, registro)
+        else:
+            _aplicar_entidade(contexto, registro)
+    conexao.execute(MARCAR_APLICACAO, {'origem': None, 'momento': None})
+    if recebido is not None:
+        _gravar_marca(sessao, contexto['origem'], 'recebido', recebido)
+    sessao.commit()
+
+
+def _validar_cabecalho(cabecalho, filial, recebido):
+    # Devolve False se o pacote já foi aplicado. Um pacote completo dispensa os anteriores
+    if cabecalho.get('formato') != FORMATO_PACOTE:
+        raise ErroPacote(f"Formato de pacote não suportado: {cabecalho.get('formato')}")
+    if cabecalho['destino'] != filial:
+        raise ErroPacote(f"O pacote é destinado à filial {cabecalho['destino']}, e esta é a {filial}")
+    if cabecalho['desde'] > recebido and not cabecalho['completo']:
+        raise ErroPacote(f"Faltam as alterações {recebido + 1} a {cabecalho['desde']} da filial {cabecalho['origem']}: "
+                         "aplique os pacotes anteriores ou peça uma exportação completa")
+    return cabecalho['ate'] > recebido
+
+
+def aplicar(origem_pacote, regra='recente', ao_progredir=None):
+    # ao_progredir(registros) a cada lote. Devolve {'aplicados', 'mantidos', 'rejeitados',
+    # 'motivos', 'segundos'}: mantidos são as linhas em que a versão local prevaleceu.
+    if regra not in REGRAS_CONFLITO:
+        raise ValueError(f"Regra de conflito desconhecida: {regra}")
+    nucleo.iniciar()
+    inicio = time.perf_counter()
+    resultado = {'aplicados': 0, 'mantidos': 0, 'rejeitados': 0, 'motivos': []}
+    with gzip.open(origem_pacote, 'rt', encoding='utf-8') as entrada, nucleo.unidade_de_trabalho() as sessao:
+        cabecalho = json.loads(entrada.readline())
+        filial = _filial(sessao)
+        recebido = _marcas(sessao, cabecalho['origem'])[1]
+        if _validar_cabecalho(cabecalho, filial, recebido):
+            contexto = {'sessao': sessao, 'filial': filial, 'origem': cabecalho['origem'], 'regra': regra,
+                        'visto': cabecalho['visto'], 'resultado': resultado}
+            lote, lidos = [], 0
+            for linha in entrada:
+                registro = json.loads(linha)
+                if registro.get('fim'):
+                    if registro['registros'] != lidos + len(lote):
+                        raise ErroPacote("Pacote inconsistente: o total não confere")
+                    _aplicar_lote(contexto, lote, recebido=cabecalho['ate'])
+                    break
+                lote.append(registro)
+                if len(lote) == REGISTROS_POR_TRANSACAO:
+                    _aplicar_lote(contexto, lote)
+                    lidos += len(lote)
+                    lote = []
+                    if ao_progredir:
+                        ao_progredir(lidos)
+            else:
+                # Os lotes já confirmados são refeitos sem efeito quando o pacote inteiro chegar
+                raise ErroPacote("Pacote incompleto: o arquivo terminou antes da linha final")
+    resultado['segundos'] = time.perf_counter() - inicio
+    return resultado
+
+
+# Situação e manutenção
+
+def situacao():
+    nucleo.iniciar()
+    with nucleo.SessaoLeitura() as leitura:
+        return {
+            'filial': _filial(leitura),
+            'log': leitura.execute(text("SELECT count(*), COALESCE(max(seq), 0) FROM sinc_log")).one(),
+            'marcas': leitura.execute(text("SELECT filial, enviado, recebido FROM sinc_marcas ORDER BY filial")).all(),
+        }
+
+
+def definir_filial(nome):
+    # A chave global dos empréstimos leva o nome da filial: ele não muda depois da
+    # primeira sincronização
+    nome = nome.strip()
+    if not nome:
+        raise ErroPacote("O nome da filial não pode ser vazio")
+    nucleo.iniciar()
+    with nucleo.unidade_de_trabalho() as sessao:
+        if sessao.execute(text("SELECT 1 FROM sinc_marcas LIMIT 1")).first():
+            raise ErroPacote("Esta filial já sincronizou com outras; o nome não pode mais mudar")
+        sessao.execute(text("UPDATE sinc_estado SET filial = :nome WHERE id = 1"), {'nome': nome})
+        sessao.commit()
+
+
+# Remove do log o que já foi enviado a todas as filiais parceiras. Sem o histórico, um
+# conflito com um pacote que ainda venha delas não é detectado e vale a versão recebida.
+def podar():
+    nucleo.iniciar()
+    with nucleo.unidade_de_trabalho() as sessao:
+        removidas = sessao.execute(text(
+            "DELETE FROM sinc_log WHERE seq <= (SELECT min(enviado) FROM sinc_marcas)")).rowcount
+        sessao.commit()
+        return removidas
+
+
+def _mostrar_progresso(texto):
+    print(f"\r{texto}", end='', flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sincronização de alterações entre filiais")
+    comandos = parser.add_subparsers(dest='comando', required=True)
+    filial = comandos.add_parser('filial', help="mostra o nome desta filial, o log e as marcas d'água")
+    filial.add_argument('--nome', help="define o nome desta filial (antes da primeira sincronização)")
+    exportacao = comandos.add_parser('exportar', help="grava as alterações ainda não enviadas a uma filial")
+    exportacao.add_argument('filial_destino')
+    exportacao.add_argument('pacote', help="arquivo .jsonl.gz")
+    exportacao.add_argument('--completo', action='store_true', help="todas as linhas, não só as alteradas")
+    aplicacao = comandos.add_parser('aplicar', help="aplica um pacote recebido de outra filial")
+    aplicacao.add_argument('pacote')
+    aplicacao.add_argument('--conflito', choices=REGRAS_CONFLITO, default='recente')
+    comandos.add_parser('podar', help="remove do log o que todas as filiais parceiras já receberam")
+    args = parser.parse_args()
+
+    try:
+        if args.comando == 'filial':
+            if args.nome:
+                definir_filial(args.nome)
+            estado = situacao()
+            linhas, ultimo = estado['log']
+            print(f"Filial: {estado['filial']}\nLog: {linhas} alterações (última seq {ultimo})")
+            for parceira, enviado, recebido in estado['marcas']:
+                print(f"  {parceira}: enviado até {enviado}, recebido até {recebido}")
+        elif args.comando == 'exportar':
+            registros, tamanho, segundos = exportar(
+                args.filial_destino, args.pacote, args.completo,
+                lambda total: _mostrar_progresso(f"{total} registros"))
+            print(f"\nPacote gravado: {registros} registros, {tamanho / 1e3:.1f} kB em {segundos:.2f}s")
+        elif args.comando == 'aplicar':
+            resultado = aplicar(args.pacote, args.conflito, lambda total: _mostrar_progresso(f"{total} registros"))
+            print(f"\nAplicados: {resultado['aplicados']}, mantida a versão local: {resultado['mantidos']}, "
+                  f"recusados: {resultado['rejeitados']} ({resultado['segundos']:.2f}s)")
+            for motivo in resultado['motivos']:
+                print(f"  {motivo}")
+        else:
+            print(f"{podar()} alterações removidas do log")
+    except ErroPacote as erro:
+        raise SystemExit(str(erro))
+
+
+if __name__ == "__main__":
+    main()
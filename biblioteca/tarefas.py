@@ -0,0 +1,94 @@
+import contextlib
+import contextvars
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+# Executor de tarefas de banco de dados fora da thread principal do Tkinter.
+# As funções rodam em um pool de threads (cada thread com a sua própria sessão) e os
+# resultados voltam para o loop da interface por meio de polling com root.after.
+# Cada tarefa roda com uma cópia do contexto (contextvars) de quem a submeteu, o que
+# leva junto, por exemplo, o rótulo de ação da instrumentação, e dentro do gerenciador
+# de contexto devolvido por unidade_de_trabalho() (na aplicação, a unidade de trabalho
+# do núcleo, que fecha a sessão da thread ao final da tarefa).
+
+
+class ExecutorBD:
+    def __init__(self, raiz, unidade_de_trabalho=contextlib.nullcontext, trabalhadores=4, intervalo_ms=50):
+        self._raiz = raiz
+        self._unidade_de_trabalho = unidade_de_trabalho
+        self._intervalo_ms = intervalo_ms
+        self._pool = ThreadPoolExecutor(max_workers=trabalhadores, thread_name_prefix='bd')
+        self._concluidas = queue.Queue()
+        self._geracoes = {}
+        self._pendentes = {}
+        self._em_andamento = 0
+        self._indicadores = []
+        self._raiz.after(self._intervalo_ms, self._processar_concluidas)
+
+    def ao_mudar_ocupacao(self, callback):
+        # callback(ocupado) é chamado na thread principal quando o executor fica ocupado ou livre
+        self._indicadores.append(callback)
+
+    def submeter(self, funcao, *args, ao_concluir=None, ao_falhar=None, chave=None):
+        # Tarefas com a mesma chave se substituem: a anterior é cancelada se ainda não
+        # começou e, se já estiver rodando, o seu resultado é descartado
+        geracao = None
+        if chave is not None:
+            anterior = self._pendentes.get(chave)
+            if anterior is not None:
+                anterior.cancel()
+            geracao = self._geracoes[chave] = self._geracoes.get(chave, 0) + 1
+
+        futuro = self._pool.submit(contextvars.copy_context().run, self._executar, funcao, args)
+        if chave is not None:
+            self._pendentes[chave] = futuro
+
+        self._em_andamento += 1
+        if self._em_andamento == 1:
+            self._notificar_ocupacao(True)
+
+        futuro.add_done_callback(
+            lambda f: self._concluidas.put((f, chave, geracao, ao_concluir, ao_falhar))
+        )
+        return futuro
+
+    def encerrar(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _executar(self, funcao, args):
+        with self._unidade_de_trabalho():
+            return funcao(*args)
+
+    def _notificar_ocupacao(self, ocupado):
+        for callback in self._indicadores:
+            callback(ocupado)
+
+    def _processar_concluidas(self):
+        while True:
+            try:
+                futuro, chave, geracao, ao_concluir, ao_falhar = self._concluidas.get_nowait()
+            except queue.Empty:
+                break
+
+            self._em_andamento -= 1
+            if self._em_andamento == 0:
+                self._notificar_ocupacao(False)
+
+            if chave is not None:
+                if self._pendentes.get(chave) is futuro:
+                    del self._pendentes[chave]
+                if self._geracoes.get(chave) != geracao:
+                    continue
+            if futuro.cancelled():
+                continue
+
+            erro = futuro.exception()
+            if erro is None:
+                if ao_concluir is not None:
+                    ao_concluir(futuro.result())
+            elif ao_falhar is not None:
+                ao_falhar(erro)
+            else:
+                self._raiz.report_callback_exception(type(erro), erro, erro.__traceback__)
+
+        self._raiz.after(self._intervalo_ms, self._processar_concluidas)
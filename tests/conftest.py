@@ -0,0 +1,35 @@
+import pytest
+
+
+def _fechar(modulo):
+    modulo.session.remove()
+    modulo.engine.dispose()
+    modulo.engine_leitura.dispose()
+    modulo.configuracao = modulo.engine = modulo.engine_leitura = None
+    modulo.cache_opcoes.limpar()
+
+
+# Abre o núcleo sobre um banco novo em um diretório temporário. O núcleo guarda as engines
+# em variáveis do módulo (ver nucleo.iniciar); abrir outro banco fecha e zera as do
+# anterior, o que permite simular duas filiais no mesmo teste.
+@pytest.fixture
+def abrir_banco(tmp_path, monkeypatch):
+    from biblioteca import nucleo as modulo
+
+    monkeypatch.setenv('BIBLIOTECA_CONFIG', str(tmp_path / 'biblioteca.ini'))
+
+    def abrir(nome='biblioteca.db'):
+        if modulo.engine is not None:
+            _fechar(modulo)
+        monkeypatch.setenv('BIBLIOTECA_BANCO', str(tmp_path / nome))
+        modulo.iniciar()
+        return modulo
+
+    yield abrir
+    if modulo.engine is not None:
+        _fechar(modulo)
+
+
+@pytest.fixture
+def nucleo(abrir_banco):
+    return abrir_banco()
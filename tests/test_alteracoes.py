@@ -0,0 +1,32 @@
+from biblioteca.alteracoes import ATUALIZADO, INSERIDO, REMOVIDO, RegistroAlteracoes
+
+
+def test_desde_traz_a_ultima_operacao_de_cada_chave_das_tabelas_pedidas():
+    registro = RegistroAlteracoes()
+    registro.registrar([('livros', 1, INSERIDO), ('autores', 1, ATUALIZADO)])
+    seq = registro.seq_atual()
+    registro.registrar([('livros', 1, ATUALIZADO), ('livros', 2, INSERIDO), ('leitores', 1, INSERIDO)])
+    registro.registrar([('livros', 2, REMOVIDO)])
+
+    assert registro.desde(0, ('livros',)) == (6, {('livros', 1): ATUALIZADO, ('livros', 2): REMOVIDO})
+    assert registro.desde(seq, ('autores',)) == (6, {})
+    assert registro.desde(6, ('livros', 'autores', 'leitores')) == (6, {})
+
+
+def test_historico_descartado_alem_da_marca_pede_recarga():
+    registro = RegistroAlteracoes(capacidade=3)
+    registro.registrar([('livros', chave, INSERIDO) for chave in range(1, 6)])
+    # Restam as entradas 3 a 5: quem parou na 2 ainda está em dia, quem parou na 1 não
+    assert registro.desde(2, ('livros',)) == (5, {('livros', chave): INSERIDO for chave in (3, 4, 5)})
+    assert registro.desde(1, ('livros',)) == (5, None)
+
+
+def test_alteracoes_publicadas_so_no_commit(nucleo):
+    seq = nucleo.registro_alteracoes.seq_atual()
+    with nucleo.unidade_de_trabalho() as sessao:
+        sessao.add(nucleo.Genero(nome='Descartado'))
+        sessao.flush()
+        sessao.rollback()
+        sessao.add(nucleo.Genero(nome='Confirmado'))
+        sessao.commit()
+    assert nucleo.registro_alteracoes.desde(seq, ('generos',)) == (seq + 1, {('generos', 1): INSERIDO})
@@ -0,0 +1,75 @@
+import sqlite3
+
+from sqlalchemy import create_engine, func, select
+
+from test_indices import ESQUEMA_LEGADO
+
+COLUNAS = 'id, livro_id, leitor_id, data_emprestimo, data_prevista, data_devolucao, devolvido'
+
+
+def emprestar_e_devolver(nucleo, leitor_id, livro_id):
+    nucleo.emprestar_livros(leitor_id, [livro_id])
+    ids = [emprestimo[0] for emprestimo in nucleo.listar_emprestimos_ativos(leitor_id)]
+    nucleo.devolver_emprestimos(ids)
+    return ids
+
+
+def test_id_de_emprestimo_arquivado_nao_e_reaproveitado(nucleo):
+    nucleo.adicionar_genero('Romance')
+    nucleo.adicionar_autor('Autora', 'Biografia')
+    nucleo.adicionar_livro('Primeiro', '1', 1, 1)
+    nucleo.adicionar_livro('Segundo', '2', 1, 1)
+    nucleo.adicionar_leitor('Leitora', 'leitora@exemplo.com')
+
+    primeiro = emprestar_e_devolver(nucleo, 1, 1)
+    assert nucleo.arquivar_emprestimos() == 1
+    # O empréstimo arquivado era o de id mais alto: sem AUTOINCREMENT o próximo o repetiria
+    segundo = emprestar_e_devolver(nucleo, 1, 2)
+    assert segundo[0] > primeiro[0]
+    assert nucleo.arquivar_emprestimos() == 1
+
+    with nucleo.SessaoLeitura() as leitura:
+        assert leitura.scalar(select(func.count()).select_from(nucleo.EmprestimoArquivado)) == 2
+    # Os resumos contam os dois empréstimos, arquivados
+    assert sorted(nucleo.consultar_relatorio('livros')) == [('Primeiro', 1), ('Segundo', 1)]
+
+
+def test_migracao_renumera_emprestimo_com_id_de_arquivado(tmp_path, abrir_banco):
+    from biblioteca import migracoes
+
+    caminho = tmp_path / 'biblioteca.db'
+    with sqlite3.connect(caminho) as conexao:
+        conexao.executescript(ESQUEMA_LEGADO)
+    engine = create_engine(f'sqlite:///{caminho}')
+    with engine.begin() as conexao:
+        for numero in range(1, 7):
+            migracoes.MIGRACOES[numero](conexao)
+        conexao.exec_driver_sql("PRAGMA user_version = 6")
+        # Na versão 6 o empréstimo de maior id, arquivado, tinha o id repetido pelo seguinte
+        conexao.exec_driver_sql("UPDATE emprestimos SET devolvido = 1, data_devolucao = '2024-02-01' WHERE id = 2")
+        conexao.exec_driver_sql(
+            f"INSERT INTO emprestimos_arquivo ({COLUNAS}) SELECT {COLUNAS} FROM emprestimos WHERE id = 2")
+        conexao.exec_driver_sql("DELETE FROM emprestimos WHERE id = 2")
+        conexao.exec_driver_sql(
+            "INSERT INTO emprestimos (livro_id, leitor_id, data_emprestimo, data_prevista, devolvido) "
+            "VALUES (1, 1, '2024-03-01', '2024-03-15', 0)")
+        assert conexao.exec_driver_sql("SELECT id FROM emprestimos WHERE livro_id = 1").scalar() == 2
+    engine.dispose()
+
+    nucleo = abrir_banco()
+    with nucleo.engine.connect() as conexao:
+        ativos = dict(conexao.exec_driver_sql("SELECT livro_id, id FROM emprestimos").all())
+        arquivados = [linha[0] for linha in conexao.exec_driver_sql("SELECT id FROM emprestimos_arquivo")]
+        registrados = conexao.exec_driver_sql(
+            "SELECT registro_id FROM sinc_log WHERE tabela = 'emprestimos' AND operacao = 'I'").scalars().all()
+    assert arquivados == [2]
+    assert ativos == {1: 3, 2: 1}
+    # O empréstimo renumerado vai para as filiais com o id novo
+    assert 3 in registrados
+
+    nucleo.devolver_livros([1])
+    nucleo.arquivar_emprestimos()
+    nucleo.emprestar_livros(1, [1])
+    novo = nucleo.listar_emprestimos_ativos(1)[-1][0]
+    assert novo > max(arquivados + list(ativos.values()))
+    assert sorted(nucleo.consultar_relatorio('livros')) == [('Primeiro', 3), ('Segundo', 1)]
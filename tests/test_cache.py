@@ -0,0 +1,65 @@
+from biblioteca.cache import CacheLRU
+
+
+def carregador(valor, chamadas):
+    def carregar():
+        chamadas.append(valor)
+        return valor
+    return carregar
+
+
+def test_descarta_o_menos_usado_recentemente():
+    cache, chamadas = CacheLRU(capacidade=2), []
+    cache.obter((('autores',), 'a'), carregador('a', chamadas))
+    cache.obter((('autores',), 'b'), carregador('b', chamadas))
+    # Usar "a" de novo faz de "b" o menos recente, e é ele que sai quando "c" entra
+    cache.obter((('autores',), 'a'), carregador('a', chamadas))
+    cache.obter((('autores',), 'c'), carregador('c', chamadas))
+    cache.obter((('autores',), 'a'), carregador('a', chamadas))
+    cache.obter((('autores',), 'b'), carregador('b', chamadas))
+
+    assert chamadas == ['a', 'b', 'c', 'b']
+    assert cache.estatisticas() == {'acertos': 2, 'falhas': 4, 'itens': 2, 'capacidade': 2}
+
+
+def test_invalidar_remove_so_as_chaves_da_tabela():
+    cache, chamadas = CacheLRU(), []
+    cache.obter((('autores',), 'x'), carregador('autor', chamadas))
+    cache.obter((('livros', 'autores'), 'busca', 'x'), carregador('busca', chamadas))
+    cache.obter((('generos',), 'x'), carregador('genero', chamadas))
+    cache.invalidar('livros')
+    for chave, valor in (((('autores',), 'x'), 'autor'), ((('livros', 'autores'), 'busca', 'x'), 'busca'),
+                         ((('generos',), 'x'), 'genero')):
+        cache.obter(chave, carregador(valor, chamadas))
+    assert chamadas == ['autor', 'busca', 'genero', 'busca']
+
+
+def test_valor_invalidado_durante_a_carga_nao_fica_no_cache():
+    cache = CacheLRU()
+
+    def carregar_enquanto_outro_grava():
+        cache.invalidar('autores')
+        return 'velho'
+
+    assert cache.obter((('autores',),), carregar_enquanto_outro_grava) == 'velho'
+    assert cache.obter((('autores',),), lambda: 'novo') == 'novo'
+
+
+def test_commit_invalida_e_rollback_nao(nucleo):
+    nucleo.adicionar_autor('Ana', '')
+    assert nucleo.sugerir_autores('An') == [(1, 'Ana')]
+
+    with nucleo.unidade_de_trabalho() as sessao:
+        sessao.add(nucleo.Autor(nome='Antônio'))
+        sessao.flush()
+        sessao.rollback()
+    falhas = nucleo.cache_opcoes.estatisticas()['falhas']
+    assert nucleo.sugerir_autores('An') == [(1, 'Ana')]
+    assert nucleo.cache_opcoes.estatisticas()['falhas'] == falhas
+
+    nucleo.adicionar_autor('Antônio', '')
+    assert nucleo.sugerir_autores('An') == [(1, 'Ana'), (2, 'Antônio')]
+    assert nucleo.cache_opcoes.estatisticas()['falhas'] == falhas + 1
+    # Gravações em massa (sem flush do ORM) também invalidam depois do commit
+    nucleo.excluir_autores([1])
+    assert nucleo.sugerir_autores('An') == [(2, 'Antônio')]
@@ -0,0 +1,57 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event, insert
+
+
+@contextmanager
+def contar_comandos(nucleo):
+    # Comandos enviados ao SQLite pelas duas engines (escrita e pool de leitura)
+    comandos = []
+
+    def registrar(conexao, cursor, sql, parametros, contexto, em_lote):
+        comandos.append(sql)
+
+    engines = (nucleo.engine, nucleo.engine_leitura)
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', registrar)
+    try:
+        yield comandos
+    finally:
+        for engine in engines:
+            event.remove(engine, 'before_cursor_execute', registrar)
+
+
+def povoar(nucleo, quantidade, inicio):
+    # quantidade livros e leitores novos, cada leitor com dois empréstimos ativos
+    with nucleo.engine.begin() as conexao:
+        conexao.execute(insert(nucleo.Livro), [
+            {'id': inicio + i, 'titulo': f'Livro {inicio + i}', 'isbn': f'isbn-{inicio + i}',
+             'autor_id': 1, 'genero_id': 1}
+            for i in range(2 * quantidade)])
+        conexao.execute(insert(nucleo.Leitor), [
+            {'id': inicio + i, 'nome': f'Leitor {inicio + i}', 'email': f'leitor{inicio + i}@exemplo.com'}
+            for i in range(quantidade)])
+        conexao.execute(insert(nucleo.Emprestimo), [
+            {'livro_id': inicio + 2 * i + j, 'leitor_id': inicio + i} for i in range(quantidade) for j in range(2)])
+
+
+@pytest.mark.parametrize('listar', ['listar_livros_detalhado', 'listar_emprestimos_agrupados'])
+def test_comandos_por_atualizacao_nao_dependem_das_linhas(nucleo, listar):
+    nucleo.adicionar_autor('Autora', 'Biografia')
+    nucleo.adicionar_genero('Romance')
+    funcao = getattr(nucleo, listar)
+    povoar(nucleo, 5, 1)
+    funcao(None, 10000)  # abre as conexões do pool (PRAGMAs de cada conexão nova)
+
+    medidas = []
+    for quantidade, inicio in ((0, None), (500, 1000)):
+        if quantidade:
+            povoar(nucleo, quantidade, inicio)
+        with contar_comandos(nucleo) as comandos:
+            linhas = funcao(None, 10000)
+        medidas.append((len(linhas), len(comandos)))
+
+    (poucas, comandos_poucas), (muitas, comandos_muitas) = medidas
+    assert muitas > poucas
+    assert comandos_poucas == comandos_muitas == 1
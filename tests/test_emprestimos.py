@@ -0,0 +1,51 @@
+import pytest
+from sqlalchemy import select
+
+
+@pytest.fixture
+def acervo(nucleo):
+    nucleo.adicionar_genero('Romance')
+    nucleo.adicionar_autor('Autora', '')
+    for numero in range(1, 6):
+        nucleo.adicionar_livro(f'Livro {numero}', str(numero), 1, 1)
+    for numero in range(1, 4):
+        nucleo.adicionar_leitor(f'Leitor {numero}', f'leitor{numero}@exemplo.com')
+    return nucleo
+
+
+def emprestimos(nucleo):
+    # (id, livro_id, leitor_id, devolvido) de todos os empréstimos, em ordem de id
+    with nucleo.SessaoLeitura() as leitura:
+        modelo = nucleo.Emprestimo
+        return [tuple(linha) for linha in leitura.execute(
+            select(modelo.id, modelo.livro_id, modelo.leitor_id, modelo.devolvido).order_by(modelo.id))]
+
+
+def test_emprestimo_em_lote_ignora_emprestados_repetidos_e_inexistentes(acervo):
+    assert acervo.emprestar_livros(2, [1]) == [1]
+    emprestados = acervo.emprestar_livros(1, [1, 2, 2, 3, 99, 3])
+    # O RETURNING traz exatamente os livros inseridos, cada um uma vez
+    assert sorted(emprestados) == [2, 3]
+    assert [(livro_id, leitor_id) for _, livro_id, leitor_id, _ in emprestimos(acervo)] == [(1, 2), (2, 1), (3, 1)]
+    assert acervo.emprestar_livros(1, [2, 3]) == []
+    assert acervo.emprestar_livros(99, [4]) is None
+
+
+def test_livro_devolvido_pode_ser_emprestado_de_novo(acervo):
+    acervo.emprestar_livros(1, [1, 2])
+    assert acervo.devolver_livros([1, 1, 5]) == [1]
+    assert acervo.emprestar_livros(2, [1, 2]) == [1]
+    assert [linha[1:] for linha in emprestimos(acervo)] == [(1, 1, True), (2, 1, False), (1, 2, False)]
+
+
+def test_transferencia_move_so_os_ativos(acervo):
+    acervo.emprestar_livros(1, [1, 2, 3])
+    acervo.emprestar_livros(2, [4])
+    acervo.devolver_livros([2])
+    # 2 foi devolvido, 4 já é do leitor 3 depois da primeira transferência, 99 não existe
+    assert acervo.transferir_emprestimos([4], 3) == [4]
+    assert sorted(acervo.transferir_emprestimos([1, 2, 4, 99], 3)) == [1]
+    assert [linha[1:] for linha in emprestimos(acervo)] == \
+        [(1, 3, False), (2, 1, True), (3, 1, False), (4, 3, False)]
+    assert acervo.transferir_emprestimos([3], 99) is None
+    assert emprestimos(acervo)[2][2] == 1
@@ -0,0 +1,41 @@
+import pytest
+from sqlalchemy import func, select, text
+
+
+@pytest.fixture
+def acervo(nucleo):
+    # Livro 1 e leitor 1 só com empréstimo devolvido; livro 2 e leitor 2 com empréstimo ativo
+    nucleo.adicionar_genero('Romance')
+    nucleo.adicionar_autor('Autora', 'Biografia')
+    nucleo.adicionar_livro('Devolvido', '1', 1, 1)
+    nucleo.adicionar_livro('Emprestado', '2', 1, 1)
+    nucleo.adicionar_leitor('Antiga', 'antiga@exemplo.com')
+    nucleo.adicionar_leitor('Atual', 'atual@exemplo.com')
+    nucleo.emprestar_livros(1, [1])
+    nucleo.devolver_livros([1])
+    nucleo.emprestar_livros(2, [2])
+    # Com as chaves estrangeiras verificadas, uma exclusão que deixasse empréstimos
+    # órfãos falharia (a conexão de escrita é única: pool_size=1)
+    with nucleo.engine.connect() as conexao:
+        conexao.exec_driver_sql("PRAGMA foreign_keys = ON")
+    return nucleo
+
+
+def contar(nucleo, sql):
+    with nucleo.SessaoLeitura() as leitura:
+        return leitura.scalar(text(sql))
+
+
+@pytest.mark.parametrize('excluir, tabela', [('excluir_livros', 'livros'), ('excluir_leitores', 'leitores')])
+def test_exclusao_arquiva_o_historico_e_mantem_os_ativos(acervo, excluir, tabela):
+    assert getattr(acervo, excluir)([1, 2]) == [1]
+
+    assert contar(acervo, f"SELECT group_concat(id) FROM {tabela}") == '2'
+    # Nenhum empréstimo aponta para linha excluída; o devolvido foi para o arquivo
+    assert contar(acervo, "SELECT count(*) FROM emprestimos WHERE livro_id NOT IN (SELECT id FROM livros) "
+                          "OR leitor_id NOT IN (SELECT id FROM leitores)") == 0
+    assert contar(acervo, "SELECT count(*) FROM emprestimos_arquivo") == 1
+    with acervo.SessaoLeitura() as leitura:
+        assert leitura.scalar(select(func.count()).select_from(acervo.Emprestimo)) == 1
+    # Os resumos continuam contando o empréstimo arquivado
+    assert contar(acervo, "SELECT sum(emprestimos) FROM resumo_leitores") == 2
@@ -0,0 +1,143 @@
+import pytest
+
+from biblioteca.alteracoes import ATUALIZADO
+from biblioteca.grade import (ATUALIZAR, INSERIR, REMOVER, EstadoGrade, buscar_alteracoes, valores_emprestimo,
+                              valores_livro)
+
+TAMANHO_PAGINA = 2
+
+
+# Grade sem interface, carregada e atualizada como em app.criar_lista_paginada
+class Grade:
+    def __init__(self, nucleo, buscar_pagina, tabelas, dependencias):
+        self.nucleo, self.buscar_pagina = nucleo, buscar_pagina
+        self.tabelas, self.dependencias = tabelas, dependencias
+        self.recargas = 0
+        self.estado = EstadoGrade(nucleo.registro_alteracoes.seq_atual())
+        self.carregar_pagina()
+
+    def carregar_pagina(self):
+        pagina = [tuple(linha) for linha in self.buscar_pagina(self.estado.ultimo_id, TAMANHO_PAGINA)]
+        return self.estado.receber_pagina(pagina, TAMANHO_PAGINA)
+
+    def buscar_linhas(self, ids):
+        return [tuple(linha) for linha in self.buscar_pagina(None, len(ids), ids=ids)]
+
+    def atualizar(self):
+        nova_seq, linhas, removidos = buscar_alteracoes(
+            self.nucleo.registro_alteracoes, self.estado.seq, self.tabelas, self.dependencias,
+            self.buscar_linhas, self.estado.ultimo_id)
+        if linhas is None:
+            self.recargas += 1
+            self.estado.reiniciar(self.nucleo.registro_alteracoes.seq_atual())
+            return self.carregar_pagina()
+        self.estado.seq = nova_seq
+        return self.estado.aplicar_alteracoes(linhas, removidos)
+
+
+@pytest.fixture
+def acervo(nucleo):
+    for nome in ('Romance', 'Poesia'):
+        nucleo.adicionar_genero(nome)
+    for nome in ('Primeira', 'Segunda'):
+        nucleo.adicionar_autor(nome, '')
+    # Livros 1 e 3 da autora 1; só os dois primeiros entram na primeira página
+    for numero, autor_id in ((1, 1), (2, 2), (3, 1)):
+        nucleo.adicionar_livro(f'Livro {numero}', str(numero), autor_id, 1)
+    for numero in (1, 2):
+        nucleo.adicionar_leitor(f'Leitor {numero}', f'leitor{numero}@exemplo.com')
+    return nucleo
+
+
+def grade_livros(nucleo):
+    return Grade(nucleo, nucleo.listar_livros_detalhado, ('livros',),
+                 {'autores': nucleo.livros_dos_autores, 'generos': nucleo.livros_dos_generos})
+
+
+def grade_emprestimos(nucleo):
+    return Grade(nucleo, nucleo.listar_emprestimos_agrupados, ('leitores', 'emprestimos'),
+                 {'livros': nucleo.leitores_dos_livros})
+
+
+def test_autor_ou_genero_novo_nao_mexe_na_grade_de_livros(acervo):
+    grade = grade_livros(acervo)
+    acervo.adicionar_autor('Terceira', '')
+    acervo.adicionar_genero('Conto')
+    assert grade.atualizar() == []
+    assert grade.recargas == 0
+
+
+def test_autor_renomeado_atualiza_so_as_linhas_carregadas_dele(acervo):
+    grade = grade_livros(acervo)
+    acervo.editar_autor(1, 'Renomeada', '')
+    acervo.editar_genero(2, 'Sem livros')
+    # O livro 3, também da autora, ainda não foi carregado e virá com a próxima página
+    assert grade.atualizar() == [(ATUALIZAR, 1, (1, 'Livro 1', '1', 'Renomeada', 'Romance'))]
+    assert grade.recargas == 0
+    grade.carregar_pagina()
+    assert grade.estado.valores[3][3] == 'Renomeada'
+
+
+def test_livro_renomeado_atualiza_quem_o_tem_emprestado(acervo):
+    acervo.emprestar_livros(2, [3])
+    grade = grade_emprestimos(acervo)
+    acervo.adicionar_livro('Livro 4', '4', 1, 1)
+    acervo.editar_livro(3, 'Livro renomeado', '3', 1, 1)
+    acervo.editar_livro(1, 'Livro parado', '1', 1, 1)
+    assert grade.atualizar() == [(ATUALIZAR, 2, (2, 'Leitor 2', 'Livro renomeado'))]
+    assert grade.recargas == 0
+
+
+def test_insercao_atualizacao_e_remocao_na_grade_aberta(acervo):
+    # Com a grade toda carregada, um livro novo entra no fim
+    grade = grade_livros(acervo)
+    grade.carregar_pagina()
+    assert (grade.estado.ids, grade.estado.esgotada) == ([1, 2, 3], True)
+
+    acervo.adicionar_livro('Livro 4', '4', 2, 2)
+    acervo.editar_livro(2, 'Livro dois', '2', 2, 1)
+    assert acervo.excluir_livros([1]) == [1]
+    assert sorted(grade.atualizar(), key=str) == sorted([
+        (INSERIR, 2, 4, (4, 'Livro 4', '4', 'Segunda', 'Poesia')),
+        (ATUALIZAR, 2, (2, 'Livro dois', '2', 'Segunda', 'Romance')),
+        (REMOVER, 1),
+    ], key=str)
+    assert grade.estado.ids == [2, 3, 4]
+    assert grade.recargas == 0
+
+
+def test_insercao_alem_da_pagina_carregada_espera_a_proxima_pagina(acervo):
+    grade = grade_livros(acervo)
+    acervo.adicionar_livro('Livro 4', '4', 2, 2)
+    assert grade.atualizar() == []
+    assert grade.estado.ids == [1, 2]
+    grade.carregar_pagina()
+    assert grade.estado.ids == [1, 2, 3, 4]
+
+
+def test_emprestimo_atualiza_a_linha_do_leitor(acervo):
+    grade = grade_emprestimos(acervo)
+    acervo.emprestar_livros(1, [1, 3])
+    assert grade.atualizar() == [(ATUALIZAR, 1, (1, 'Leitor 1', 'Livro 1, Livro 3'))]
+    acervo.transferir_emprestimos(acervo.listar_emprestimos_ativos(1)[0][:1], 2)
+    assert sorted(grade.atualizar()) == [(ATUALIZAR, 1, (1, 'Leitor 1', 'Livro 3')),
+                                         (ATUALIZAR, 2, (2, 'Leitor 2', 'Livro 1'))]
+
+
+def test_registro_descartado_alem_da_grade_recarrega(acervo):
+    grade = grade_livros(acervo)
+    acervo.editar_livro(1, 'Livro um', '1', 1, 1)
+    # Outras telas gravaram mais do que o registro guarda: a edição do livro 1 se perdeu
+    capacidade = acervo.registro_alteracoes._entradas.maxlen
+    acervo.registro_alteracoes.registrar([('leitores', 1, ATUALIZADO)] * capacidade)
+    assert grade.atualizar() == [(INSERIR, 0, 1, (1, 'Livro um', '1', 'Primeira', 'Romance')),
+                                 (INSERIR, 1, 2, (2, 'Livro 2', '2', 'Segunda', 'Romance'))]
+    assert grade.recargas == 1
+    assert grade.atualizar() == []
+
+
+def test_valores_das_linhas():
+    assert valores_livro((1, 'Sagarana', '978-5', None, 'Conto')) == (1, 'Sagarana', '978-5', 'Desconhecido', 'Conto')
+    # Leitor sem empréstimos ativos fica com a coluna vazia, como no aplicativo
+    assert valores_emprestimo((3, 'Ana', None)) == (3, 'Ana', '')
+    assert valores_emprestimo((3, 'Ana', 'Sagarana, Vidas Secas')) == (3, 'Ana', 'Sagarana, Vidas Secas')
@@ -0,0 +1,55 @@
+from pathlib import Path
+
+import pytest
+from sqlalchemy import select
+
+from biblioteca import importador
+
+DADOS = Path(__file__).parent / 'dados'
+
+
+@pytest.fixture
+def acervo(nucleo):
+    nucleo.adicionar_genero('Romance')
+    nucleo.adicionar_autor('Autora', '')
+    nucleo.adicionar_livro('Existente', '978-0', 1, 1)
+    nucleo.adicionar_leitor('Leitora', 'leitora@exemplo.com')
+    return nucleo
+
+
+def contagens(relatorio):
+    return {chave: relatorio[chave] for chave in ('lidos', 'inseridos', 'invalidos', 'duplicados')}
+
+
+# Lotes de 2 registros: há duplicados dentro do mesmo lote, entre lotes e com o banco
+@pytest.mark.parametrize('tamanho_lote', [2, 5000])
+def test_importa_livros_descartando_invalidos_e_duplicados(acervo, tamanho_lote):
+    relatorio = importador.importar('livros', str(DADOS / 'livros.csv'), tamanho_lote)
+    assert contagens(relatorio) == {'lidos': 9, 'inseridos': 4, 'invalidos': 2, 'duplicados': 3}
+
+    with acervo.SessaoLeitura() as leitura:
+        livros = leitura.execute(
+            select(acervo.Livro.isbn, acervo.Livro.titulo, acervo.Autor.nome, acervo.Genero.nome)
+            .join(acervo.Autor, acervo.Autor.id == acervo.Livro.autor_id)
+            .join(acervo.Genero, acervo.Genero.id == acervo.Livro.genero_id)
+            .order_by(acervo.Livro.isbn)).all()
+    # Vale a primeira ocorrência de cada ISBN; autores e gêneros novos são criados uma vez
+    assert [tuple(livro) for livro in livros] == [
+        ('978-0', 'Existente', 'Autora', 'Romance'),
+        ('978-1', 'Dom Casmurro', 'Machado de Assis', 'Romance'),
+        ('978-2', 'Memórias Póstumas', 'Machado de Assis', 'Romance'),
+        ('978-3', 'Vidas Secas', 'Graciliano Ramos', 'Romance'),
+        ('978-5', 'Sagarana', 'Guimarães Rosa', 'Conto'),
+    ]
+    with acervo.SessaoLeitura() as leitura:
+        assert leitura.query(acervo.Autor).count() == 4
+        assert leitura.query(acervo.Genero).count() == 2
+
+
+def test_importa_leitores_de_jsonl(acervo):
+    relatorio = importador.importar('leitores', str(DADOS / 'leitores.jsonl'), 2)
+    # A linha em branco não conta como registro
+    assert contagens(relatorio) == {'lidos': 6, 'inseridos': 2, 'invalidos': 2, 'duplicados': 2}
+    with acervo.SessaoLeitura() as leitura:
+        assert sorted(leitura.scalars(select(acervo.Leitor.email))) == \
+            ['ana@exemplo.com', 'bruno@exemplo.com', 'leitora@exemplo.com']
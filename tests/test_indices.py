@@ -0,0 +1,61 @@
+import sqlite3
+
+import pytest
+
+# Esquema da primeira versão (main.py): empréstimos em livro_leitor, sem chave primária
+# nem índices nas chaves estrangeiras
+ESQUEMA_LEGADO = """
+CREATE TABLE autores (id INTEGER NOT NULL PRIMARY KEY, nome VARCHAR NOT NULL, biografia VARCHAR);
+CREATE TABLE generos (id INTEGER NOT NULL PRIMARY KEY, nome VARCHAR NOT NULL UNIQUE);
+CREATE TABLE leitores (id INTEGER NOT NULL PRIMARY KEY, nome VARCHAR NOT NULL, email VARCHAR NOT NULL UNIQUE);
+CREATE TABLE livros (
+    id INTEGER NOT NULL PRIMARY KEY, titulo VARCHAR NOT NULL, isbn VARCHAR NOT NULL UNIQUE,
+    autor_id INTEGER REFERENCES autores (id), genero_id INTEGER REFERENCES generos (id));
+CREATE TABLE livro_leitor (
+    livro_id INTEGER REFERENCES livros (id), leitor_id INTEGER REFERENCES leitores (id), data_emprestimo DATE);
+INSERT INTO autores VALUES (1, 'Autora', 'Biografia');
+INSERT INTO generos VALUES (1, 'Romance');
+INSERT INTO leitores VALUES (1, 'Leitora', 'leitora@exemplo.com');
+INSERT INTO livros VALUES (1, 'Primeiro', '1', 1, 1), (2, 'Segundo', '2', 1, 1);
+INSERT INTO livro_leitor VALUES (1, 1, '2024-01-02'), (1, 1, '2024-01-01'), (2, 1, NULL);
+"""
+
+# Consultas frequentes, como o núcleo as faz, e o índice que cada uma deve usar
+CONSULTAS = {
+    'livros do leitor': (
+        "SELECT l.titulo FROM emprestimos e JOIN livros l ON l.id = e.livro_id "
+        "WHERE e.leitor_id = 1 AND e.devolvido = 0", 'ix_emprestimos_leitor_id_devolvido'),
+    'leitores do livro': (
+        "SELECT r.nome FROM emprestimos e JOIN leitores r ON r.id = e.leitor_id WHERE e.livro_id = 1",
+        'ix_emprestimos_livro_id'),
+    'livros do autor': ("SELECT id, titulo FROM livros WHERE autor_id = 1", 'ix_livros_autor_id'),
+    'livros do gênero': ("SELECT id, titulo FROM livros WHERE genero_id = 1", 'ix_livros_genero_id'),
+}
+
+
+@pytest.fixture(params=['novo', 'legado'])
+def banco(request, tmp_path, abrir_banco):
+    if request.param == 'legado':
+        with sqlite3.connect(tmp_path / 'biblioteca.db') as conexao:
+            conexao.executescript(ESQUEMA_LEGADO)
+    return abrir_banco()
+
+
+def test_banco_legado_migrado_mantem_os_emprestimos(tmp_path, abrir_banco):
+    with sqlite3.connect(tmp_path / 'biblioteca.db') as conexao:
+        conexao.executescript(ESQUEMA_LEGADO)
+    nucleo = abrir_banco()
+    # Os dois empréstimos do livro 1 foram fundidos, mantendo a data mais antiga
+    ativos = sorted((livro_id, titulo, saida.isoformat())
+                    for _, livro_id, titulo, saida, _ in nucleo.listar_emprestimos_ativos(1))
+    assert ativos[0] == (1, 'Primeiro', '2024-01-01')
+    assert [livro_id for livro_id, _, _ in ativos] == [1, 2]
+
+
+@pytest.mark.parametrize('nome', CONSULTAS)
+def test_consulta_frequente_usa_indice(banco, nome):
+    sql, indice = CONSULTAS[nome]
+    with banco.engine.connect() as conexao:
+        plano = [linha[-1] for linha in conexao.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+    assert any(f"USING INDEX {indice}" in passo or f"USING COVERING INDEX {indice}" in passo for passo in plano), plano
+    assert not any(passo.startswith('SCAN') for passo in plano), plano
@@ -0,0 +1,13 @@
+def test_listagens_usaveis_apos_fechar_a_sessao(nucleo):
+    nucleo.adicionar_genero('Romance')
+    nucleo.adicionar_autor('Autora', 'Biografia')
+    nucleo.adicionar_livro('Com autor', '1', 1, 1)
+    nucleo.adicionar_livro('Sem autor', '2', None, None)
+    nucleo.adicionar_leitor('Leitora', 'leitora@exemplo.com')
+    nucleo.emprestar_livros(1, [1])
+
+    livros = nucleo.listar_livros()
+    assert [(livro.autor and livro.autor.nome, livro.genero and livro.genero.nome) for livro in livros] == \
+        [('Autora', 'Romance'), (None, None)]
+    leitores = nucleo.listar_emprestimos()
+    assert [livro.titulo for livro in leitores[0].livros] == ['Com autor']
@@ -0,0 +1,102 @@
+import asyncio
+import json
+
+import pytest
+
+
+@pytest.fixture
+def servidor(nucleo):
+    from biblioteca import servidor
+
+    nucleo.adicionar_genero('Romance')
+    nucleo.adicionar_autor('Autora', 'Biografia')
+    nucleo.adicionar_livro('Livro', '1', 1, 1)
+    nucleo.adicionar_leitor('Leitora', 'leitora@exemplo.com')
+    return servidor
+
+
+def postar(servidor, *pedidos):
+    # Os pedidos entram juntos na fila e são gravados no mesmo lote pelo escritor
+    async def enviar():
+        atendente = servidor.Servidor()
+        async with await atendente.iniciar('127.0.0.1', 0):
+            respostas = await asyncio.gather(
+                *(atendente.despachar('POST', recurso, json.dumps(dados).encode()) for recurso, dados in pedidos),
+                return_exceptions=True)
+        return [resposta.status if isinstance(resposta, servidor.ErroRequisicao) else
+                500 if isinstance(resposta, Exception) else resposta[0] for resposta in respostas]
+
+    return asyncio.run(enviar())
+
+
+@pytest.mark.parametrize('dados', [
+    {'livro_id': [1], 'leitor_id': 1},
+    {'livro_id': 1, 'leitor_id': {'id': 1}},
+    {'livro_id': 'um', 'leitor_id': 1},
+    {'livro_id': True, 'leitor_id': 1},
+    {'livro_id': 2 ** 70, 'leitor_id': 1},
+])
+def test_id_invalido_recusado_sem_derrubar_o_lote(servidor, nucleo, dados):
+    assert postar(servidor, ('/autores', {'nome': 'Antes'}), ('/emprestimos', dados),
+                  ('/autores', {'nome': 'Depois'})) == [201, 400, 201]
+    with nucleo.SessaoLeitura() as leitura:
+        assert sorted(autor.nome for autor in leitura.query(nucleo.Autor)) == ['Antes', 'Autora', 'Depois']
+
+
+def test_id_em_texto_convertido(servidor, nucleo):
+    assert postar(servidor, ('/emprestimos', {'livro_id': '1', 'leitor_id': '1'})) == [201]
+    assert [linha[2] for linha in nucleo.listar_emprestimos_ativos(1)] == ['Livro']
+
+
+def test_texto_invalido_recusado(servidor):
+    assert postar(servidor, ('/leitores', {'nome': ['Nome'], 'email': 'a@exemplo.com'}),
+                  ('/autores', {'nome': 'Autor', 'biografia': 3}),
+                  ('/generos', {'nome': 'Poesia'})) == [400, 400, 201]
+
+
+def test_livro_com_autor_ou_genero_inexistente(servidor, nucleo):
+    assert postar(servidor, ('/livros', {'titulo': 'A', 'isbn': 'a', 'autor_id': 99, 'genero_id': 1}),
+                  ('/livros', {'titulo': 'B', 'isbn': 'b', 'autor_id': 1, 'genero_id': 99}),
+                  ('/livros', {'titulo': 'C', 'isbn': 'c', 'autor_id': 1, 'genero_id': 1})) == [422, 422, 201]
+    with nucleo.SessaoLeitura() as leitura:
+        assert sorted(livro.titulo for livro in leitura.query(nucleo.Livro)) == ['C', 'Livro']
+
+
+def test_erro_inesperado_fica_no_proprio_pedido(servidor, nucleo, monkeypatch):
+    # Um erro que não é de validação nem de unicidade derruba o lote; o escritor refaz
+    # os pedidos um a um e só o culpado recebe o erro
+    novo_registro = servidor._novo_registro
+
+    def falhar_no_genero(recurso, dados):
+        if dados.get('nome') == 'Falha':
+            raise RuntimeError('falha inesperada')
+        return novo_registro(recurso, dados)
+
+    monkeypatch.setattr(servidor, '_novo_registro', falhar_no_genero)
+    assert postar(servidor, ('/generos', {'nome': 'Poesia'}), ('/generos', {'nome': 'Falha'}),
+                  ('/leitores', {'nome': 'Novo', 'email': 'novo@exemplo.com'})) == [201, 500, 201]
+    with nucleo.SessaoLeitura() as leitura:
+        assert sorted(genero.nome for genero in leitura.query(nucleo.Genero)) == ['Poesia', 'Romance']
+
+
+def requisitar(servidor, metodo, alvo):
+    async def enviar():
+        async with await servidor.Servidor().iniciar('127.0.0.1', 0) as servico:
+            leitor, escritor = await asyncio.open_connection(*servico.sockets[0].getsockname()[:2])
+            escritor.write(f"{metodo} {alvo} HTTP/1.1\r\nConnection: close\r\n\r\n".encode())
+            resposta = await leitor.read()
+            escritor.close()
+        cabecalho, _, corpo = resposta.partition(b'\r\n\r\n')
+        return int(cabecalho.split()[1]), json.loads(corpo)
+
+    return asyncio.run(enviar())
+
+
+def test_erro_interno_nao_expoe_detalhes(servidor, nucleo, monkeypatch, caplog):
+    def falhar(*args):
+        raise RuntimeError("SELECT segredo FROM livros WHERE id = ?")
+
+    monkeypatch.setattr(nucleo, 'buscar_livros', falhar)
+    status, resposta = requisitar(servidor, 'GET', '/livros/busca?q=amor')
+    assert (status, resposta) == (500, {'erro': "Erro interno do servidor"})
+    assert 'segredo' in caplog.text
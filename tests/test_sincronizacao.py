@@ -0,0 +1,154 @@
+import time
+
+import pytest
+from sqlalchemy import select
+
+from biblioteca import sincronizacao
+
+
+def povoar(nucleo):
+    nucleo.adicionar_genero('Romance')
+    nucleo.adicionar_autor('Autora', 'Biografia')
+    nucleo.adicionar_livro('Primeiro', '1', 1, 1)
+    nucleo.adicionar_livro('Segundo', '2', 1, 1)
+    nucleo.adicionar_leitor('Leitora', 'leitora@exemplo.com')
+
+
+def enviar(abrir_banco, origem, destino, pacote, completo=False):
+    abrir_banco(f'{origem}.db')
+    sincronizacao.exportar(destino, pacote, completo=completo)
+    abrir_banco(f'{destino}.db')
+    return sincronizacao.aplicar(pacote)
+
+
+# Norte, com o acervo de povoar, e sul, vazia; abrir_banco abre uma de cada vez
+@pytest.fixture
+def filiais(abrir_banco):
+    for filial in ('sul', 'norte'):
+        abrir_banco(f'{filial}.db')
+        sincronizacao.definir_filial(filial)
+    nucleo = abrir_banco('norte.db')
+    povoar(nucleo)
+    return abrir_banco
+
+
+def titulo(nucleo, isbn):
+    with nucleo.SessaoLeitura() as leitura:
+        return leitura.scalar(select(nucleo.Livro.titulo).where(nucleo.Livro.isbn == isbn))
+
+
+def editar_titulo(nucleo, isbn, novo):
+    with nucleo.SessaoLeitura() as leitura:
+        livro = leitura.scalars(select(nucleo.Livro).where(nucleo.Livro.isbn == isbn)).one()
+    nucleo.editar_livro(livro.id, novo, livro.isbn, livro.autor_id, livro.genero_id)
+
+
+def emprestimos_ativos(nucleo):
+    with nucleo.SessaoLeitura() as leitura:
+        return leitura.execute(
+            select(nucleo.Livro.isbn, nucleo.Leitor.email)
+            .join(nucleo.Emprestimo, nucleo.Emprestimo.livro_id == nucleo.Livro.id)
+            .join(nucleo.Leitor, nucleo.Leitor.id == nucleo.Emprestimo.leitor_id)
+            .where(nucleo.Emprestimo.devolvido == False)).all()
+
+
+def test_emprestimo_depois_do_arquivamento_chega_a_outra_filial(filiais, tmp_path):
+    abrir_banco = filiais
+    nucleo = abrir_banco('norte.db')
+    nucleo.emprestar_livros(1, [1])
+    nucleo.devolver_emprestimos([emprestimo[0] for emprestimo in nucleo.listar_emprestimos_ativos(1)])
+    enviar(abrir_banco, 'norte', 'sul', str(tmp_path / 'completo.jsonl.gz'), completo=True)
+
+    # As duas filiais arquivam o empréstimo devolvido, o último de norte
+    assert nucleo.arquivar_emprestimos() == 1
+    nucleo = abrir_banco('norte.db')
+    assert nucleo.arquivar_emprestimos() == 1
+
+    # O empréstimo novo não pode ganhar a chave global do arquivado
+    nucleo.emprestar_livros(1, [2])
+    resultado = enviar(abrir_banco, 'norte', 'sul', str(tmp_path / 'alteracoes.jsonl.gz'))
+    assert (resultado['aplicados'], resultado['mantidos'], resultado['rejeitados']) == (1, 0, 0)
+    assert emprestimos_ativos(nucleo) == [('2', 'leitora@exemplo.com')]
+
+
+def test_exclusao_recebida_arquiva_o_historico(filiais, tmp_path):
+    abrir_banco = filiais
+    nucleo = abrir_banco('norte.db')
+    nucleo.emprestar_livros(1, [1])
+    nucleo.devolver_livros([1])
+    enviar(abrir_banco, 'norte', 'sul', str(tmp_path / 'completo.jsonl.gz'), completo=True)
+
+    nucleo = abrir_banco('norte.db')
+    assert nucleo.excluir_livros([1]) == [1]
+    resultado = enviar(abrir_banco, 'norte', 'sul', str(tmp_path / 'alteracoes.jsonl.gz'))
+    assert (resultado['aplicados'], resultado['rejeitados']) == (1, 0)
+    with nucleo.SessaoLeitura() as leitura:
+        assert leitura.scalars(select(nucleo.Livro.isbn)).all() == ['2']
+        assert leitura.scalars(select(nucleo.Emprestimo.id)).all() == []
+        assert len(leitura.scalars(select(nucleo.EmprestimoArquivado.id)).all()) == 1
+
+
+# Norte e sul editam o título do mesmo livro; "primeiro" é a filial que editou antes
+@pytest.mark.parametrize('regra, primeiro, esperado, mantidos', [
+    ('recente', 'norte', 'Sul', 1),
+    ('recente', 'sul', 'Norte', 0),
+    ('local', 'norte', 'Sul', 1),
+    ('local', 'sul', 'Sul', 1),
+    ('remoto', 'norte', 'Norte', 0),
+])
+def test_regra_de_conflito(filiais, tmp_path, regra, primeiro, esperado, mantidos):
+    abrir_banco = filiais
+    enviar(abrir_banco, 'norte', 'sul', str(tmp_path / 'completo.jsonl.gz'), completo=True)
+    segundo = 'sul' if primeiro == 'norte' else 'norte'
+    for filial in (primeiro, segundo):
+        editar_titulo(abrir_banco(f'{filial}.db'), '1', filial.capitalize())
+        # O momento da alteração tem resolução de milissegundos
+        time.sleep(0.01)
+
+    abrir_banco('norte.db')
+    sincronizacao.exportar('sul', str(tmp_path / 'alteracoes.jsonl.gz'))
+    nucleo = abrir_banco('sul.db')
+    resultado = sincronizacao.aplicar(str(tmp_path / 'alteracoes.jsonl.gz'), regra)
+    assert (resultado['aplicados'], resultado['mantidos']) == (1 - mantidos, mantidos)
+    assert titulo(nucleo, '1') == esperado
+
+
+def test_troca_para_chave_ja_usada_e_recusada(filiais, tmp_path):
+    abrir_banco = filiais
+    enviar(abrir_banco, 'norte', 'sul', str(tmp_path / 'completo.jsonl.gz'), completo=True)
+    nucleo = abrir_banco('sul.db')
+    nucleo.adicionar_livro('Terceiro', '3', 1, 1)
+    # Em norte o ISBN 3 está livre; em sul ele já é de outro livro
+    nucleo = abrir_banco('norte.db')
+    with nucleo.SessaoLeitura() as leitura:
+        livro_id = leitura.scalar(select(nucleo.Livro.id).where(nucleo.Livro.isbn == '1'))
+    nucleo.editar_livro(livro_id, 'Primeiro', '3', 1, 1)
+
+    resultado = enviar(abrir_banco, 'norte', 'sul', str(tmp_path / 'alteracoes.jsonl.gz'))
+    assert (resultado['aplicados'], resultado['rejeitados']) == (0, 1)
+    assert resultado['motivos'] == ["livros 3: ISBN já usado por outro registro nesta filial"]
+    assert (titulo(nucleo, '1'), titulo(nucleo, '3')) == ('Primeiro', 'Terceiro')
+
+
+def test_poda_so_o_que_todas_as_parceiras_receberam(filiais, tmp_path):
+    abrir_banco = filiais
+    abrir_banco('leste.db')
+    sincronizacao.definir_filial('leste')
+    nucleo = abrir_banco('norte.db')
+    sincronizacao.exportar('sul', str(tmp_path / 'sul.jsonl.gz'), completo=True)
+    sincronizacao.exportar('leste', str(tmp_path / 'leste.jsonl.gz'), completo=True)
+    enviado_aos_dois = sincronizacao.situacao()['log'][1]
+
+    editar_titulo(nucleo, '1', 'Só sul recebeu')
+    sincronizacao.exportar('sul', str(tmp_path / 'sul-2.jsonl.gz'))
+    # Leste ainda não recebeu a edição: só sai o que as duas já têm
+    assert sincronizacao.podar() == enviado_aos_dois
+    assert sincronizacao.situacao()['log'][0] > 0
+    assert sincronizacao.exportar('leste', str(tmp_path / 'leste-2.jsonl.gz'))[0] == 1
+    assert sincronizacao.podar() > 0
+    assert sincronizacao.situacao()['log'][0] == 0
+
+    for pacote in ('leste.jsonl.gz', 'leste-2.jsonl.gz'):
+        nucleo = abrir_banco('leste.db')
+        sincronizacao.aplicar(str(tmp_path / pacote))
+    assert titulo(nucleo, '1') == 'Só sul recebeu'
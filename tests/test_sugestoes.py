@@ -0,0 +1,46 @@
+import pytest
+
+
+@pytest.fixture
+def autores(nucleo):
+    for nome in ('100% Poesia', '100 Contos', 'ana_maria', 'Ana Paula', 'anabela', 'Bruno', '12 Anos'):
+        nucleo.adicionar_autor(nome, '')
+    return nucleo
+
+
+def nomes(sugestoes):
+    return [nome for _, nome in sugestoes]
+
+
+def test_prefixo_sem_diferenciar_maiusculas_em_ordem_alfabetica(autores):
+    assert nomes(autores.sugerir_autores('ANA')) == ['Ana Paula', 'ana_maria', 'anabela']
+    assert nomes(autores.sugerir_autores('ana', limite=2)) == ['Ana Paula', 'ana_maria']
+
+
+@pytest.mark.parametrize('texto, esperado', [
+    # Sem o escape, % e _ seriam curingas do LIKE
+    ('100%', ['100% Poesia']),
+    ('%', []),
+    ('ana_', ['ana_maria']),
+    ('_', []),
+    ('\\', []),
+])
+def test_curingas_do_like_sao_literais(autores, texto, esperado):
+    assert nomes(autores.sugerir_autores(texto)) == esperado
+
+
+def test_numero_traz_tambem_o_registro_com_esse_id(autores):
+    # O autor de id 1 (100% Poesia) já começa por "1" e não se repete; anabela (id 5)
+    # não começa por "5" e vem só pelo id
+    assert autores.sugerir_autores('1') == [(2, '100 Contos'), (1, '100% Poesia'), (7, '12 Anos')]
+    assert autores.sugerir_autores('5') == [(5, 'anabela')]
+    assert autores.sugerir_autores('12', limite=1) == [(7, '12 Anos')]
+    assert autores.sugerir_autores('99') == []
+
+
+def test_numero_respeita_o_limite(autores):
+    sugestoes = autores.sugerir_autores('4', limite=1)
+    assert sugestoes == [(4, 'Ana Paula')]
+    autores.adicionar_autor('4 Estações', '')
+    assert autores.sugerir_autores('4', limite=2) == [(4, 'Ana Paula'), (8, '4 Estações')]
+    assert autores.sugerir_autores('4', limite=1) == [(4, 'Ana Paula')]